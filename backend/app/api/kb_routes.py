@@ -1,7 +1,11 @@
 # api/kb_routes.py
-from fastapi import APIRouter, Form, UploadFile, File
+import asyncio
+import json
+from typing import Optional
+from fastapi import APIRouter, Form, HTTPException, Query, UploadFile, File
+from fastapi.responses import StreamingResponse
+from app.core.container import services
 from app.services import kb_service
-import pandas as pd
 
 router = APIRouter(prefix="/kb", tags=["Knowledge Base"])
 
@@ -11,22 +15,134 @@ async def upload_kb(
     content: str = Form(...),
     source: str = Form(""),
 ):
-    entry = kb_service.add_kb_entry(title, content, source)
+    entry = await asyncio.to_thread(kb_service.add_kb_entry, title, content, source)
     return entry
 
 @router.post("/upload_csv")
 async def upload_kb_csv(file: UploadFile = File(...)):
     """
     CSV columns: title, content, source (optional)
+
+    Rows are embedded and stored in chunks; the response reports how many
+    rows were ingested or skipped. For large files use `POST /kb/imports`.
     """
-    df = pd.read_csv(file.file)
-    uploaded = []
-    for _, row in df.iterrows():
-        source = row.get("source", "")
-        entry = kb_service.add_kb_entry(row["title"], row["content"], source)
-        uploaded.append(entry)
-    return {"uploaded": uploaded}
+    try:
+        report = await asyncio.to_thread(kb_service.ingest_csv, file.file)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"uploaded": report["ingested"], **report}
 
 @router.get("/")
-async def list_kb():
-    return kb_service.list_kb_entries()
+async def list_kb(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description=f"Comma-separated, from {list(kb_service.KB_FIELDS)}"),
+    source: Optional[str] = None,
+    title_prefix: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$")
+):
+    """
+    Paginated KB listing, `{"items": [...], "next_cursor": ...}`: pass
+    `next_cursor` back as `cursor` for the next page.
+
+    The cursor records the last entry returned and resumes after it, so
+    entries added or deleted between pages are not skipped or repeated. It is
+    not a true keyset cursor (Chroma cannot seek to an id): if the last entry
+    of a page is itself deleted, the next page resumes from its old position.
+
+    With `format=ndjson` every matching entry from `cursor` on is streamed,
+    one JSON object per line (`limit` is ignored).
+    """
+    try:
+        selected = kb_service.parse_fields(fields)
+        offset, after = kb_service.decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if format == "ndjson":
+        offset = await asyncio.to_thread(kb_service.resume_offset, offset, after, source)
+        entries = kb_service.iter_kb_entries(selected, source, title_prefix, offset)
+        return StreamingResponse(
+            (json.dumps(entry) + "\n" for _, entry in entries),
+            media_type="application/x-ndjson"
+        )
+    return await asyncio.to_thread(kb_service.list_kb_entries, limit, cursor, selected, source, title_prefix)
+
+# ------------------- Retrieval ------------------- #
+@router.get("/search")
+async def search_kb(q: str, k: int = Query(4, ge=1, le=50)):
+    """
+    Hybrid search (BM25 + vector, reciprocal-rank fusion): the passages chat
+    responses are grounded on
+    """
+    return await asyncio.to_thread(services.kb_retriever.retrieve, q, k)
+
+@router.get("/stats/retrieval")
+async def get_retrieval_stats():
+    return services.kb_retriever.stats()
+
+# ------------------- Import Jobs ------------------- #
+@router.post("/imports", status_code=202)
+async def submit_import(file: UploadFile = File(...)):
+    """
+    Start a background import of a CSV (title, content, source) or JSONL file.
+    Returns the job; poll `GET /kb/imports/{job_id}` or stream `/events`.
+    """
+    try:
+        return await services.kb_imports.submit(file, file.filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/imports")
+async def list_imports():
+    return services.kb_imports.list_jobs()
+
+@router.get("/imports/{job_id}")
+async def get_import(job_id: str):
+    job = services.kb_imports.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Import job '{job_id}' not found")
+    return job
+
+@router.post("/imports/{job_id}/resume")
+async def resume_import(job_id: str):
+    """
+    Continue a failed or interrupted import from its last checkpoint; 409 if
+    it has completed or is already queued or running in this process
+    """
+    try:
+        job = services.kb_imports.resume(job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Import job '{job_id}' not found")
+    return job
+
+@router.get("/imports/{job_id}/events")
+async def stream_import(job_id: str, interval: float = 1.0):
+    """
+    Progress as Server-Sent Events: a `progress` event whenever the job
+    advances, then `end` once it has completed or failed.
+    """
+    if services.kb_imports.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Import job '{job_id}' not found")
+
+    async def event_stream():
+        last_update = None
+        while True:
+            job = services.kb_imports.get(job_id)
+            if job is None:
+                break
+            if job["updated_at"] != last_update:
+                last_update = job["updated_at"]
+                yield f"event: progress\ndata: {json.dumps(job)}\n\n"
+            if job["status"] in ("completed", "failed"):
+                yield f"event: end\ndata: {json.dumps(job)}\n\n"
+                break
+            await asyncio.sleep(max(0.1, interval))
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,13 +1,12 @@
+import json
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from app.models.preferences import UserPreferences
-from app.services.preference_processor import PreferenceProcessor
+from app.core.container import services
 from . import scenario_routes 
-from app.llm.response_generator import ResponseGenerator  # Import the response generator
 from typing import Dict, Any
 
 router = APIRouter()
-preference_processor = PreferenceProcessor()
-response_generator = ResponseGenerator()  # Initialize the response generator
 
 @router.post("/process-preferences")
 async def process_preferences(preferences: UserPreferences, template_type: str = "default"):
@@ -16,10 +15,10 @@ async def process_preferences(preferences: UserPreferences, template_type: str =
     """
     try:
         # Process the preferences (returns dict instead of ProcessedPreferences)
-        processed_data = preference_processor.process_preferences(preferences, template_type)
+        processed_data = services.preference_processor.process_preferences(preferences, template_type)
         
         # Store the submission if needed
-        submission_id = preference_processor.store_submission(preferences, template_type)
+        submission_id = services.preference_processor.store_submission(preferences, template_type)
         
         return {
             "success": True,
@@ -40,10 +39,10 @@ async def generate_prompt(preferences: UserPreferences, template_type: str = "de
     """
     try:
         # Directly generate the prompt template
-        processed_data = preference_processor.process_preferences(preferences, template_type)
+        processed_data = services.preference_processor.process_preferences(preferences, template_type)
         
         # Store the submission
-        submission_id = preference_processor.store_submission(preferences, template_type)
+        submission_id = services.preference_processor.store_submission(preferences, template_type)
         
         return {
             "success": True,
@@ -77,17 +76,18 @@ async def generate_response(request: Dict[str, Any]):
             raise HTTPException(status_code=400, detail="User input is required")
         
         # Use the enhanced response generator
-        response = response_generator.generate_response(
+        response = await services.response_generator.generate_response(
             user_input=user_input,
             preferences=preferences,
             session_id=session_id
         )
+        state = await services.response_generator.get_conversation_state(session_id)
         
         return {
             "success": True,
             "response": response,
             "session_id": session_id,
-            "turn_count": response_generator.conversation_state.get(session_id, {}).get("turn_count", 0)
+            "turn_count": state.get("turn_count", 0)
         }
         
     except Exception as e:
@@ -96,13 +96,55 @@ async def generate_response(request: Dict[str, Any]):
             detail=f"Error generating response: {str(e)}"
         )
 
+@router.post("/generate-response/stream")
+async def generate_response_stream(request: Dict[str, Any]):
+    """
+    Stream the chat reply as Server-Sent Events: a `start` event, `token`
+    events as the reply is generated, then an `end` event with the new
+    `turn_count` (or an `error` event).
+    """
+    user_input = request.get("user_input", "")
+    preferences = request.get("preferences", {})
+    session_id = request.get("session_id", "default")
+
+    if not user_input:
+        raise HTTPException(status_code=400, detail="User input is required")
+
+    async def event_stream():
+        async for event in services.response_generator.stream_response(
+            user_input=user_input,
+            preferences=preferences,
+            session_id=session_id
+        ):
+            name = event.pop("event")
+            yield f"event: {name}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/stats/llm")
+async def get_llm_stats():
+    """
+    Coalesced LLM calls, per-endpoint latency, error rate, failovers and hedges of the model router,
+    and semantic answer cache hits
+    """
+    generator = services.response_generator
+    return {
+        **generator.coalescing_stats(),
+        "router": generator.router.stats(),
+        "answer_cache": generator.answer_cache.stats() if generator.answer_cache is not None else None
+    }
+
 @router.get("/submissions/{submission_id}")
 async def get_submission(submission_id: str):
     """
     Get a specific submission by ID
     """
     try:
-        submission = preference_processor.get_submission(submission_id)
+        submission = services.preference_processor.get_submission(submission_id)
         if not submission:
             raise HTTPException(status_code=404, detail="Submission not found")
         
@@ -124,7 +166,7 @@ async def get_all_submissions():
     Get all stored submissions
     """
     try:
-        submissions = preference_processor.get_all_submissions()
+        submissions = services.preference_processor.get_all_submissions()
         
         return {
             "success": True,
@@ -143,7 +185,7 @@ async def get_preferences_json(preferences: UserPreferences):
     Get preferences in structured JSON format
     """
     try:
-        preferences_json = preference_processor.get_preferences_json(preferences)
+        preferences_json = services.preference_processor.get_preferences_json(preferences)
         
         return {
             "success": True,
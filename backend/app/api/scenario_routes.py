@@ -1,8 +1,10 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
+import json
 import traceback
 from typing import Any, Dict
-from app.services.scenario_generator import ScenarioGenerator
+from app.core.container import services
 from app.models.scenario_content import (
     ScenarioContent, 
     GenerateContentRequest, 
@@ -10,15 +12,12 @@ from app.models.scenario_content import (
     QuestionStep
 )
 
-from ..services.scenario_service import ScenarioService
 from ..models.preferences import UserPreferences
 from ..models.scenario import Scenario, ScenarioRecommendationRequest, ScenarioSearchRequest
 
 router = APIRouter(tags=["scenarios"])
 
-# ------------------- Initialize Services ------------------- #
-scenario_service = ScenarioService()
-scenario_generator = ScenarioGenerator()
+# Services are created once by the lifespan-managed container (app.core.container)
 
 # ------------------- Recommendation Endpoint ------------------- #
 @router.post("/recommend", response_model=List[Scenario])
@@ -32,7 +31,8 @@ async def recommend_scenarios(request: ScenarioRecommendationRequest):
     """
     try:
         # Call service to find scenarios
-        scenarios = scenario_service.find_matching_scenarios(
+        scenario_service = await services.get_scenario_service()
+        scenarios = await scenario_service.find_matching_scenarios_async(
             user_prefs=request.user_prefs,
             query=request.query,
             max_results=request.max_results
@@ -72,7 +72,8 @@ async def search_scenarios(request: ScenarioSearchRequest):
             )
 
         # Use service with or without preferences
-        scenarios = scenario_service.find_matching_scenarios(
+        scenario_service = await services.get_scenario_service()
+        scenarios = await scenario_service.find_matching_scenarios_async(
             user_prefs=request.user_prefs if request.user_prefs else None,
             query=request.query,
             max_results=request.max_results
@@ -92,6 +93,47 @@ async def search_scenarios(request: ScenarioSearchRequest):
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+# ------------------- Query Cache Stats ------------------- #
+@router.get("/stats/query-cache", response_model=Dict[str, Any])
+async def get_query_cache_stats():
+    """
+    Hit/miss counters of the query-embedding cache used by recommend and search.
+    """
+    scenario_service = await services.get_scenario_service()
+    return {
+        **scenario_service.query_cache_stats(),
+        "batching": scenario_service.batcher.stats()
+    }
+
+
+# ------------------- Content Pool Stats ------------------- #
+@router.get("/stats/content-pool", response_model=Dict[str, Any])
+async def get_content_pool_stats():
+    """
+    Hit rate and size of the pre-generated scenario content pools.
+    """
+    return services.content_pool.stats()
+
+
+# ------------------- Feedback Cache Stats ------------------- #
+@router.get("/stats/feedback-cache", response_model=Dict[str, Any])
+async def get_feedback_cache_stats():
+    """
+    Hit/miss counters of the cache of generated scenario feedback.
+    """
+    return services.scenario_generator.feedback_cache.stats()
+
+
+# ------------------- Content Generation Stats ------------------- #
+@router.get("/stats/content-generation", response_model=Dict[str, Any])
+async def get_content_generation_stats():
+    """
+    How often generated content parsed first time, needed repair or the retry,
+    or ended on the static fallback, with per-attempt latency.
+    """
+    return services.scenario_generator.stats.summary()
+
+
 # ------------------- Get Scenario By ID ------------------- #
 @router.get("/{scenario_id}", response_model=Scenario)
 async def get_scenario_by_id(scenario_id: str):
@@ -101,6 +143,7 @@ async def get_scenario_by_id(scenario_id: str):
     - **scenario_id**: Unique identifier
     """
     try:
+        scenario_service = await services.get_scenario_service()
         scenario = scenario_service.get_scenario_by_id(scenario_id)
         if not scenario:
             raise HTTPException(
@@ -121,6 +164,7 @@ async def get_all_scenarios():
     Get all available scenarios (for testing or admin purposes)
     """
     try:
+        scenario_service = await services.get_scenario_service()
         scenarios = scenario_service.get_all_scenarios()
         if not scenarios:
             raise HTTPException(
@@ -151,6 +195,7 @@ async def generate_scenario_content(
     """
     try:
         # Get scenario from service
+        scenario_service = await services.get_scenario_service()
         scenario = scenario_service.get_scenario_by_id(scenario_id)
         if not scenario:
             raise HTTPException(
@@ -158,8 +203,8 @@ async def generate_scenario_content(
                 detail=f"Scenario with ID '{scenario_id}' not found"
             )
         
-        # Generate content using the scenario generator
-        content = scenario_generator.generate_scenario_content(scenario, request.user_prefs)
+        # Served from the pre-generated pool when possible
+        content = await services.content_pool.take(scenario, request.user_prefs)
         
         return {
             "success": True,
@@ -194,6 +239,7 @@ async def generate_scenario_content(
 ):
     """Generate interactive content for a specific scenario based on user preferences."""
     try:
+        scenario_service = await services.get_scenario_service()
         scenario = scenario_service.get_scenario_by_id(scenario_id)
         if not scenario:
             raise HTTPException(
@@ -201,8 +247,7 @@ async def generate_scenario_content(
                 detail=f"Scenario with ID '{scenario_id}' not found"
             )
         
-        # Remove await - ScenarioGenerator methods are synchronous
-        content = scenario_generator.generate_scenario_content(scenario, request.user_prefs)
+        content = await services.content_pool.take(scenario, request.user_prefs)
         
         return {
             "success": True,
@@ -227,6 +272,51 @@ async def generate_scenario_content(
             detail=f"Error generating content: {str(e)}"
         )
 
+# ------------------- Stream Interactive Content ------------------- #
+@router.post("/{scenario_id}/generate-content/stream")
+async def stream_scenario_content(
+    scenario_id: str,
+    request: GenerateContentRequest
+):
+    """
+    Stream interactive content as Server-Sent Events: a `step` event as soon
+    as each step is generated, then an `end` event with the full content (or
+    an `error` event). Pooled content, when available, is sent at once.
+    """
+    scenario_service = await services.get_scenario_service()
+    scenario = scenario_service.get_scenario_by_id(scenario_id)
+    if not scenario:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Scenario with ID '{scenario_id}' not found"
+        )
+
+    async def pooled_events(content: ScenarioContent):
+        for index, step in enumerate(content.steps):
+            yield {"event": "step", "index": index, "step": step.model_dump()}
+        yield {"event": "end", "content": content.model_dump()}
+
+    async def event_stream():
+        content = services.content_pool.take_ready(scenario, request.user_prefs)
+        events = (
+            pooled_events(content) if content is not None
+            else services.scenario_generator.astream_scenario_content(scenario, request.user_prefs)
+        )
+        try:
+            async for event in events:
+                name = event.pop("event")
+                yield f"event: {name}\ndata: {json.dumps({'scenario_id': scenario_id, **event})}\n\n"
+        except Exception as e:
+            print(f"[ERROR] stream_scenario_content failed for {scenario_id}:", str(e))
+            traceback.print_exc()
+            yield f"event: error\ndata: {json.dumps({'scenario_id': scenario_id, 'detail': str(e)})}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # ------------------- Generate Feedback for User Response ------------------- #
 @router.post("/{scenario_id}/generate-feedback", response_model=Dict[str, Any])
 async def generate_scenario_feedback(
@@ -235,6 +325,7 @@ async def generate_scenario_feedback(
 ):
     """Generate personalized feedback for a user's response to a scenario question."""
     try:
+        scenario_service = await services.get_scenario_service()
         scenario = scenario_service.get_scenario_by_id(scenario_id)
         if not scenario:
             raise HTTPException(
@@ -248,8 +339,7 @@ async def generate_scenario_feedback(
                 detail="User answer cannot be empty"
             )
         
-        # Remove await - ScenarioGenerator methods are synchronous
-        feedback_result = scenario_generator.generate_feedback(
+        feedback_result = await services.scenario_generator.agenerate_feedback(
             user_answer=request.user_answer,
             question=request.question,
             scenario=scenario,
@@ -287,6 +377,7 @@ async def start_learning_session(
 ):
     """Start a complete learning session for a scenario."""
     try:
+        scenario_service = await services.get_scenario_service()
         scenario = scenario_service.get_scenario_by_id(scenario_id)
         if not scenario:
             raise HTTPException(
@@ -294,8 +385,7 @@ async def start_learning_session(
                 detail=f"Scenario with ID '{scenario_id}' not found"
             )
         
-        # Remove await - ScenarioGenerator methods are synchronous
-        content = scenario_generator.generate_scenario_content(scenario, request.user_prefs)
+        content = await services.content_pool.take(scenario, request.user_prefs)
         
         return {
             "success": True,
@@ -387,6 +477,7 @@ async def get_learning_progress(scenario_id: str, session_id: str):
     For now, returns basic scenario information.
     """
     try:
+        scenario_service = await services.get_scenario_service()
         scenario = scenario_service.get_scenario_by_id(scenario_id)
         if not scenario:
             raise HTTPException(
@@ -12,12 +12,83 @@ class Settings:
     GROQ_API_KEY: str = os.getenv("GROQ_API_KEY", "")
     MODEL_NAME: str = os.getenv("MODEL_NAME", "openai/gpt-oss-120b")
     EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")  # Only for "openai:" endpoints
+    FAST_MODEL_NAME: str = os.getenv("FAST_MODEL_NAME", "llama-3.1-8b-instant")
+    # Endpoints per task, comma-separated in failover order: "model" (Groq) or "provider:model"
+    LLM_ROUTE_CHAT: str = os.getenv("LLM_ROUTE_CHAT", MODEL_NAME)
+    LLM_ROUTE_ANALYSIS: str = os.getenv("LLM_ROUTE_ANALYSIS", f"{FAST_MODEL_NAME},{MODEL_NAME}")
+    LLM_ROUTE_STRUCTURED: str = os.getenv("LLM_ROUTE_STRUCTURED", MODEL_NAME)
+    LLM_ROUTE_FEEDBACK: str = os.getenv("LLM_ROUTE_FEEDBACK", f"{FAST_MODEL_NAME},{MODEL_NAME}")
+    # Hedge a call to the next endpoint once it runs past the primary's p95 latency
+    LLM_HEDGING: bool = os.getenv("LLM_HEDGING", "true").lower() == "true"
+    LLM_HEDGE_MIN_SECONDS: float = float(os.getenv("LLM_HEDGE_MIN_SECONDS", "1.0"))
+    LLM_TIMEOUT_SECONDS: float = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+    # One endpoint's attempt within a routed call; past it the endpoint counts as failed and the
+    # next one is tried. Keep it below LLM_TIMEOUT_SECONDS so a failover still fits (0 disables)
+    LLM_ATTEMPT_TIMEOUT_SECONDS: float = float(os.getenv("LLM_ATTEMPT_TIMEOUT_SECONDS", "12"))
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))  # In-flight LLM calls per worker
+    # Chat analysis: "llm" (sequential LLM call), "local" (heuristics only) or
+    # "parallel" (heuristics, with the LLM analysis run alongside as a safety check)
+    CHAT_ANALYSIS_MODE: str = os.getenv("CHAT_ANALYSIS_MODE", "parallel")
+    # Scenario content: "json_mode" asks the provider for a JSON object, "prompt" relies on the prompt alone
+    STRUCTURED_OUTPUT_MODE: str = os.getenv("STRUCTURED_OUTPUT_MODE", "json_mode")
+    # Chat history: recent turns kept verbatim up to a token budget, older turns in a rolling summary
+    HISTORY_TOKEN_BUDGET: int = int(os.getenv("HISTORY_TOKEN_BUDGET", "600"))
+    HISTORY_SUMMARY_TOKENS: int = int(os.getenv("HISTORY_SUMMARY_TOKENS", "200"))
+    HISTORY_SUMMARY_MODE: str = os.getenv("HISTORY_SUMMARY_MODE", "llm")  # llm (background rewrite) | local
+    # Semantic answer cache for chat: "off", "reply" (serve the cached reply) or
+    # "personalise" (adapt the cached reply with one call to the fast model)
+    ANSWER_CACHE_MODE: str = os.getenv("ANSWER_CACHE_MODE", "off")
+    ANSWER_CACHE_THRESHOLD: float = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))  # Cosine similarity
+    ANSWER_CACHE_SIZE: int = int(os.getenv("ANSWER_CACHE_SIZE", "2000"))
+    ANSWER_CACHE_TTL_SECONDS: int = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400"))
     
     # Paths
     DATA_DIR: str = "data"
     SCENARIOS_PATH: str = os.path.join(DATA_DIR, "scenarios.json")
     FAQS_PATH: str = os.path.join(DATA_DIR, "faqs.json")
     VECTORSTORE_PATH: str = os.path.join(DATA_DIR, "embeddings", "faiss_index")
+
+    # Scenario similarity index
+    SCENARIO_INDEX_BACKEND: str = os.getenv("SCENARIO_INDEX_BACKEND", "exact")  # exact | ivf
+    SCENARIO_INDEX_NLIST: int = int(os.getenv("SCENARIO_INDEX_NLIST", "0"))  # 0 = sqrt(number of scenarios)
+    SCENARIO_INDEX_NPROBE: int = int(os.getenv("SCENARIO_INDEX_NPROBE", "8"))
+    SCENARIO_INDEX_DTYPE: str = os.getenv("SCENARIO_INDEX_DTYPE", "float32")  # float32 | float16 | int8
+    SCENARIO_INDEX_RERANK: int = int(os.getenv("SCENARIO_INDEX_RERANK", "100"))  # float32 re-rank depth for quantised storage
+
+    # Query embedding cache
+    QUERY_CACHE_SIZE: int = int(os.getenv("QUERY_CACHE_SIZE", "2048"))
+    QUERY_CACHE_TTL_SECONDS: int = int(os.getenv("QUERY_CACHE_TTL_SECONDS", "3600"))
+
+    # Query embedding micro-batching
+    EMBEDDING_BATCH_MAX_SIZE: int = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))
+    EMBEDDING_BATCH_WAIT_MS: float = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5"))
+
+    # Pre-generated scenario content, per scenario and preference bucket
+    CONTENT_POOL_DEPTH: int = int(os.getenv("CONTENT_POOL_DEPTH", "2"))  # 0 disables pooling
+    CONTENT_POOL_MAX_AGE_SECONDS: int = int(os.getenv("CONTENT_POOL_MAX_AGE_SECONDS", "1800"))
+    CONTENT_POOL_MAX_POOLS: int = int(os.getenv("CONTENT_POOL_MAX_POOLS", "256"))
+    CONTENT_POOL_WORKERS: int = int(os.getenv("CONTENT_POOL_WORKERS", "2"))
+
+    # Knowledge base ingestion
+    KB_INGEST_CHUNK_SIZE: int = int(os.getenv("KB_INGEST_CHUNK_SIZE", "1000"))  # CSV rows per collection.add
+    KB_EMBED_BATCH_SIZE: int = int(os.getenv("KB_EMBED_BATCH_SIZE", "64"))  # Texts per embedding forward pass
+    KB_IMPORT_DIR: str = os.getenv("KB_IMPORT_DIR", os.path.join(DATA_DIR, "kb_imports"))
+    KB_IMPORT_BATCH_SIZE: int = int(os.getenv("KB_IMPORT_BATCH_SIZE", "500"))  # Records per checkpoint
+    KB_LIST_BATCH_SIZE: int = int(os.getenv("KB_LIST_BATCH_SIZE", "500"))  # Rows per collection.get when listing
+
+    # Knowledge-base retrieval (RAG) for chat responses
+    RAG_ENABLED: bool = os.getenv("RAG_ENABLED", "true").lower() == "true"
+    RAG_TOP_K: int = int(os.getenv("RAG_TOP_K", "4"))  # Passages added to the prompt
+    RAG_CANDIDATES: int = int(os.getenv("RAG_CANDIDATES", "20"))  # Per side (BM25, vector) before fusion
+    RAG_TOKEN_BUDGET: int = int(os.getenv("RAG_TOKEN_BUDGET", "400"))
+    RAG_RRF_K: int = int(os.getenv("RAG_RRF_K", "60"))
+
+    # Scenario feedback cache
+    FEEDBACK_CACHE_SIZE: int = int(os.getenv("FEEDBACK_CACHE_SIZE", "5000"))
+    FEEDBACK_CACHE_TTL_SECONDS: int = int(os.getenv("FEEDBACK_CACHE_TTL_SECONDS", "604800"))  # 7 days
+    FEEDBACK_CACHE_BACKEND: str = os.getenv("FEEDBACK_CACHE_BACKEND", "memory")  # memory | disk | redis
+    FEEDBACK_CACHE_PATH: str = os.getenv("FEEDBACK_CACHE_PATH", os.path.join(DATA_DIR, "feedback_cache.jsonl"))
     
     # Logging
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
@@ -30,6 +101,12 @@ class Settings:
     REDIS_PORT: int = int(os.getenv("REDIS_PORT", "6379"))
     REDIS_DB: int = int(os.getenv("REDIS_DB", "0"))
     REDIS_PASSWORD: str = os.getenv("REDIS_PASSWORD", "")
+    REDIS_MAX_CONNECTIONS: int = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+    REDIS_SOCKET_TIMEOUT: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", "2"))
     SESSION_EXPIRE_SECONDS: int = int(os.getenv("SESSION_EXPIRE_SECONDS", "604800"))  # 7 days
+    SESSION_CACHE_SIZE: int = int(os.getenv("SESSION_CACHE_SIZE", "10000"))  # In-process fallback when Redis is down
+
+    def llm_route(self, task: str) -> list:
+        return [spec.strip() for spec in getattr(self, f"LLM_ROUTE_{task.upper()}").split(",") if spec.strip()]
 
 settings = Settings()
\ No newline at end of file
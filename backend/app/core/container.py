@@ -0,0 +1,231 @@
+# app/core/container.py
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceContainer:
+    """
+    Owns the application's heavy, shared objects.
+
+    Everything is created at most once and on first use, so importing the API
+    modules is cheap. The FastAPI lifespan calls `startup()`, which loads the
+    embedding model and scenario index in a background thread while the server
+    already accepts connections; `ready` flips once that finishes.
+    """
+
+    COMPONENTS = ("embedding_model", "preference_processor", "response_generator",
+                  "scenario_generator", "content_pool", "scenario_service", "kb_imports", "kb_retriever")
+
+    def __init__(self):
+        self._locks = {name: threading.Lock() for name in self.COMPONENTS}
+        self._embedding_model = None
+        self._preference_processor = None
+        self._response_generator = None
+        self._scenario_generator = None
+        self._content_pool = None
+        self._scenario_service = None
+        self._kb_imports = None
+        self._kb_retriever = None
+        self._warmup_task: Optional[asyncio.Task] = None
+        self.started_at: Optional[float] = None
+        self.ready_at: Optional[float] = None
+        self.warmup_error: Optional[str] = None
+
+    # ------------------- Components ------------------- #
+    def _get(self, name: str, factory):
+        """Return a component, creating it once; each component has its own lock so a slow load doesn't block the others"""
+        value = getattr(self, f"_{name}")
+        if value is None:
+            with self._locks[name]:
+                value = getattr(self, f"_{name}")
+                if value is None:
+                    value = factory()
+                    setattr(self, f"_{name}", value)
+        return value
+
+    @property
+    def embedding_model(self):
+        def create():
+            from sentence_transformers import SentenceTransformer
+            return SentenceTransformer(settings.EMBEDDING_MODEL)
+        return self._get("embedding_model", create)
+
+    @property
+    def preference_processor(self):
+        def create():
+            from app.services.preference_processor import PreferenceProcessor
+            return PreferenceProcessor()
+        return self._get("preference_processor", create)
+
+    @property
+    def response_generator(self):
+        def create():
+            from app.llm.response_generator import ResponseGenerator
+            retriever = None
+            if settings.RAG_ENABLED:
+                try:
+                    retriever = self.kb_retriever
+                except ImportError as e:
+                    logger.warning(f"Knowledge-base retrieval disabled: {e}")
+            answer_cache = None
+            if settings.ANSWER_CACHE_MODE != "off":
+                from app.llm.answer_cache import SemanticAnswerCache
+                answer_cache = SemanticAnswerCache(
+                    self._encode_chat_message,
+                    threshold=settings.ANSWER_CACHE_THRESHOLD,
+                    max_size=settings.ANSWER_CACHE_SIZE,
+                    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS
+                )
+            return ResponseGenerator(preference_processor=self.preference_processor, retriever=retriever,
+                                     answer_cache=answer_cache)
+        return self._get("response_generator", create)
+
+    @property
+    def scenario_generator(self):
+        def create():
+            from app.services.feedback_cache import FeedbackCache
+            from app.services.scenario_generator import ScenarioGenerator
+            feedback_cache = FeedbackCache(
+                max_size=settings.FEEDBACK_CACHE_SIZE,
+                ttl_seconds=settings.FEEDBACK_CACHE_TTL_SECONDS,
+                backend=settings.FEEDBACK_CACHE_BACKEND,
+                path=settings.FEEDBACK_CACHE_PATH,
+                # Shares the session store's connection pool
+                redis_client=self.response_generator.session_store.redis
+            )
+            return ScenarioGenerator(llm=self.response_generator, feedback_cache=feedback_cache)
+        return self._get("scenario_generator", create)
+
+    @property
+    def content_pool(self):
+        def create():
+            from app.services.content_pool import ScenarioContentPool
+            return ScenarioContentPool(
+                self.scenario_generator,
+                depth=settings.CONTENT_POOL_DEPTH,
+                max_age_seconds=settings.CONTENT_POOL_MAX_AGE_SECONDS,
+                max_pools=settings.CONTENT_POOL_MAX_POOLS,
+                workers=settings.CONTENT_POOL_WORKERS
+            )
+        return self._get("content_pool", create)
+
+    @property
+    def scenario_service(self):
+        def create():
+            from app.services.scenario_service import ScenarioService
+            return ScenarioService(model=self.embedding_model)
+        return self._get("scenario_service", create)
+
+    @property
+    def kb_imports(self):
+        def create():
+            from app.services.kb_import import KBImportManager
+            return KBImportManager(settings.KB_IMPORT_DIR, batch_size=settings.KB_IMPORT_BATCH_SIZE)
+        return self._get("kb_imports", create)
+
+    @property
+    def kb_retriever(self):
+        def create():
+            from app.retrieval.hybrid import KnowledgeRetriever
+            from app.services import kb_service
+            return KnowledgeRetriever(
+                kb_service,
+                top_k=settings.RAG_TOP_K,
+                candidates=settings.RAG_CANDIDATES,
+                token_budget=settings.RAG_TOKEN_BUDGET,
+                rrf_k=settings.RAG_RRF_K
+            )
+        return self._get("kb_retriever", create)
+
+    async def _encode_chat_message(self, text: str):
+        """Embedding through the shared micro-batcher; None until warm-up has loaded the model"""
+        if not self.ready:
+            return None
+        return await self._scenario_service.batcher.encode(text)
+
+    async def get_scenario_service(self):
+        """Scenario service for request handlers; waits for warm-up without blocking the event loop"""
+        if self._scenario_service is None:
+            await asyncio.to_thread(lambda: self.scenario_service)
+        return self._scenario_service
+
+    # ------------------- Lifecycle ------------------- #
+    @property
+    def ready(self) -> bool:
+        return self._scenario_service is not None
+
+    async def startup(self) -> None:
+        self.started_at = time.monotonic()
+        self._warmup_task = asyncio.create_task(self._warm_up())
+        resumed = self.kb_imports.resume_unfinished()
+        if resumed:
+            logger.info(f"Resuming {resumed} unfinished knowledge-base import(s)")
+
+    async def _warm_up(self) -> None:
+        try:
+            await asyncio.to_thread(lambda: self.scenario_service)
+            self.ready_at = time.monotonic()
+            logger.info(f"Services ready in {self.ready_at - self.started_at:.2f}s")
+        except Exception as e:
+            self.warmup_error = str(e)
+            logger.error(f"Service warm-up failed: {e}")
+        # The RAG index is built here rather than on the first chat turn
+        if settings.RAG_ENABLED:
+            try:
+                await asyncio.to_thread(lambda: self.kb_retriever.load())
+            except Exception as e:
+                logger.warning(f"Knowledge-base index warm-up failed, retrying in the background: {e}")
+                if self._kb_retriever is not None:
+                    self._kb_retriever.load_in_background()
+
+    async def shutdown(self) -> None:
+        if self._warmup_task is not None and not self._warmup_task.done():
+            self._warmup_task.cancel()
+        if self._scenario_service is not None:
+            await self._scenario_service.batcher.close()
+        if self._kb_imports is not None:
+            await self._kb_imports.close()
+        if self._content_pool is not None:
+            await self._content_pool.close()
+        if self._response_generator is not None:
+            await self._response_generator.close()
+
+    def degraded(self) -> List[str]:
+        """Components that are up but not fully working (the RAG index after a failed load)"""
+        retriever = self._kb_retriever
+        if settings.RAG_ENABLED and retriever is not None and not retriever.loaded and retriever.load_error:
+            return ["knowledge_base"]
+        return []
+
+    def status(self) -> Dict[str, Any]:
+        retriever = self._kb_retriever
+        return {
+            "ready": self.ready,
+            "degraded": self.degraded(),
+            "startup_seconds": (
+                self.ready_at - self.started_at
+                if self.ready_at is not None and self.started_at is not None else None
+            ),
+            "warmup_error": self.warmup_error,
+            "components": {
+                "embedding_model": self._embedding_model is not None,
+                "scenario_service": self._scenario_service is not None,
+                "response_generator": self._response_generator is not None,
+                "scenario_generator": self._scenario_generator is not None
+            },
+            "knowledge_base": {
+                "loaded": retriever.loaded,
+                "load_error": retriever.load_error,
+                "load_attempts": retriever.load_attempts
+            } if retriever is not None else None
+        }
+
+
+services = ServiceContainer()
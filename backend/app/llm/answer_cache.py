@@ -0,0 +1,157 @@
+# app/llm/answer_cache.py
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from app.models.preferences import UserPreferences
+
+
+def _digest(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class AnswerLookup:
+    """Result of a cache lookup: the message embedding and bucket, plus the cached reply on a hit"""
+
+    def __init__(self, embedding: np.ndarray, bucket: Tuple, reply: Optional[str] = None,
+                 similarity: Optional[float] = None):
+        self.embedding = embedding
+        self.bucket = bucket
+        self.reply = reply
+        self.similarity = similarity
+
+
+class _Entry:
+    def __init__(self, bucket: Tuple, embedding: np.ndarray, reply: str):
+        self.bucket = bucket
+        self.embedding = embedding
+        self.reply = reply
+        self.stored_at = time.monotonic()
+
+
+class SemanticAnswerCache:
+    """
+    Chat replies keyed by the meaning of the message.
+
+    A message is embedded and compared (cosine similarity) with earlier
+    messages in the same bucket: the same preference profile (every field
+    the response prompt renders) and the same retrieved knowledge-base
+    context. The reply of the closest one is a hit if the similarity reaches
+    `threshold`.
+
+    At most `max_size` replies are kept, least recently used evicted first,
+    and replies older than `ttl_seconds` are never served. The caller decides
+    what may be cached; this class knows nothing about safety.
+    """
+
+    def __init__(self, encode: Callable[[str], Awaitable[Optional[np.ndarray]]], threshold: float = 0.92,
+                 max_size: int = 2000, ttl_seconds: float = 86400):
+        self.encode = encode  # Async text -> embedding, or None when no model is available yet
+        self.threshold = threshold
+        self.max_size = max(1, max_size)
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._buckets: Dict[Tuple, Dict[int, None]] = {}
+        self._matrices: Dict[Tuple, Tuple[list, np.ndarray]] = {}
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.expired = 0
+        self.evicted = 0
+
+    @staticmethod
+    def cacheable(user_prefs: UserPreferences) -> bool:
+        """Free-text notes are specific to one user, so their replies are never shared"""
+        return not (user_prefs.additional_notes or "").strip()
+
+    @staticmethod
+    def bucket(user_prefs: UserPreferences, context: str = "") -> Tuple[str, str]:
+        """Hashes of the whole preference profile (list order ignored) and of the retrieved context"""
+        profile = {field: sorted(value) if isinstance(value, list) else value
+                   for field, value in user_prefs.model_dump().items()}
+        return _digest(profile), _digest(context)
+
+    # ------------------- Storage ------------------- #
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        self._buckets[entry.bucket].pop(entry_id, None)
+        if not self._buckets[entry.bucket]:
+            del self._buckets[entry.bucket]
+        self._matrices.pop(entry.bucket, None)
+
+    def _prune(self, bucket: Tuple) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        cutoff = time.monotonic() - self.ttl_seconds
+        for entry_id in [i for i in self._buckets.get(bucket, ()) if self._entries[i].stored_at < cutoff]:
+            self._remove(entry_id)
+            self.expired += 1
+
+    def _best(self, embedding: np.ndarray, bucket: Tuple) -> Tuple[Optional[int], float]:
+        """Closest entry in the bucket and its similarity"""
+        self._prune(bucket)
+        ids = self._buckets.get(bucket)
+        if not ids:
+            return None, 0.0
+        cached = self._matrices.get(bucket)
+        if cached is None:
+            keys = list(ids)
+            cached = self._matrices[bucket] = (keys, np.stack([self._entries[i].embedding for i in keys]))
+        keys, matrix = cached
+        scores = matrix @ embedding
+        best = int(np.argmax(scores))
+        return keys[best], float(scores[best])
+
+    # ------------------- Lookup ------------------- #
+    async def lookup(self, text: str, bucket: Tuple) -> Optional[AnswerLookup]:
+        """None if the message could not be embedded; otherwise an AnswerLookup, with `reply` set on a hit"""
+        embedding = await self.encode(text)
+        if embedding is None:
+            return None
+        embedding = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        embedding = embedding / (np.linalg.norm(embedding) or 1.0)
+
+        entry_id, similarity = self._best(embedding, bucket)
+        if entry_id is None or similarity < self.threshold:
+            self.misses += 1
+            return AnswerLookup(embedding, bucket)
+        self._entries.move_to_end(entry_id)
+        self.hits += 1
+        return AnswerLookup(embedding, bucket, self._entries[entry_id].reply, similarity)
+
+    def store(self, lookup: AnswerLookup, reply: str) -> None:
+        """Cache the reply to a looked-up message, replacing a near-identical entry"""
+        if not reply.strip():
+            return
+        entry_id, similarity = self._best(lookup.embedding, lookup.bucket)
+        if entry_id is not None and similarity >= self.threshold:
+            self._remove(entry_id)
+
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = _Entry(lookup.bucket, lookup.embedding, reply)
+        self._buckets.setdefault(lookup.bucket, {})[entry_id] = None
+        self._matrices.pop(lookup.bucket, None)
+        self.stored += 1
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+            self.evicted += 1
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "buckets": len(self._buckets),
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else None,
+            "stored": self.stored,
+            "expired": self.expired,
+            "evicted": self.evicted
+        }
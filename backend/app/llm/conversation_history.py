@@ -0,0 +1,115 @@
+# app/llm/conversation_history.py
+import re
+from typing import Any, Dict, List, Optional
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Local token estimate: words and punctuation marks, with long words counted
+    as several tokens (roughly how BPE tokenizers split them).
+    """
+    return sum(1 + len(piece) // 8 for piece in TOKEN_PATTERN.findall(text or ""))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to roughly `max_tokens` estimated tokens, on a word boundary"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    words, used = [], 0
+    for word in text.split():
+        used += estimate_tokens(word)
+        if used > max_tokens:
+            break
+        words.append(word)
+    return " ".join(words) + " ..."
+
+
+class ConversationHistory:
+    """
+    Token-budgeted conversation history kept inside the session state.
+
+    `state["history"]` holds the most recent turns verbatim, as long as they fit
+    in `turn_budget` tokens. Older turns are compacted into `state["summary"]`:
+    each evicted turn immediately adds one short line, and the summary is marked
+    stale so the caller can have an LLM rewrite it off the request path. The
+    summary itself never exceeds `summary_budget`, so the rendered history
+    stays the same size however long the conversation runs.
+    """
+
+    LINE_TOKENS = 40  # Per-turn line added to the summary when a turn is evicted
+
+    def __init__(self, turn_budget: int = 600, summary_budget: int = 200):
+        self.turn_budget = turn_budget
+        self.summary_budget = summary_budget
+
+    @staticmethod
+    def ensure_fields(state: Dict[str, Any]) -> Dict[str, Any]:
+        """Add the history fields to states saved before they existed"""
+        state.setdefault("history", [])
+        state.setdefault("summary", "")
+        state.setdefault("summary_stale", False)
+        return state
+
+    @staticmethod
+    def turn_text(turn: Dict[str, str]) -> str:
+        return f"User: {turn['user']}\nAssistant: {turn['assistant']}"
+
+    def turn_tokens(self, turns: List[Dict[str, str]]) -> int:
+        return sum(estimate_tokens(self.turn_text(turn)) for turn in turns)
+
+    # ------------------- Updates ------------------- #
+    def add_turn(self, state: Dict[str, Any], user_input: str, response_text: str) -> List[Dict[str, str]]:
+        """Append a turn, compacting the oldest turns over budget into the summary; returns the evicted turns"""
+        self.ensure_fields(state)
+        history = state["history"]
+        history.append({"user": user_input, "assistant": response_text})
+
+        evicted = []
+        while len(history) > 1 and self.turn_tokens(history) > self.turn_budget:
+            evicted.append(history.pop(0))
+
+        # A single turn larger than the whole budget is stored truncated
+        if self.turn_tokens(history) > self.turn_budget:
+            half = self.turn_budget // 2
+            history[0] = {key: truncate_tokens(value, half) for key, value in history[0].items()}
+
+        if evicted:
+            lines = [self.summary_line(turn) for turn in evicted]
+            state["summary"] = self.fit_summary("\n".join(filter(None, [state["summary"], *lines])))
+            state["summary_stale"] = True
+        return evicted
+
+    def summary_line(self, turn: Dict[str, str]) -> str:
+        half = self.LINE_TOKENS // 2
+        return f"- User: {truncate_tokens(turn['user'], half)} / Assistant: {truncate_tokens(turn['assistant'], half)}"
+
+    def fit_summary(self, summary: str) -> str:
+        """Drop the oldest summary lines until the summary fits its budget"""
+        lines = summary.strip().splitlines()
+        while len(lines) > 1 and estimate_tokens("\n".join(lines)) > self.summary_budget:
+            lines.pop(0)
+        return truncate_tokens("\n".join(lines), self.summary_budget)
+
+    def apply_summary(self, state: Dict[str, Any], previous: str, rewritten: str) -> None:
+        """
+        Replace the summary with an LLM rewrite of `previous`. Lines added while
+        the rewrite was running are kept after it.
+        """
+        self.ensure_fields(state)
+        current = state["summary"]
+        added = current[len(previous):].strip() if current.startswith(previous) else ""
+        state["summary"] = self.fit_summary("\n".join(filter(None, [rewritten.strip(), added])))
+        state["summary_stale"] = bool(added)
+
+    # ------------------- Rendering ------------------- #
+    def render(self, state: Dict[str, Any], last_turns: Optional[int] = None) -> str:
+        """History as prompt text: the rolling summary followed by the most recent turns"""
+        self.ensure_fields(state)
+        turns = state["history"] if last_turns is None else state["history"][-last_turns:]
+        parts = []
+        if state["summary"]:
+            parts.append(f"Earlier in the conversation:\n{state['summary']}")
+        parts.extend(self.turn_text(turn) for turn in turns)
+        return "\n".join(parts) if parts else "(no previous messages)"
@@ -1,54 +1,78 @@
 # app/llm/response_generator.py
+import asyncio
+import hashlib
 import json
+from contextlib import aclosing
 from langchain.prompts import PromptTemplate
-from langchain_groq import ChatGroq
 from langchain.schema.runnable import RunnableMap
 from app.core.config import settings
+from app.llm.answer_cache import AnswerLookup, SemanticAnswerCache
+from app.llm.conversation_history import ConversationHistory
+from app.llm.router import LLMRouter
+from app.retrieval.hybrid import KnowledgeRetriever
 from app.models.preferences import UserPreferences
 from app.services.preference_processor import PreferenceProcessor
-from typing import Dict, Any
+from app.services.session_store import SessionStore
+from typing import AsyncIterator, Dict, Any, Optional, Tuple
 import re
 
 
 class ResponseGenerator:
-    def __init__(self):
-        self.llm = ChatGroq(
-            groq_api_key=settings.GROQ_API_KEY,
-            model_name=settings.MODEL_NAME,
-            temperature=0.7,
-            max_tokens=1000
-        )
-        self.preference_processor = PreferenceProcessor()
-        self.conversation_state = {}
+    def __init__(self, preference_processor: Optional[PreferenceProcessor] = None,
+                 session_store: Optional[SessionStore] = None, llm=None,
+                 router: Optional[LLMRouter] = None, retriever: Optional[KnowledgeRetriever] = None,
+                 answer_cache: Optional[SemanticAnswerCache] = None):
+        # Each task type goes to its own ordered list of models; a given llm serves every task
+        self.router = router or (LLMRouter.single(llm) if llm is not None else LLMRouter.from_settings())
+        self.preference_processor = preference_processor or PreferenceProcessor()
+        self.session_store = session_store or SessionStore()
+        self.retriever = retriever  # Knowledge-base passages for the response prompt (RAG); None disables
+        self.answer_cache = answer_cache  # Replies to similar earlier messages (ANSWER_CACHE_MODE); None disables
+        self.llm_semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+        self.history = ConversationHistory(settings.HISTORY_TOKEN_BUDGET, settings.HISTORY_SUMMARY_TOKENS)
+        self._summary_tasks: Dict[str, asyncio.Task] = {}
+        self._summary_locks: Dict[str, asyncio.Lock] = {}
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.coalesced_leaders = 0
+        self.coalesced_followers = 0
+
+        # Chains are built once and reused for every call
+        self.analysis_chain = self.create_conversation_analysis_chain()
+        self.response_chain = self.create_response_generation_chain()
+        self.structured_content_chain = self.create_structured_content_chain()
+        self.simple_feedback_chain = self.create_simple_feedback_chain()
+        self.summary_chain = self.create_summary_chain()
+        self.personalise_chain = self.create_personalise_chain()
     
-    def _get_conversation_state(self, session_id: str) -> dict:
+    async def _get_conversation_state(self, session_id: str) -> dict:
         """Get conversation state from persistent storage"""
         try:
-            state_json = self.redis_client.get(f"session:{session_id}")
-            if state_json:
-                return json.loads(state_json)
-        except:
-            pass
+            state = await self.session_store.get(session_id)
+            if state:
+                return self.history.ensure_fields(state)
+        except Exception as e:
+            print(f"Error loading session state: {e}")
         
         # Return default state if not found or error
         return {
             "turn_count": 0,
             "history": [],
+            "summary": "",
+            "summary_stale": False,
             "engagement_level": "low",
             "user_name": None  # Store user name to avoid "Hi Anan" every time
         }
     
-    def _save_conversation_state(self, session_id: str, state: dict):
+    async def _save_conversation_state(self, session_id: str, state: dict):
         """Save conversation state to persistent storage"""
         try:
-            self.redis_client.setex(
-                f"session:{session_id}",
-                3600 * 24 * 7,  # Expire after 7 days
-                json.dumps(state)
-            )
+            await self.session_store.save(session_id, state)
         except Exception as e:
             print(f"Error saving session state: {e}")
 
+    async def get_conversation_state(self, session_id: str) -> dict:
+        return await self._get_conversation_state(session_id)
+
     def create_conversation_analysis_chain(self):
         """Chain to analyze conversation context and intent using new Runnable syntax"""
         prompt = PromptTemplate(
@@ -58,7 +82,8 @@ class ResponseGenerator:
 
                 User Input: {user_input}
                 Turn Number: {turn_count}
-                Recent History: {history}
+                Conversation So Far:
+                {history}
 
                 Determine:
                 1. Emotional tone (neutral, anxious, curious, distressed)
@@ -79,12 +104,12 @@ class ResponseGenerator:
         )
 
         # Using RunnableSequence
-        return prompt | self.llm
+        return prompt | self.router.runnable("analysis")
 
     def create_response_generation_chain(self):
         """Chain to generate the actual response using new syntax"""
         prompt = PromptTemplate(
-            input_variables=["analysis", "preferences", "base_prompt", "user_input"],
+            input_variables=["analysis", "preferences", "base_prompt", "context", "user_input"],
             template="""
                 Based on the analysis and user preferences, generate a therapeutic response:
 
@@ -97,6 +122,9 @@ class ResponseGenerator:
                 BASE PROTOCOL:
                 {base_prompt}
 
+                KNOWLEDGE BASE (use only what is relevant to the message):
+                {context}
+
                 USER'S MESSAGE:
                 {user_input}
 
@@ -111,7 +139,7 @@ class ResponseGenerator:
             """
         )
 
-        return prompt | self.llm
+        return prompt | self.router.runnable("chat")
 
     def create_structured_content_chain(self):
         """Chain specifically for generating structured content (JSON, scenarios, etc.)"""
@@ -128,118 +156,410 @@ class ResponseGenerator:
             """
         )
         
-        return prompt | self.llm
+        return prompt | self.router.runnable("structured")
 
-    def generate_response(self, user_input: str, preferences: dict, session_id: str = "default") -> str:
-        """Generate response using modern LangChain Runnable syntax"""
+    def create_summary_chain(self):
+        """Chain to condense the rolling summary of older conversation turns"""
+        prompt = PromptTemplate(
+            input_variables=["summary", "max_words"],
+            template="""
+                Rewrite these notes about the earlier part of a supportive conversation as a short summary.
+                Keep the user's name, concerns, feelings and anything they asked to remember.
+                Use at most {max_words} words and write plain sentences only.
+
+                NOTES:
+                {summary}
+
+                Summary:
+            """
+        )
+
+        return prompt | self.router.runnable("analysis")
+
+    def create_personalise_chain(self):
+        """Chain to adapt a cached reply to a similar earlier message to the current one"""
+        prompt = PromptTemplate(
+            input_variables=["cached_reply", "preferences", "history", "user_input"],
+            template="""
+                Adapt this earlier answer to a very similar question so it answers the user's message.
+                Keep its advice and its length. Match the user's preferences and the conversation so far.
+
+                EARLIER ANSWER:
+                {cached_reply}
+
+                USER PREFERENCES:
+                {preferences}
+
+                CONVERSATION SO FAR:
+                {history}
+
+                USER'S MESSAGE:
+                {user_input}
+
+                Response:
+            """
+        )
+
+        return prompt | self.router.runnable("feedback")
+
+    async def _llm_analysis(self, user_input: str, turn_count: int, history: str) -> str:
+        """Run the conversation-analysis chain and return its raw text"""
+        analysis_result = await self._ainvoke(self.analysis_chain, {
+            "user_input": user_input,
+            "turn_count": turn_count,
+            "history": history
+        })
+        return self._result_text(analysis_result)
+
+    @staticmethod
+    def _flags_safety_concern(analysis_text: str) -> bool:
+        return re.search(r'"safety_concern"\s*:\s*true', analysis_text, re.IGNORECASE) is not None
+
+    async def _retrieve_context(self, user_input: str) -> str:
+        """Knowledge-base passages for the message; retrieval problems never fail the turn"""
+        if self.retriever is None:
+            return ""
         try:
-            # ✅ Convert dict to UserPreferences model
-            from app.models.preferences import UserPreferences
-            user_prefs = UserPreferences(**preferences)
-            
-            # Get or create conversation state
-            if session_id not in self.conversation_state:
-                self.conversation_state[session_id] = {
-                    "turn_count": 0,
-                    "history": [],
-                    "engagement_level": "low"
-                }
-
-            state = self.conversation_state[session_id]
-            turn_count = state["turn_count"]
-
-            # ✅ Step 1: Analyze conversation context
-            analysis_chain = self.create_conversation_analysis_chain()
-            analysis_result = analysis_chain.invoke({
-                "user_input": user_input,
-                "turn_count": turn_count,
-                "history": str(state["history"][-3:])
-            })
+            return await asyncio.to_thread(self.retriever.context, user_input)
+        except Exception as e:
+            print(f"Knowledge-base retrieval failed: {e}")
+            return ""
+
+    def _response_inputs(self, user_prefs: UserPreferences, preferences: dict, state: dict,
+                         analysis_text: str, user_input: str, context: str) -> Dict[str, Any]:
+        """Build the base prompt and the inputs of the response chain"""
+        conversation_context = {
+            "turn_count": state["turn_count"],
+            "user_engagement_level": state["engagement_level"],
+            "prefers_detail": '"requires_immediate_detail": true' in analysis_text.lower()
+        }
 
-            # Extract text from analysis
-            analysis_text = analysis_result.content if hasattr(analysis_result, "content") else str(analysis_result)
-
-            # ✅ Step 2: Build base prompt using user preferences (now using user_prefs)
-            conversation_context = {
-                "turn_count": turn_count,
-                "user_engagement_level": state["engagement_level"],
-                "prefers_detail": '"requires_immediate_detail": true' in analysis_text.lower()
-            }
-
-            base_prompt = self.preference_processor._therapeutic_template(user_prefs, conversation_context)
-
-            # ✅ Step 3: Generate final response
-            response_chain = self.create_response_generation_chain()
-            response_result = response_chain.invoke({
-                "analysis": analysis_text,
-                "preferences": str(preferences),  # Keep as dict for the chain
-                "base_prompt": base_prompt,
-                "user_input": user_input
-            })
+        base_prompt = self.preference_processor._therapeutic_template(user_prefs, conversation_context)
+
+        return {
+            "analysis": analysis_text,
+            "preferences": str(preferences),  # Keep as dict for the chain
+            "base_prompt": base_prompt,
+            "context": context or "None",
+            "user_input": user_input
+        }
 
-            response_text = response_result.content if hasattr(response_result, "content") else str(response_result)
+    async def _prepare_turn(self, user_input: str, preferences: dict, session_id: str) -> Tuple[dict, Dict[str, Any], Optional[asyncio.Task]]:
+        """
+        Load session state, analyse the message and build the inputs for the response chain.
 
-            # ✅ Update conversation state
-            state["turn_count"] += 1
-            state["history"].append({"user": user_input, "assistant": response_text})
+        Depending on CHAT_ANALYSIS_MODE the analysis is the LLM chain ("llm"), the
+        local heuristic analyzer ("local"), or the local analyzer while the LLM
+        analysis runs in the background ("parallel"). In parallel mode the
+        background task is returned so callers can check it for safety concerns.
+        """
+        # ✅ Convert dict to UserPreferences model
+        user_prefs = UserPreferences(**preferences)
+        
+        # Get or create conversation state
+        state = await self._get_conversation_state(session_id)
+        turn_count = state["turn_count"]
+
+        # ✅ Step 1: Analyze conversation context (knowledge-base retrieval runs alongside)
+        retrieval = asyncio.create_task(self._retrieve_context(user_input))
+        pending_analysis = None
+        if settings.CHAT_ANALYSIS_MODE == "llm":
+            try:
+                analysis_text = await self._llm_analysis(user_input, turn_count, self.history.render(state))
+            except BaseException:
+                retrieval.cancel()
+                raise
+        else:
+            local_analysis = self.preference_processor.analyze_message(turn_count, user_input)
+            analysis_text = json.dumps(local_analysis)
+            if settings.CHAT_ANALYSIS_MODE == "parallel" and not local_analysis["safety_concern"]:
+                pending_analysis = asyncio.create_task(
+                    self._llm_analysis(user_input, turn_count, self.history.render(state)))
+
+        context = await retrieval
+
+        # ✅ Step 2: Build base prompt using user preferences (now using user_prefs)
+        return state, self._response_inputs(user_prefs, preferences, state, analysis_text, user_input, context), pending_analysis
+
+    async def _escalated_inputs(self, pending_analysis: Optional[asyncio.Task], preferences: dict,
+                                state: dict, user_input: str, context: str) -> Optional[Dict[str, Any]]:
+        """
+        Wait for the background LLM analysis. Returns response inputs rebuilt from
+        it when it flags a safety concern the local analyzer missed, else None.
+        """
+        if pending_analysis is None:
+            return None
+        try:
+            analysis_text = await pending_analysis
+        except Exception as e:
+            print(f"Background conversation analysis failed: {e}")
+            return None
+        if not self._flags_safety_concern(analysis_text):
+            return None
+        return self._response_inputs(UserPreferences(**preferences), preferences, state, analysis_text, user_input, context)
+
+    async def _commit_turn(self, session_id: str, state: dict, user_input: str, response_text: str) -> None:
+        """Record a completed turn and persist the session"""
+        started_summary = state["summary"]
+
+        # ✅ Update conversation state
+        state["turn_count"] += 1
+        self.history.add_turn(state, user_input, response_text)
+
+        # ✅ Update engagement level
+        if len(response_text.split()) > 50 or "explain" in user_input.lower():
+            state["engagement_level"] = "high"
+        elif len(response_text.split()) > 25:
+            state["engagement_level"] = "medium"
+
+        lock = self._summary_locks.get(session_id)
+        if lock is None:
+            await self._save_conversation_state(session_id, state)
+        else:
+            # A summary rewrite is running for this session: keep one it already stored
+            async with lock:
+                stored = await self._get_conversation_state(session_id)
+                if stored["summary"] != started_summary and stored["turn_count"] == state["turn_count"] - 1:
+                    self.history.apply_summary(state, started_summary, stored["summary"])
+                await self._save_conversation_state(session_id, state)
+
+        if state["summary_stale"] and settings.HISTORY_SUMMARY_MODE == "llm":
+            self._schedule_summary_refresh(session_id)
+
+    # ------------------- Rolling summary ------------------- #
+    def _schedule_summary_refresh(self, session_id: str) -> None:
+        """
+        Rewrite the session's rolling summary in the background, at most once at
+        a time per session. While it runs, the session has a lock that its write
+        and the session's turn commits take, so neither overwrites the other.
+        """
+        task = self._summary_tasks.get(session_id)
+        if task is not None and not task.done():
+            return
+        self._summary_locks[session_id] = asyncio.Lock()
+        task = asyncio.create_task(self._refresh_summary(session_id))
+        self._summary_tasks[session_id] = task
 
-            # ✅ Update engagement level
-            if len(response_text.split()) > 50 or "explain" in user_input.lower():
-                state["engagement_level"] = "high"
-            elif len(response_text.split()) > 25:
-                state["engagement_level"] = "medium"
+        def done(_):
+            self._summary_tasks.pop(session_id, None)
+            self._summary_locks.pop(session_id, None)
 
-            return response_text
+        task.add_done_callback(done)
 
+    async def _refresh_summary(self, session_id: str) -> None:
+        try:
+            state = await self._get_conversation_state(session_id)
+            previous = state["summary"]
+            if not previous or not state["summary_stale"]:
+                return
+
+            result = await self._ainvoke(self.summary_chain, {
+                "summary": previous,
+                "max_words": int(self.history.summary_budget * 0.7)
+            })
+            rewritten = self._result_text(result).strip()
+            if not rewritten:
+                return
+
+            # Re-read the state: turns may have been committed while the summary was written
+            async with self._summary_locks[session_id]:
+                state = await self._get_conversation_state(session_id)
+                self.history.apply_summary(state, previous, rewritten)
+                await self._save_conversation_state(session_id, state)
         except Exception as e:
-            return f"Error generating response: {str(e)}"
+            print(f"Summary refresh failed for session {session_id}: {e}")
 
-    def generate_structured_content(self, user_input: str, preferences: dict, session_id: str = "default") -> str:
+    # ------------------- Answer cache ------------------- #
+    async def _lookup_answer(self, user_input: str, preferences: dict, state: dict,
+                             response_inputs: Dict[str, Any]) -> Optional[AnswerLookup]:
         """
-        Generate structured content (like JSON scenarios) without conversation analysis overhead.
-        This method is optimized for scenario generation and other structured tasks.
+        Look the message up in the answer cache. None when the cache is off, the
+        turn is flagged as a safety concern, or the conversation already has
+        history: such turns are never served from, nor stored in, the cache.
+        Only opening messages are cached, so a reply that draws on one user's
+        conversation can never reach another user; nor are messages from users
+        with free-text notes. Replies are shared only between identical
+        preference profiles with the same retrieved context.
         """
+        if self.answer_cache is None or self._flags_safety_concern(response_inputs["analysis"]):
+            return None
+        if state["turn_count"] or state["history"] or state["summary"]:
+            return None
         try:
-            # Convert dict to UserPreferences model
             user_prefs = UserPreferences(**preferences)
-            
-            # Create simplified context for personalization
-            preferences_context = f"""
-            Communication Style: {user_prefs.communication_style}
-            Learning Style: {user_prefs.learning_style}
-            Age Group: {user_prefs.age_group}
-            Attention Span: {user_prefs.attention_span}
-            Primary Support Need: {user_prefs.primary_support}
-            Primary Condition: {user_prefs.primary_condition}
-            """
-            
-            # Use the structured content chain
-            content_chain = self.create_structured_content_chain()
-            result = content_chain.invoke({
-                "user_input": user_input,
-                "preferences_context": preferences_context
-            })
-            
-            # Extract text from result
-            response_text = result.content if hasattr(result, "content") else str(result)
-            
+            if not self.answer_cache.cacheable(user_prefs):
+                return None
+            bucket = self.answer_cache.bucket(user_prefs, response_inputs["context"])
+            return await self.answer_cache.lookup(user_input, bucket)
+        except Exception as e:
+            print(f"Answer cache lookup failed: {e}")
+            return None
+
+    def _store_answer(self, lookup: Optional[AnswerLookup], response_text: str) -> None:
+        """Cache a freshly generated reply (replies served from the cache are not stored again)"""
+        if lookup is not None and lookup.reply is None:
+            self.answer_cache.store(lookup, response_text)
+
+    def _personalise_inputs(self, reply: str, user_input: str, preferences: dict, state: dict) -> Dict[str, Any]:
+        return {
+            "cached_reply": reply,
+            "preferences": str(preferences),
+            "history": self.history.render(state),
+            "user_input": user_input
+        }
+
+    async def _reply_from_cache(self, reply: str, user_input: str, preferences: dict, state: dict) -> str:
+        if settings.ANSWER_CACHE_MODE != "personalise":
+            return reply
+        try:
+            result = await self._ainvoke(self.personalise_chain,
+                                         self._personalise_inputs(reply, user_input, preferences, state))
+            return self._result_text(result) or reply
+        except Exception as e:
+            print(f"Personalising a cached answer failed, serving it as is: {e}")
+            return reply
+
+    async def _astream_from_cache(self, reply: str, user_input: str, preferences: dict, state: dict) -> AsyncIterator[str]:
+        if settings.ANSWER_CACHE_MODE != "personalise":
+            yield reply
+            return
+        inputs = self._personalise_inputs(reply, user_input, preferences, state)
+        async with aclosing(self._astream_text(self.personalise_chain, inputs)) as tokens:
+            async for token in tokens:
+                yield token
+
+    async def close(self) -> None:
+        """Cancel pending summary refreshes and close the session store"""
+        tasks = list(self._summary_tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.session_store.close()
+
+    async def generate_response(self, user_input: str, preferences: dict, session_id: str = "default") -> str:
+        """Generate response using modern LangChain Runnable syntax"""
+        pending_analysis = None
+        try:
+            state, response_inputs, pending_analysis = await self._prepare_turn(user_input, preferences, session_id)
+            cached = await self._lookup_answer(user_input, preferences, state, response_inputs)
+
+            # ✅ Step 3: Generate final response (drafted while any background analysis finishes);
+            # a cached reply to a similar message stands in for the response chain
+            response_chain = self.response_chain
+            if cached is not None and cached.reply is not None:
+                draft = asyncio.create_task(self._reply_from_cache(cached.reply, user_input, preferences, state))
+            else:
+                draft = asyncio.create_task(self._ainvoke(response_chain, response_inputs))
+
+            escalated_inputs = await self._escalated_inputs(
+                pending_analysis, preferences, state, user_input, response_inputs["context"])
+            if escalated_inputs is not None:
+                draft.cancel()
+                response_result = await self._ainvoke(response_chain, escalated_inputs)
+            else:
+                response_result = await draft
+
+            response_text = self._result_text(response_result)
+            if escalated_inputs is None:
+                self._store_answer(cached, response_text)
+
+            await self._commit_turn(session_id, state, user_input, response_text)
+
             return response_text
 
         except Exception as e:
-            return f"Error generating structured content: {str(e)}"
+            return f"Error generating response: {str(e) or type(e).__name__}"
+        finally:
+            if pending_analysis is not None and not pending_analysis.done():
+                pending_analysis.cancel()
 
-    def generate_simple_feedback(self, user_input: str, preferences: dict, session_id: str = "default") -> str:
+    async def _astream_text(self, chain, inputs: Dict[str, Any]) -> AsyncIterator[str]:
         """
-        Generate simple feedback without full conversation analysis.
-        Optimized for quick feedback responses in learning scenarios.
+        Stream a chain's text chunks. Each wait for the next chunk holds a
+        concurrency slot and is capped at LLM_TIMEOUT_SECONDS; neither is held
+        while the caller consumes a token, so a long reply is not cut off and a
+        slow client does not hold a slot.
+        """
+        async with aclosing(chain.astream(inputs)) as stream:
+            while True:
+                async with self.llm_semaphore:
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(), timeout=settings.LLM_TIMEOUT_SECONDS)
+                    except StopAsyncIteration:
+                        return
+                token = self._result_text(chunk)
+                if token:
+                    yield token
+
+    async def stream_response(self, user_input: str, preferences: dict, session_id: str = "default") -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of generate_response. Yields a "start" event, one
+        "token" event per chunk of the reply and an "end" event, or an "error"
+        event. Session state is only saved once the whole reply has streamed.
+
+        While a background analysis is still running, drafted tokens are held
+        back, so a reply can be replaced if the analysis flags a safety concern.
         """
+        pending_analysis = None
         try:
-            user_prefs = UserPreferences(**preferences)
-            
-            # Create a simple feedback-focused prompt
-            feedback_prompt = PromptTemplate(
-                input_variables=["user_input", "communication_style", "age_group"],
-                template="""
+            state, response_inputs, pending_analysis = await self._prepare_turn(user_input, preferences, session_id)
+            cached = await self._lookup_answer(user_input, preferences, state, response_inputs)
+            yield {"event": "start", "session_id": session_id, "turn_count": state["turn_count"]}
+
+            chunks = []
+            held = pending_analysis is not None
+            escalated_inputs = None
+            response_chain = self.response_chain
+            if cached is not None and cached.reply is not None:
+                reply_tokens = self._astream_from_cache(cached.reply, user_input, preferences, state)
+            else:
+                reply_tokens = self._astream_text(response_chain, response_inputs)
+
+            async with aclosing(reply_tokens) as tokens:
+                async for token in tokens:
+                    chunks.append(token)
+                    if held and pending_analysis.done():
+                        held = False
+                        escalated_inputs = await self._escalated_inputs(
+                            pending_analysis, preferences, state, user_input, response_inputs["context"])
+                        if escalated_inputs is not None:
+                            break
+                        for held_token in chunks[:-1]:
+                            yield {"event": "token", "token": held_token}
+                    if not held:
+                        yield {"event": "token", "token": token}
+
+            if held:
+                escalated_inputs = await self._escalated_inputs(
+                    pending_analysis, preferences, state, user_input, response_inputs["context"])
+                if escalated_inputs is None:
+                    for held_token in chunks:
+                        yield {"event": "token", "token": held_token}
+
+            if escalated_inputs is not None:
+                chunks = []
+                async with aclosing(self._astream_text(response_chain, escalated_inputs)) as tokens:
+                    async for token in tokens:
+                        chunks.append(token)
+                        yield {"event": "token", "token": token}
+
+            response_text = "".join(chunks)
+            if escalated_inputs is None:
+                self._store_answer(cached, response_text)
+            await self._commit_turn(session_id, state, user_input, response_text)
+            yield {"event": "end", "session_id": session_id, "turn_count": state["turn_count"]}
+
+        except Exception as e:
+            yield {"event": "error", "session_id": session_id, "detail": f"Error generating response: {str(e) or type(e).__name__}"}
+        finally:
+            if pending_analysis is not None and not pending_analysis.done():
+                pending_analysis.cancel()
+
+    def create_simple_feedback_chain(self):
+        """Chain for short, supportive feedback in learning scenarios"""
+        prompt = PromptTemplate(
+            input_variables=["user_input", "communication_style", "age_group"],
+            template="""
                 Generate supportive, educational feedback based on this request:
                 
                 {user_input}
@@ -252,18 +572,142 @@ class ResponseGenerator:
                 - Avoid overwhelming language
                 
                 Feedback:
-                """
-            )
-            
-            feedback_chain = feedback_prompt | self.llm
-            result = feedback_chain.invoke({
-                "user_input": user_input,
-                "communication_style": user_prefs.communication_style,
-                "age_group": user_prefs.age_group
-            })
-            
-            response_text = result.content if hasattr(result, "content") else str(result)
-            return response_text.strip()
+            """
+        )
+
+        return prompt | self.router.runnable("feedback")
+
+    @staticmethod
+    def _result_text(result) -> str:
+        return result.content if hasattr(result, "content") else str(result)
+
+    async def _ainvoke(self, chain, inputs: Dict[str, Any]):
+        """Run a chain asynchronously under the concurrency limit and per-call timeout"""
+        async with self.llm_semaphore:
+            return await asyncio.wait_for(chain.ainvoke(inputs), timeout=settings.LLM_TIMEOUT_SECONDS)
+
+    # ------------------- Request coalescing ------------------- #
+    def _flight_key(self, chain, inputs: Dict[str, Any]) -> str:
+        """Hash of the rendered prompt and the model parameters it will be sent with"""
+        rendered = chain.first.format(**inputs)
+        params = chain.last.model_params()
+        return hashlib.sha256(json.dumps([rendered, params], default=str).encode("utf-8")).hexdigest()
+
+    async def _ainvoke_coalesced(self, chain, inputs: Dict[str, Any]):
+        """
+        `_ainvoke`, except that identical prompts already in flight are not sent
+        again: followers await the leader's call and share its result (or error).
+
+        Only for calls whose result may be shared by everyone asking the same
+        thing (scenario feedback, which is cached per input anyway). Scenario
+        content is not coalesced: concurrent sessions and content-pool refills
+        with the same prompt must each get their own sample.
+        """
+        key = self._flight_key(chain, inputs)
+        flight = self._in_flight.get(key)
+        if flight is None:
+            self.coalesced_leaders += 1
+            flight = asyncio.ensure_future(self._ainvoke(chain, inputs))
+            self._in_flight[key] = flight
+
+            def finished(done, key=key):
+                if self._in_flight.get(key) is done:
+                    del self._in_flight[key]
+                if not done.cancelled():
+                    done.exception()  # Mark retrieved when every caller has gone away
+
+            flight.add_done_callback(finished)
+        else:
+            self.coalesced_followers += 1
+        # A cancelled caller must not cancel the call the others are waiting on
+        return await asyncio.shield(flight)
+
+    def coalescing_stats(self) -> Dict[str, Any]:
+        calls = self.coalesced_leaders + self.coalesced_followers
+        return {
+            "in_flight": len(self._in_flight),
+            "upstream_calls": self.coalesced_leaders,
+            "coalesced_calls": self.coalesced_followers,
+            "coalesced_rate": self.coalesced_followers / calls if calls else None
+        }
+
+    def _structured_content_inputs(self, user_input: str, preferences: dict) -> Dict[str, Any]:
+        # Convert dict to UserPreferences model
+        user_prefs = UserPreferences(**preferences)
+        
+        # Create simplified context for personalization
+        preferences_context = f"""
+            Communication Style: {user_prefs.communication_style}
+            Learning Style: {user_prefs.learning_style}
+            Age Group: {user_prefs.age_group}
+            Attention Span: {user_prefs.attention_span}
+            Primary Support Need: {user_prefs.primary_support}
+            Primary Condition: {user_prefs.primary_condition}
+            """
+        return {
+            "user_input": user_input,
+            "preferences_context": preferences_context
+        }
+
+    def _simple_feedback_inputs(self, user_input: str, preferences: dict) -> Dict[str, Any]:
+        user_prefs = UserPreferences(**preferences)
+        return {
+            "user_input": user_input,
+            "communication_style": user_prefs.communication_style,
+            "age_group": user_prefs.age_group
+        }
+
+    def generate_structured_content(self, user_input: str, preferences: dict, session_id: str = "default") -> str:
+        """
+        Generate structured content (like JSON scenarios) without conversation analysis overhead.
+        This method is optimized for scenario generation and other structured tasks.
+        """
+        try:
+            result = self.structured_content_chain.invoke(
+                self._structured_content_inputs(user_input, preferences))
+            return self._result_text(result)
+
+        except Exception as e:
+            return f"Error generating structured content: {str(e)}"
+
+    async def agenerate_structured_content(self, user_input: str, preferences: dict, session_id: str = "default") -> str:
+        """Async variant of generate_structured_content (each call is a fresh sample, never coalesced)"""
+        try:
+            result = await self._ainvoke(
+                self.structured_content_chain,
+                self._structured_content_inputs(user_input, preferences))
+            return self._result_text(result)
+
+        except Exception as e:
+            return f"Error generating structured content: {str(e) or type(e).__name__}"
+
+    async def astream_structured_content(self, user_input: str, preferences: dict) -> AsyncIterator[str]:
+        """Stream the text of a structured-content generation as it is produced"""
+        inputs = self._structured_content_inputs(user_input, preferences)
+        async with aclosing(self._astream_text(self.structured_content_chain, inputs)) as tokens:
+            async for token in tokens:
+                yield token
+
+    def generate_simple_feedback(self, user_input: str, preferences: dict, session_id: str = "default") -> str:
+        """
+        Generate simple feedback without full conversation analysis.
+        Optimized for quick feedback responses in learning scenarios.
+        """
+        try:
+            result = self.simple_feedback_chain.invoke(
+                self._simple_feedback_inputs(user_input, preferences))
+            return self._result_text(result).strip()
+
+        except Exception as e:
+            return f"Error generating feedback: {str(e)}"
+
+    async def agenerate_simple_feedback(self, user_input: str, preferences: dict, session_id: str = "default") -> str:
+        """Async variant of generate_simple_feedback"""
+        try:
+            result = await self._ainvoke_coalesced(
+                self.simple_feedback_chain,
+                self._simple_feedback_inputs(user_input, preferences))
+            return self._result_text(result).strip()
 
         except Exception as e:
-            return f"Error generating feedback: {str(e)}"
\ No newline at end of file
+            return f"Error generating feedback: {str(e) or type(e).__name__}"
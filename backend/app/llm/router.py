@@ -0,0 +1,336 @@
+# app/llm/router.py
+import asyncio
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables import Runnable
+
+from app.core.config import settings
+
+TASKS = ("chat", "analysis", "structured", "feedback")
+
+
+def json_mode(llm):
+    """The LLM with the provider's JSON mode enabled, when it is a chat model"""
+    if isinstance(llm, BaseChatModel):
+        return llm.bind(response_format={"type": "json_object"})
+    return llm
+
+
+def create_chat_model(spec: str, max_tokens: int = 1000, temperature: float = 0.7):
+    """
+    Chat model for an endpoint spec "provider:model" (or just "model" for Groq).
+    Providers other than Groq are optional dependencies.
+    """
+    provider, _, model = spec.partition(":") if ":" in spec.split("/")[0] else ("groq", "", spec)
+    if provider == "groq":
+        from langchain_groq import ChatGroq
+        return ChatGroq(groq_api_key=settings.GROQ_API_KEY, model_name=model,
+                        temperature=temperature, max_tokens=max_tokens)
+    if provider == "openai":
+        try:
+            from langchain_openai import ChatOpenAI
+        except ImportError:
+            raise ImportError("The openai provider needs the langchain-openai package")
+        return ChatOpenAI(api_key=settings.OPENAI_API_KEY or None, model=model,
+                          temperature=temperature, max_tokens=max_tokens)
+    raise ValueError(f"Unknown LLM provider: {provider}. Available: ['groq', 'openai']")
+
+
+class ModelEndpoint:
+    """
+    One model behind the router, with rolling latency and error statistics.
+    An endpoint listed for several tasks is one object, so they share them.
+    """
+
+    def __init__(self, name: str, llm, window: int = 200):
+        self.name = name
+        self.llm = llm
+        self._json_llm = None
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)  # True for a successful call
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+
+    @property
+    def json_llm(self):
+        if self._json_llm is None:
+            self._json_llm = json_mode(self.llm)
+        return self._json_llm
+
+    def record(self, seconds: Optional[float], ok: bool) -> None:
+        self.outcomes.append(ok)
+        if ok and seconds is not None:
+            self.latencies.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+    @property
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.cooldown_until
+
+    def stats(self) -> Dict[str, Any]:
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        return {
+            "calls": len(self.outcomes),
+            "error_rate": self.error_rate,
+            "p50_ms": p50 * 1000 if p50 is not None else None,
+            "p95_ms": p95 * 1000 if p95 is not None else None,
+            "in_flight": self.in_flight,
+            "healthy": self.healthy
+        }
+
+
+class LLMRouter:
+    """
+    Routes each task type (chat, analysis, structured, feedback) to an ordered
+    list of model endpoints.
+
+    Calls go to the first healthy endpoint and fail over down the list on
+    errors. An endpoint whose recent error rate passes `max_error_rate` is
+    skipped for `cooldown_seconds`. Non-streaming calls are hedged: if the
+    primary has not answered after its rolling p95 latency (at least
+    `hedge_min_seconds`), the next endpoint is called too and the first answer
+    wins. An async attempt that runs past `attempt_timeout_seconds` counts as
+    a failure and the next endpoint is tried, so a stalled endpoint fails over
+    and cools down like one that errors. Streams fail over only until their
+    first chunk arrives.
+    """
+
+    def __init__(self, routes: Dict[str, Sequence[ModelEndpoint]], hedge: bool = True,
+                 hedge_min_seconds: float = 1.0, max_error_rate: float = 0.5,
+                 cooldown_seconds: float = 30.0, min_samples: int = 10,
+                 attempt_timeout_seconds: Optional[float] = None):
+        missing = [task for task in TASKS if not routes.get(task)]
+        if missing:
+            raise ValueError(f"No LLM endpoints configured for: {missing}")
+        self.routes = {task: list(endpoints) for task, endpoints in routes.items()}
+        self.hedge = hedge
+        self.hedge_min_seconds = hedge_min_seconds
+        self.max_error_rate = max_error_rate
+        self.cooldown_seconds = cooldown_seconds
+        self.min_samples = min_samples
+        self.attempt_timeout_seconds = attempt_timeout_seconds
+        self.failovers = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+
+    @classmethod
+    def single(cls, llm, **options) -> "LLMRouter":
+        """Every task on one LLM"""
+        endpoint = ModelEndpoint("default", llm)
+        return cls({task: [endpoint] for task in TASKS}, **options)
+
+    @classmethod
+    def from_settings(cls) -> "LLMRouter":
+        """Routes from the LLM_ROUTE_* settings"""
+        endpoints: Dict[str, ModelEndpoint] = {}
+        routes = {}
+        for task in TASKS:
+            for spec in settings.llm_route(task):
+                if spec not in endpoints:
+                    endpoints[spec] = ModelEndpoint(spec, create_chat_model(spec))
+            routes[task] = [endpoints[spec] for spec in settings.llm_route(task)]
+        return cls(routes, hedge=settings.LLM_HEDGING, hedge_min_seconds=settings.LLM_HEDGE_MIN_SECONDS,
+                   attempt_timeout_seconds=settings.LLM_ATTEMPT_TIMEOUT_SECONDS or None)
+
+    def runnable(self, task: str) -> "RoutedLLM":
+        return RoutedLLM(self, task)
+
+    # ------------------- Endpoint selection ------------------- #
+    @staticmethod
+    def _llm(task: str, endpoint: ModelEndpoint):
+        if task == "structured" and settings.STRUCTURED_OUTPUT_MODE == "json_mode":
+            return endpoint.json_llm
+        return endpoint.llm
+
+    def _candidates(self, task: str) -> List[ModelEndpoint]:
+        """Healthy endpoints in configured order, then the unhealthy ones as a last resort"""
+        endpoints = self.routes[task]
+        return [e for e in endpoints if e.healthy] + [e for e in endpoints if not e.healthy]
+
+    def _record(self, endpoint: ModelEndpoint, started: float, ok: bool) -> None:
+        endpoint.record(time.perf_counter() - started, ok)
+        if not ok and len(endpoint.outcomes) >= self.min_samples and endpoint.error_rate > self.max_error_rate:
+            endpoint.cooldown_until = time.monotonic() + self.cooldown_seconds
+            endpoint.outcomes.clear()  # Start afresh after the cooldown
+
+    def _hedge_delay(self, endpoint: ModelEndpoint) -> Optional[float]:
+        if not self.hedge or len(endpoint.latencies) < self.min_samples:
+            return None
+        return max(self.hedge_min_seconds, endpoint.percentile(0.95))
+
+    # ------------------- Calls ------------------- #
+    def invoke(self, task: str, prompt, **kwargs):
+        error = None
+        for i, endpoint in enumerate(self._candidates(task)):
+            if i:
+                self.failovers += 1
+            started = time.perf_counter()
+            try:
+                result = self._llm(task, endpoint).invoke(prompt, **kwargs)
+            except Exception as e:
+                self._record(endpoint, started, False)
+                error = e
+                continue
+            self._record(endpoint, started, True)
+            return result
+        raise error
+
+    async def _call(self, task: str, endpoint: ModelEndpoint, prompt, **kwargs):
+        started = time.perf_counter()
+        endpoint.in_flight += 1
+        try:
+            result = await self._llm(task, endpoint).ainvoke(prompt, **kwargs)
+        except asyncio.CancelledError:
+            raise  # A hedge that lost says nothing about the endpoint
+        except Exception:
+            self._record(endpoint, started, False)
+            raise
+        finally:
+            endpoint.in_flight -= 1
+        self._record(endpoint, started, True)
+        return result
+
+    async def ainvoke(self, task: str, prompt, **kwargs):
+        candidates = self._candidates(task)
+        calls: Dict[asyncio.Future, int] = {}  # In-flight call -> index of its endpoint
+        started: Dict[asyncio.Future, float] = {}
+        error = None
+        hedged = False
+        launched = 0
+
+        def launch():
+            nonlocal launched
+            call = asyncio.ensure_future(self._call(task, candidates[launched], prompt, **kwargs))
+            calls[call] = launched
+            started[call] = time.perf_counter()
+            launched += 1
+
+        launch()
+        try:
+            while calls:
+                wake = []  # Times at which an attempt expires or the primary is hedged
+                if self.attempt_timeout_seconds:
+                    wake = [started[call] + self.attempt_timeout_seconds for call in calls]
+                hedge_at = None
+                if launched < len(candidates) and len(calls) == 1:
+                    delay = self._hedge_delay(candidates[launched - 1])
+                    if delay is not None:
+                        hedge_at = started[next(iter(calls))] + delay
+                        wake.append(hedge_at)
+                timeout = max(0.0, min(wake) - time.perf_counter()) if wake else None
+                done, _ = await asyncio.wait(list(calls), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    now = time.perf_counter()
+                    expired = [call for call in calls
+                               if self.attempt_timeout_seconds and now - started[call] >= self.attempt_timeout_seconds]
+                    for call in expired:
+                        # A stalled endpoint is a failed one: give up on it and try the next
+                        endpoint = candidates[calls.pop(call)]
+                        call.cancel()
+                        self._record(endpoint, started.pop(call), False)
+                        self.timeouts += 1
+                        error = asyncio.TimeoutError(
+                            f"{endpoint.name} did not answer within {self.attempt_timeout_seconds}s")
+                    if not expired and hedge_at is not None and now >= hedge_at:
+                        # Slower than its rolling p95: hedge with the next endpoint
+                        self.hedges += 1
+                        hedged = True
+                        launch()
+                        continue
+
+                for finished in done:
+                    index = calls.pop(finished)
+                    started.pop(finished)
+                    if finished.exception() is None:
+                        if hedged and index > 0:
+                            self.hedge_wins += 1
+                        return finished.result()
+                    error = finished.exception()
+
+                if not calls and launched < len(candidates):
+                    self.failovers += 1
+                    launch()
+            raise error
+        finally:
+            for leftover in calls:
+                leftover.cancel()
+
+    async def astream(self, task: str, prompt, **kwargs) -> AsyncIterator[Any]:
+        error = None
+        for i, endpoint in enumerate(self._candidates(task)):
+            if i:
+                self.failovers += 1
+            started = time.perf_counter()
+            first_chunk = True
+            endpoint.in_flight += 1
+            try:
+                async for chunk in self._llm(task, endpoint).astream(prompt, **kwargs):
+                    if first_chunk:
+                        # Latency to first chunk is what a streaming caller waits for
+                        self._record(endpoint, started, True)
+                        first_chunk = False
+                    yield chunk
+                if first_chunk:
+                    self._record(endpoint, started, True)
+                return
+            except Exception as e:
+                if first_chunk:
+                    self._record(endpoint, started, False)
+                    error = e
+                    continue
+                raise  # Part of the reply was already sent
+            finally:
+                endpoint.in_flight -= 1
+        raise error
+
+    def endpoint_names(self, task: str) -> List[str]:
+        return [endpoint.name for endpoint in self.routes[task]]
+
+    def stats(self) -> Dict[str, Any]:
+        endpoints = {}
+        for task in TASKS:
+            for endpoint in self.routes[task]:
+                endpoints.setdefault(endpoint.name, endpoint.stats())
+        return {
+            "routes": {task: self.endpoint_names(task) for task in TASKS},
+            "endpoints": endpoints,
+            "failovers": self.failovers,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "timeouts": self.timeouts
+        }
+
+
+class RoutedLLM(Runnable):
+    """The router for one task type, usable as the LLM step of a chain (`prompt | router.runnable(task)`)"""
+
+    def __init__(self, router: LLMRouter, task: str):
+        self.router = router
+        self.task = task
+
+    def model_params(self) -> List[str]:
+        return [self.task, *self.router.endpoint_names(self.task)]
+
+    def invoke(self, input, config=None, **kwargs):
+        return self.router.invoke(self.task, input, **kwargs)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        return await self.router.ainvoke(self.task, input, **kwargs)
+
+    async def astream(self, input, config=None, **kwargs):
+        async for chunk in self.router.astream(self.task, input, **kwargs):
+            yield chunk
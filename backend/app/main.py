@@ -2,19 +2,40 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
 from app.core.config import settings
+from app.core.container import services
 from app.api.routes import router as api_router
 from app.api.scenario_routes import router as scenario_router
 import logging
+import time
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# The knowledge-base API needs chromadb; the rest of the app runs without it
+try:
+    from app.api.kb_routes import router as kb_router
+except ImportError as e:
+    kb_router = None
+    logger.warning(f"Knowledge-base API disabled: {e}")
+
+process_started_at = time.monotonic()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Heavy services warm up in the background; /health/ready reports when they are done
+    await services.startup()
+    logger.info(f"Accepting connections {time.monotonic() - process_started_at:.2f}s after import")
+    yield
+    await services.shutdown()
+
 app = FastAPI(
     title="Neurodiversity Learning Platform API",
     description="API for neurodiversity-affirming learning experiences and scenario-based education",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware - allow requests from your Next.js app
@@ -47,6 +68,8 @@ async def global_exception_handler(request, exc):
 # Include API routes
 app.include_router(api_router, prefix="/api/v1")
 app.include_router(scenario_router, prefix="/api/v1/scenarios")
+if kb_router is not None:
+    app.include_router(kb_router, prefix="/api/v1")
 
 @app.get("/")
 async def root():
@@ -56,14 +79,36 @@ async def root():
         "endpoints": {
             "chat": "/api/v1/generate-response",
             "scenarios": "/api/v1/scenarios/",
-            "health": "/health"
+            "knowledge_base": "/api/v1/kb/",
+            "health": "/health",
+            "ready": "/health/ready"
         }
     }
 
 @app.get("/health")
 async def health_check():
+    """Liveness: the process is up and serving requests"""
     return {
         "status": "healthy", 
         "service": "neurodiversity-learning-platform",
-        "version": "1.0.0"
-    }
\ No newline at end of file
+        "version": "1.0.0",
+        "uptime_seconds": time.monotonic() - process_started_at,
+        "ready": services.ready
+    }
+
+@app.get("/health/ready")
+async def readiness_check():
+    """
+    Readiness: models and indexes are loaded; returns 503 while warming up.
+    Once ready, "degraded" (still 200) names components that failed to load
+    and are being retried, such as the RAG index.
+    """
+    status = services.status()
+    if not status["ready"]:
+        state = "starting"
+    else:
+        state = "degraded" if status["degraded"] else "ready"
+    return JSONResponse(
+        status_code=200 if status["ready"] else 503,
+        content={"status": state, **status}
+    )
\ No newline at end of file
@@ -0,0 +1,73 @@
+# app/retrieval/bm25.py
+import heapq
+import math
+import re
+from typing import Dict, List, Tuple
+
+TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do for from has have how i if in is it its me my no not "
+    "of on or so that the their them then there these they this to was we what when which who "
+    "why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    In-memory Okapi BM25 over an inverted index (term -> {document: term frequency}).
+
+    Documents are added incrementally; IDF and the average document length are
+    computed at query time, so an add never rescans the corpus. Adding an id
+    that is already indexed is a no-op.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.ids: List[str] = []
+        self.lengths: List[int] = []
+        self.total_length = 0
+        self._rows: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._rows
+
+    def add(self, doc_id: str, text: str) -> bool:
+        if doc_id in self._rows:
+            return False
+        row = len(self.ids)
+        self._rows[doc_id] = row
+        self.ids.append(doc_id)
+        tokens = tokenize(text)
+        self.lengths.append(len(tokens))
+        self.total_length += len(tokens)
+        for token in tokens:
+            postings = self.postings.setdefault(token, {})
+            postings[row] = postings.get(row, 0) + 1
+        return True
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Top-k (id, score) for a query, best first"""
+        if not self.ids:
+            return []
+        count = len(self.ids)
+        average_length = self.total_length / count or 1.0
+        scores: Dict[int, float] = {}
+        for token in set(tokenize(query)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for row, frequency in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[row] / average_length)
+                scores[row] = scores.get(row, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(self.ids[row], score) for row, score in best]
@@ -0,0 +1,181 @@
+# app/retrieval/hybrid.py
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.llm.conversation_history import estimate_tokens, truncate_tokens
+from app.retrieval.bm25 import BM25Index
+
+PASSAGE_FIELDS = ("id", "title", "source", "content")
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists: each id scores sum(1 / (k + rank)) over the lists it appears in"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def format_passages(passages: Sequence[Dict[str, Any]], token_budget: int) -> str:
+    """
+    Numbered passages for a prompt, best first, within `token_budget`
+    estimated tokens. A passage that does not fit is cut if enough budget
+    is left to be useful, otherwise it and the rest are dropped.
+    """
+    lines, used = [], 0
+    for number, passage in enumerate(passages, start=1):
+        source = f" ({passage['source']})" if passage.get("source") else ""
+        line = f"[{number}] {passage['title']}{source}: {passage['content']}"
+        cost = estimate_tokens(line)
+        if used + cost > token_budget:
+            remaining = token_budget - used
+            if remaining >= 40:
+                lines.append(truncate_tokens(line, remaining))
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(lines)
+
+
+class KnowledgeRetriever:
+    """
+    Hybrid retrieval over the knowledge base for RAG.
+
+    A query runs against an in-memory BM25 index and the vector store, each
+    returning `candidates` ids, and the two rankings are merged with
+    reciprocal-rank fusion. BM25 catches exact terms (names, jargon) that
+    embeddings blur; the vectors catch paraphrases BM25 misses.
+
+    `store` provides `embed_texts(texts)`, `vector_search(embedding, k)` and
+    `iter_kb_entries(fields)` (the kb_service module does). The BM25 side and
+    the passage texts are loaded from the store by `load` (container warm-up)
+    or by a background thread that the first KB write or a failed warm-up
+    starts, retrying with exponential backoff until a load succeeds;
+    afterwards `add` keeps them in step with new KB writes. Retrieval never
+    loads the index itself: until it is ready it returns nothing, and `stats`
+    reports the last load error.
+    """
+
+    RETRY_MIN_SECONDS = 1.0
+    RETRY_MAX_SECONDS = 60.0
+
+    def __init__(self, store, top_k: int = 4, candidates: int = 20,
+                 token_budget: int = 400, rrf_k: int = 60):
+        self.store = store
+        self.top_k = top_k
+        self.candidates = candidates
+        self.token_budget = token_budget
+        self.rrf_k = rrf_k
+        self.bm25 = BM25Index()
+        self.passages: Dict[str, Dict[str, Any]] = {}
+        self.loaded = False
+        self._loading = False
+        self._loader: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.load_error: Optional[str] = None
+        self.load_attempts = 0
+        self.retrievals = 0
+        self.latencies = deque(maxlen=500)
+
+    # ------------------- Indexing ------------------- #
+    def _index(self, entry: Dict[str, Any]) -> None:
+        if entry["id"] in self.passages:
+            return
+        passage = {field: entry.get(field) or "" for field in PASSAGE_FIELDS}
+        self.passages[passage["id"]] = passage
+        self.bm25.add(passage["id"], f"{passage['title']} {passage['content']}")
+
+    def load(self) -> None:
+        """Index every KB entry once; later calls return immediately"""
+        if self.loaded:
+            return
+        with self._lock:
+            if self.loaded:
+                return
+            self._loading = True
+            self.load_attempts += 1
+            try:
+                started = time.perf_counter()
+                for _, entry in self.store.iter_kb_entries(PASSAGE_FIELDS):
+                    self._index(entry)
+                self.loaded = True
+                self.load_error = None
+                print(f"[KnowledgeRetriever] Indexed {len(self.passages)} passages "
+                      f"in {time.perf_counter() - started:.2f}s")
+            except Exception as e:
+                self.load_error = str(e) or type(e).__name__
+                raise
+            finally:
+                self._loading = False
+
+    def load_in_background(self) -> None:
+        """Load on a daemon thread, retrying with exponential backoff until it succeeds (one thread at a time)"""
+        if self.loaded or (self._loader is not None and self._loader.is_alive()):
+            return
+
+        def run():
+            delay = self.RETRY_MIN_SECONDS
+            while not self.loaded:
+                try:
+                    self.load()
+                except Exception as e:
+                    print(f"[KnowledgeRetriever] Warning: Could not load the index, retrying in {delay:.0f}s: {e}")
+                    time.sleep(delay)
+                    delay = min(delay * 2, self.RETRY_MAX_SECONDS)
+
+        self._loader = threading.Thread(target=run, name="kb-retriever-load", daemon=True)
+        self._loader.start()
+
+    def add(self, entries: Iterable[Dict[str, Any]]) -> None:
+        """
+        Index newly stored entries. Before the index exists this starts loading
+        it in the background instead, and the load reads them from the store.
+        """
+        entries = list(entries)
+        if not self.loaded and not self._loading:
+            self.load_in_background()
+            return
+        with self._lock:  # Waits for a load in progress, then indexes anything it missed
+            for entry in entries:
+                self._index(entry)
+
+    # ------------------- Retrieval ------------------- #
+    def retrieve(self, query: str, k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Top passages for a query, best first, each with its fused `score` (none until loaded)"""
+        if not self.loaded or not self.passages or not query.strip():
+            return []
+        started = time.perf_counter()
+        with self._lock:
+            lexical = [doc_id for doc_id, _ in self.bm25.search(query, self.candidates)]
+        embedding = self.store.embed_texts([query])[0]
+        semantic = self.store.vector_search(embedding, self.candidates)
+
+        fused = reciprocal_rank_fusion([lexical, semantic], self.rrf_k)
+        results = [dict(self.passages[doc_id], score=score) for doc_id, score in fused if doc_id in self.passages]
+        self.retrievals += 1
+        self.latencies.append(time.perf_counter() - started)
+        return results[:k or self.top_k]
+
+    def context(self, query: str) -> str:
+        """Prompt-ready context for a query within the token budget ("" if nothing was found)"""
+        return format_passages(self.retrieve(query), self.token_budget)
+
+    def stats(self) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+
+        def percentile(fraction: float) -> Optional[float]:
+            return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000 if ordered else None
+
+        return {
+            "loaded": self.loaded,
+            "load_error": self.load_error,
+            "load_attempts": self.load_attempts,
+            "passages": len(self.passages),
+            "terms": len(self.bm25.postings),
+            "retrievals": self.retrievals,
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95)
+        }
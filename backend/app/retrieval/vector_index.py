@@ -0,0 +1,284 @@
+# app/retrieval/vector_index.py
+import hashlib
+from abc import ABC, abstractmethod
+
+import numpy as np
+from pathlib import Path
+from typing import Optional, Tuple
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalise each row so cosine similarity becomes a dot product"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def embeddings_fingerprint(embeddings: np.ndarray) -> str:
+    """Short digest of an embedding matrix, used to detect stale persisted indexes"""
+    data = np.ascontiguousarray(embeddings, dtype=np.float32)
+    digest = hashlib.sha1(data.tobytes())
+    digest.update(str(data.shape).encode())
+    return digest.hexdigest()
+
+
+class VectorIndex(ABC):
+    """
+    Base class for scenario embedding indexes.
+
+    `candidates` returns the rows an index chooses to score for a query together
+    with their cosine similarities. Exact indexes return every row, approximate
+    ones only a subset, and callers apply filters and bonuses on top.
+
+    Rows are L2-normalised once at build time and stored as float32, float16 or
+    int8 (per-row scalar quantisation). With a quantised store the best
+    `rerank` rows of each query are re-scored in float32 from the source
+    embeddings; only then is the source kept, and it should be a memory-mapped
+    file (`ScenarioService` always passes one) so that the re-rank pages in
+    just the rows it reads instead of holding the float32 matrix in memory.
+    """
+
+    backend = "base"
+    DTYPES = ("float32", "float16", "int8")
+    CHUNK_ROWS = 4096
+
+    def __init__(self, embeddings: np.ndarray, dtype: str = "float32", rerank: int = 100):
+        if dtype not in self.DTYPES:
+            raise ValueError(f"Unknown index dtype: {dtype}. Available: {list(self.DTYPES)}")
+        self.dtype = dtype
+        self.rerank = rerank
+        # Only a quantised store with re-ranking reads the source after the build
+        self.source = embeddings if dtype != "float32" and rerank > 0 else None
+        self.fingerprint = embeddings_fingerprint(embeddings)
+        self.scales = None
+
+        vectors = normalize_rows(embeddings) if len(embeddings) else np.zeros((0, 0), dtype=np.float32)
+        if dtype == "float16":
+            vectors = vectors.astype(np.float16)
+        elif dtype == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            vectors = np.round(vectors / scales[:, None]).astype(np.int8)
+            self.scales = scales.astype(np.float32)
+        self.vectors = vectors
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def memory_bytes(self) -> int:
+        """
+        Resident size of the index: the stored vectors, plus the re-rank source
+        when it is an in-memory array (see `mapped_bytes` for a memory-mapped one)
+        """
+        size = self.vectors.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+        if self.source is not None and not isinstance(self.source, np.memmap):
+            size += self.source.nbytes
+        return size
+
+    def mapped_bytes(self) -> int:
+        """Size of a memory-mapped re-rank source, paged in from disk only as rows are read"""
+        return self.source.nbytes if isinstance(self.source, np.memmap) else 0
+
+    def _dense(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Stored vectors as float32 (dequantised if needed)"""
+        vectors = self.vectors if rows is None else self.vectors[rows]
+        if self.dtype == "float32":
+            return vectors
+        vectors = vectors.astype(np.float32)
+        if self.scales is not None:
+            vectors *= (self.scales if rows is None else self.scales[rows])[:, None]
+        return vectors
+
+    def _score(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Cosine similarity of a normalised query against the given rows (all rows if None)"""
+        if self.dtype == "float32":
+            return (self.vectors if rows is None else self.vectors[rows]) @ query
+
+        # Upcast in cache-sized chunks; int8 row scales are applied to the scores, not the matrix
+        vectors = self.vectors if rows is None else self.vectors[rows]
+        count = len(vectors)
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, self.CHUNK_ROWS):
+            stop = start + self.CHUNK_ROWS
+            scores[start:stop] = vectors[start:stop].astype(np.float32) @ query
+        if self.scales is not None:
+            scores *= self.scales if rows is None else self.scales[rows]
+
+        # Exact float32 re-rank of the best candidates
+        if self.rerank > 0 and count:
+            top = np.argpartition(-scores, min(self.rerank, count) - 1)[:self.rerank]
+            top_rows = top if rows is None else rows[top]
+            order = np.argsort(top_rows)
+            exact = normalize_rows(np.asarray(self.source[top_rows[order]])) @ query
+            scores[top[order]] = exact
+        return scores
+
+    @abstractmethod
+    def candidates(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows scored for a query (restricted to `rows` if given) and their cosine similarities"""
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k rows and similarities for a query, best first"""
+        rows, scores = self.candidates(query)
+        order = np.argsort(-scores, kind="stable")[:k]
+        return rows[order], scores[order]
+
+    # ------------------- Persistence ------------------- #
+    def _state(self) -> dict:
+        return {}
+
+    def save(self, path: Path) -> None:
+        np.savez(path, backend=self.backend, fingerprint=self.fingerprint, **self._state())
+
+    def _matches(self, data) -> bool:
+        """Whether a persisted state was built with this index's build parameters"""
+        return True
+
+    def _load_state(self, data) -> None:
+        pass
+
+    @classmethod
+    def load(cls, path: Path, embeddings: np.ndarray, **params) -> Optional["VectorIndex"]:
+        """
+        Load a persisted index, or return None if it is missing or was built for
+        other embeddings or build parameters
+        """
+        if not Path(path).exists():
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            if str(data["backend"]) != cls.backend:
+                return None
+            index = cls(embeddings, build=False, **params)
+            if str(data["fingerprint"]) != index.fingerprint or not index._matches(data):
+                return None
+            index._load_state(data)
+        return index
+
+
+class ExactIndex(VectorIndex):
+    """Brute-force cosine similarity over every row"""
+
+    backend = "exact"
+
+    def __init__(self, embeddings: np.ndarray, build: bool = True, **storage):
+        super().__init__(embeddings, **storage)
+
+    def candidates(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        query = normalize_rows(query)[0]
+        if rows is None:
+            return np.arange(len(self.vectors)), self._score(query)
+        return rows, self._score(query, rows)
+
+
+class IVFIndex(VectorIndex):
+    """
+    Inverted-file index: rows are clustered with spherical k-means and a query
+    only scores the rows in its `nprobe` closest clusters.
+    """
+
+    backend = "ivf"
+
+    def __init__(self, embeddings: np.ndarray, nlist: int = 0, nprobe: int = 8,
+                 build: bool = True, iterations: int = 10, seed: int = 0, **storage):
+        super().__init__(embeddings, **storage)
+        self.nlist = nlist or max(1, int(np.sqrt(len(self.vectors))))
+        self.nlist = min(self.nlist, max(1, len(self.vectors)))
+        self.nprobe = max(1, min(nprobe, self.nlist))
+        self.iterations = iterations
+        self.seed = seed
+        self.centroids = np.zeros((0, self.vectors.shape[1] if self.vectors.ndim == 2 else 0), dtype=np.float32)
+        self.assignments = np.zeros(len(self.vectors), dtype=np.int32)
+        self._lists = []
+        if build and len(self.vectors):
+            self._train()
+            self._build_lists()
+
+    def _train(self) -> None:
+        vectors = self._dense()
+        rng = np.random.default_rng(self.seed)
+        centroids = vectors[rng.choice(len(vectors), self.nlist, replace=False)].copy()
+        for _ in range(self.iterations):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            for c in range(self.nlist):
+                members = vectors[assignments == c]
+                if len(members):
+                    centroids[c] = members.sum(axis=0)
+            centroids = normalize_rows(centroids)
+        self.centroids = centroids
+        self.assignments = np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+
+    def _build_lists(self) -> None:
+        order = np.argsort(self.assignments, kind="stable")
+        bounds = np.searchsorted(self.assignments[order], np.arange(self.nlist + 1))
+        self._lists = [order[bounds[c]:bounds[c + 1]] for c in range(self.nlist)]
+
+    def candidates(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        query = normalize_rows(query)[0]
+        if not self._lists:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        probes = np.argsort(-(self.centroids @ query))[:self.nprobe]
+        probed = np.sort(np.concatenate([self._lists[c] for c in probes]))
+        if rows is not None:
+            probed = np.intersect1d(probed, rows, assume_unique=True)
+        return probed, self._score(query, probed)
+
+    def _state(self) -> dict:
+        return {"nlist": self.nlist, "centroids": self.centroids, "assignments": self.assignments}
+
+    def _matches(self, data) -> bool:
+        # Indexes saved before nlist was recorded are rebuilt once
+        return "nlist" in data and int(data["nlist"]) == self.nlist
+
+    def _load_state(self, data) -> None:
+        self.centroids = data["centroids"]
+        self.assignments = data["assignments"]
+        self.nlist = len(self.centroids)
+        self.nprobe = max(1, min(self.nprobe, self.nlist))
+        self._build_lists()
+
+
+INDEX_BACKENDS = {
+    ExactIndex.backend: ExactIndex,
+    IVFIndex.backend: IVFIndex,
+}
+
+
+def load_or_build_index(backend: str, embeddings: np.ndarray, path: Optional[Path] = None, **params) -> VectorIndex:
+    """Load a persisted index for these embeddings if one exists, otherwise build (and persist) it"""
+    if backend not in INDEX_BACKENDS:
+        raise ValueError(f"Unknown index backend: {backend}. Available: {list(INDEX_BACKENDS.keys())}")
+    index_cls = INDEX_BACKENDS[backend]
+
+    if path is not None and backend != ExactIndex.backend:
+        try:
+            index = index_cls.load(path, embeddings, **params)
+            if index is not None:
+                return index
+        except Exception as e:
+            print(f"[VectorIndex] Warning: Could not load index: {str(e)}")
+
+    index = index_cls(embeddings, **params)
+
+    if path is not None and backend != ExactIndex.backend:
+        try:
+            index.save(path)
+        except Exception as e:
+            print(f"[VectorIndex] Warning: Could not save index: {str(e)}")
+
+    return index
+
+
+def measure_recall(index: VectorIndex, exact: VectorIndex, queries: np.ndarray, k: int = 10) -> float:
+    """Mean recall@k of `index` against exact search over the given queries"""
+    if len(exact) == 0 or len(queries) == 0:
+        return 1.0
+    k = min(k, len(exact))
+    hits = 0
+    for query in np.atleast_2d(queries):
+        approx_rows, _ = index.search(query, k)
+        exact_rows, _ = exact.search(query, k)
+        hits += len(np.intersect1d(approx_rows, exact_rows))
+    return hits / (k * len(np.atleast_2d(queries)))
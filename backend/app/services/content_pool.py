@@ -0,0 +1,177 @@
+# app/services/content_pool.py
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from app.models.preferences import UserPreferences
+from app.models.scenario import Scenario
+from app.models.scenario_content import ScenarioContent
+
+# Preference fields that reach the scenario-content prompt; profiles that agree on
+# these get interchangeable content and share a pool
+BUCKET_FIELDS = ("communication_style", "learning_style", "age_group",
+                 "attention_span", "primary_support", "primary_condition")
+
+
+class _Pool:
+    def __init__(self, key: Tuple, scenario: Scenario, user_prefs: UserPreferences):
+        self.key = key
+        self.scenario = scenario
+        self.user_prefs = user_prefs
+        self.items: Deque[Tuple[float, ScenarioContent]] = deque()
+        self.refilling = False
+
+
+class ScenarioContentPool:
+    """
+    Ready-made ScenarioContent per (scenario, preference bucket).
+
+    `take` pops a pooled item when one is available and otherwise generates
+    content inline. Either way the pool is then topped back up to `depth` by
+    background workers, so repeat session starts for the same scenario and
+    profile bucket are served without waiting for the LLM.
+
+    Every item is served once and items older than `max_age_seconds` are
+    dropped, so content keeps varying between sessions. At most `max_pools`
+    pools are kept; the least recently used one is evicted first. Fallback
+    and truncated content is never pooled.
+    """
+
+    def __init__(self, generator, depth: int = 2, max_age_seconds: float = 1800,
+                 max_pools: int = 256, workers: int = 2):
+        self.generator = generator
+        self.depth = max(0, depth)
+        self.max_age_seconds = max_age_seconds
+        self.max_pools = max(1, max_pools)
+        self.worker_count = max(1, workers)
+        self._pools: "OrderedDict[Tuple, _Pool]" = OrderedDict()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers = []
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.expired = 0
+        self.evicted = 0
+        self.failed = 0
+        self.skipped = 0
+
+    @staticmethod
+    def bucket(user_prefs: UserPreferences) -> Tuple:
+        return tuple(getattr(user_prefs, field) for field in BUCKET_FIELDS)
+
+    def _pool(self, scenario: Scenario, user_prefs: UserPreferences) -> _Pool:
+        key = (scenario.id, self.bucket(user_prefs))
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = _Pool(key, scenario, user_prefs)
+            while len(self._pools) > self.max_pools:
+                self._pools.popitem(last=False)
+                self.evicted += 1
+        else:
+            self._pools.move_to_end(key)
+        return pool
+
+    def _drop_stale(self, pool: _Pool) -> None:
+        cutoff = time.monotonic() - self.max_age_seconds
+        while pool.items and pool.items[0][0] < cutoff:
+            pool.items.popleft()
+            self.expired += 1
+
+    # ------------------- Serving ------------------- #
+    async def take(self, scenario: Scenario, user_prefs: UserPreferences) -> ScenarioContent:
+        """Content for a session start: pooled if available, generated now otherwise"""
+        if self.depth == 0:
+            return await self.generator.agenerate_scenario_content(scenario, user_prefs)
+
+        pool = self._pool(scenario, user_prefs)
+        self._drop_stale(pool)
+        if pool.items:
+            self.hits += 1
+            content = pool.items.popleft()[1]
+        else:
+            self.misses += 1
+            content = await self.generator.agenerate_scenario_content(scenario, user_prefs)
+        self._schedule_refill(pool)
+        return content
+
+    def take_ready(self, scenario: Scenario, user_prefs: UserPreferences) -> Optional[ScenarioContent]:
+        """Pooled content if there is some, without generating inline; the pool is refilled either way"""
+        if self.depth == 0:
+            return None
+        pool = self._pool(scenario, user_prefs)
+        self._drop_stale(pool)
+        content = None
+        if pool.items:
+            self.hits += 1
+            content = pool.items.popleft()[1]
+        else:
+            self.misses += 1
+        self._schedule_refill(pool)
+        return content
+
+    # ------------------- Background refill ------------------- #
+    def _ensure_workers(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or not any(not worker.done() for worker in self._workers):
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._workers = [loop.create_task(self._run()) for _ in range(self.worker_count)]
+
+    def _schedule_refill(self, pool: _Pool) -> None:
+        if pool.refilling or len(pool.items) >= self.depth:
+            return
+        self._ensure_workers()
+        pool.refilling = True
+        self._queue.put_nowait(pool)
+
+    async def _run(self) -> None:
+        while True:
+            pool = await self._queue.get()
+            if self._pools.get(pool.key) is not pool:
+                # Evicted while queued: its content would be thrown away, so don't generate it
+                pool.refilling = False
+                self.skipped += 1
+                continue
+            try:
+                content = await self.generator.agenerate_scenario_content(pool.scenario, pool.user_prefs)
+                if content.fallback or content.error:
+                    # Don't pool fallbacks or partial content, or retry in a loop; the next take() tries again
+                    self.failed += 1
+                    pool.refilling = False
+                    continue
+                pool.items.append((time.monotonic(), content))
+                self.generated += 1
+            except Exception as e:
+                print(f"[ContentPool] Refill failed for scenario {pool.scenario.id}: {e}")
+                self.failed += 1
+                pool.refilling = False
+                continue
+
+            self._drop_stale(pool)
+            pool.refilling = False
+            if self._pools.get(pool.key) is pool:  # Evicted pools are not refilled
+                self._schedule_refill(pool)
+
+    async def close(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self.hits + self.misses
+        return {
+            "depth": self.depth,
+            "pools": len(self._pools),
+            "pooled_items": sum(len(pool.items) for pool in self._pools.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else None,
+            "generated": self.generated,
+            "expired": self.expired,
+            "evicted_pools": self.evicted,
+            "failed_refills": self.failed,
+            "skipped_refills": self.skipped
+        }
@@ -0,0 +1,100 @@
+# app/services/embedding_batcher.py
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class EmbeddingBatcher:
+    """
+    Micro-batches concurrent embedding requests.
+
+    Callers `await encode(text)`. Texts arriving within `max_wait_ms` of each
+    other (up to `max_batch_size`) are encoded together in a single
+    `model.encode` call on a worker thread, so the event loop never runs the
+    forward pass itself and concurrent requests share one batch.
+    """
+
+    def __init__(self, model, max_batch_size: int = 32, max_wait_ms: float = 5.0,
+                 executor: Optional[ThreadPoolExecutor] = None):
+        self.model = model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self._executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.items = 0
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def encode(self, text: str) -> np.ndarray:
+        """Embedding of a single text as a 1-D array"""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[str, asyncio.Future]]:
+        """Wait for one request, then gather more until the batch is full or the wait window closes"""
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                embeddings = await self._loop.run_in_executor(
+                    self._executor, partial(self.model.encode, texts, convert_to_numpy=True))
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            rows = {text: i for i, text in enumerate(texts)}
+            for text, future in batch:
+                if not future.done():
+                    future.set_result(embeddings[rows[text]])
+
+    async def close(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else None,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0
+        }
@@ -0,0 +1,161 @@
+# app/services/feedback_cache.py
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from app.models.scenario_content import QuestionStep
+from app.utils.cache import TTLCache
+
+
+def _normalise(text: Optional[str]) -> str:
+    return " ".join((text or "").lower().split())
+
+
+class FeedbackCache:
+    """
+    Cache of LLM-generated scenario feedback.
+
+    Feedback only depends on the scenario, the question, the chosen answer, its
+    correctness and the learner's communication style and age group, so
+    repeated answers to the same question are served from an in-process LRU.
+
+    `backend` adds an optional shared/persistent layer behind the LRU:
+    "disk" appends entries to a JSON-lines file that is reloaded on startup;
+    each line records when it was stored, so entries keep their TTL across
+    restarts. "redis" stores them in Redis with the same TTL. "memory" keeps
+    nothing beyond the process.
+    """
+
+    BACKENDS = ("memory", "disk", "redis")
+    KEY_PREFIX = "feedback:"
+
+    def __init__(self, max_size: int = 5000, ttl_seconds: float = 0, backend: str = "memory",
+                 path: Optional[str] = None, redis_client=None):
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown feedback cache backend: {backend}. Available: {list(self.BACKENDS)}")
+        self.backend = backend
+        self.memory = TTLCache(max_size, ttl_seconds)
+        self.path = path
+        self.redis = redis_client if backend == "redis" else None
+        self.persistent_hits = 0
+        self._file_lock = threading.Lock()
+        if backend == "disk" and path:
+            self._load_file()
+
+    @staticmethod
+    def key(scenario_id: str, question: QuestionStep, user_answer: str, is_correct: bool,
+            communication_style: str, age_group: str) -> str:
+        parts = {
+            "scenario": scenario_id,
+            "question": _normalise(question.content),
+            "options": sorted(_normalise(option) for option in question.options),
+            "correct_answer": _normalise(question.correct_answer),
+            "answer": _normalise(user_answer),
+            "is_correct": is_correct,
+            "style": communication_style,
+            "age_group": age_group
+        }
+        return hashlib.sha1(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+    # ------------------- Disk persistence ------------------- #
+    def _load_file(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        entries = {}
+        now = time.time()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        entries.pop(entry["key"], None)  # The last write of a key is its newest
+                        # Lines written before store times were recorded start their TTL now
+                        entries[entry["key"]] = (entry["value"], float(entry.get("stored_at", now)))
+                    except (ValueError, KeyError, TypeError):
+                        continue  # Skip a partially written line
+        except OSError as e:
+            print(f"[FeedbackCache] Warning: Could not load {self.path}: {e}")
+            return
+
+        # Keep the newest unexpired entries and rewrite the file without duplicates
+        ttl = self.memory.ttl_seconds
+        latest = [(key, value, stored_at) for key, (value, stored_at) in entries.items()
+                  if not (ttl > 0 and now - stored_at > ttl)][-self.memory.max_size:]
+        for key, value, stored_at in latest:
+            self.memory.set(key, value, age=max(0.0, now - stored_at))
+        try:
+            with self._file_lock, open(self.path, "w", encoding="utf-8") as f:
+                for key, value, stored_at in latest:
+                    f.write(self._line(key, value, stored_at))
+        except OSError as e:
+            print(f"[FeedbackCache] Warning: Could not compact {self.path}: {e}")
+
+    @staticmethod
+    def _line(key: str, value: Dict[str, Any], stored_at: float) -> str:
+        return json.dumps({"key": key, "value": value, "stored_at": stored_at}) + "\n"
+
+    def _append_file(self, key: str, value: Dict[str, Any]) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with self._file_lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(self._line(key, value, time.time()))
+        except OSError as e:
+            print(f"[FeedbackCache] Warning: Could not write {self.path}: {e}")
+
+    # ------------------- Lookup ------------------- #
+    def get_local(self, key: str) -> Optional[Dict[str, Any]]:
+        """In-process lookup (the disk backend is loaded into it at startup)"""
+        return self.memory.get(key)
+
+    def set_local(self, key: str, value: Dict[str, Any]) -> None:
+        """Synchronous store for sync callers; the disk append blocks, so async code uses `set`"""
+        self.memory.set(key, value)
+        if self.backend == "disk" and self.path:
+            self._append_file(key, value)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.get_local(key)
+        if value is not None or self.redis is None:
+            return value
+        try:
+            stored = await self.redis.get(self.KEY_PREFIX + key)
+        except Exception as e:
+            print(f"[FeedbackCache] Redis lookup failed: {e}")
+            return None
+        if not stored:
+            return None
+        value = json.loads(stored)
+        self.persistent_hits += 1
+        self.memory.set(key, value)
+        return value
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        self.memory.set(key, value)
+        if self.backend == "disk" and self.path:
+            # File I/O runs on a worker thread so it never stalls the event loop
+            await asyncio.to_thread(self._append_file, key, value)
+        if self.redis is None:
+            return
+        try:
+            ttl = int(self.memory.ttl_seconds) or None
+            await self.redis.set(self.KEY_PREFIX + key, json.dumps(value), ex=ttl)
+        except Exception as e:
+            print(f"[FeedbackCache] Redis write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        memory = self.memory.stats()
+        # A Redis hit is first counted as an in-process miss
+        lookups = memory["hits"] + memory["misses"]
+        hits = memory["hits"] + self.persistent_hits
+        return {
+            "backend": self.backend,
+            "memory": memory,
+            "persistent_hits": self.persistent_hits,
+            "hits": hits,
+            "misses": lookups - hits,
+            "hit_rate": hits / lookups if lookups else None
+        }
@@ -0,0 +1,270 @@
+# app/services/kb_import.py
+import asyncio
+import csv
+import json
+import os
+import time
+import uuid
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+UNFINISHED = ("queued", "running")
+
+
+class KBImportManager:
+    """
+    Background knowledge-base imports.
+
+    An upload is streamed to `directory/<job_id>/` and processed by a worker,
+    `batch_size` records at a time, so memory stays constant whatever the file
+    size. After every stored batch the byte offset reached is checkpointed in
+    the job's `job.json`; after a crash or restart unfinished jobs continue
+    from their last checkpoint. Entries are keyed by a hash of their content,
+    so a batch replayed after a crash, or content already in the KB, is not
+    embedded again.
+    """
+
+    UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+    def __init__(self, directory: str, batch_size: int = 500):
+        self.directory = directory
+        self.batch_size = max(1, batch_size)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._owned = set()  # Jobs queued or being processed by this process
+        self._stopping = False
+
+    # ------------------- Job state ------------------- #
+    def _job_dir(self, job_id: str) -> str:
+        return os.path.join(self.directory, job_id)
+
+    def _state_path(self, job_id: str) -> str:
+        return os.path.join(self._job_dir(job_id), "job.json")
+
+    def _save(self, job: Dict[str, Any]) -> None:
+        """Write job state atomically, so a crash never leaves a half-written checkpoint"""
+        job["updated_at"] = time.time()
+        path = self._state_path(job["id"])
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(job, f)
+        os.replace(path + ".tmp", path)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        # Job ids are generated hex strings; anything else is not a job
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(self._state_path(job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        if not os.path.isdir(self.directory):
+            return []
+        jobs = [self.get(job_id) for job_id in os.listdir(self.directory)]
+        return sorted((job for job in jobs if job), key=lambda job: job["created_at"], reverse=True)
+
+    # ------------------- Submission ------------------- #
+    async def submit(self, upload, filename: str) -> Dict[str, Any]:
+        """Stream an upload (anything with an async `read(size)`) to disk and queue its import"""
+        extension = os.path.splitext(filename or "")[1].lower()
+        if extension not in FORMATS:
+            raise ValueError(f"Unsupported file type '{extension}'. Use one of: {sorted(FORMATS)}")
+
+        job_id = uuid.uuid4().hex
+        os.makedirs(self._job_dir(job_id), exist_ok=True)
+        source = os.path.join(self._job_dir(job_id), "upload" + extension)
+        size = 0
+        with open(source, "wb") as f:
+            while True:
+                chunk = await upload.read(self.UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                await asyncio.to_thread(f.write, chunk)
+
+        job = {
+            "id": job_id,
+            "filename": filename,
+            "format": FORMATS[extension],
+            "source": source,
+            "bytes": size,
+            "status": "queued",
+            "offset": 0,
+            "columns": None,
+            "records": 0,
+            "ingested": 0,
+            "duplicates": 0,
+            "skipped": 0,
+            "batches": 0,
+            "error": None,
+            "created_at": time.time()
+        }
+        self._save(job)
+        self._enqueue(job_id)
+        return job
+
+    def resume(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Re-queue a failed or interrupted job from its last checkpoint. Raises
+        ValueError for a completed job, or one this process is already running
+        or has queued (its worker owns the checkpoint).
+        """
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if job["status"] == "completed":
+            raise ValueError(f"Import job '{job_id}' has already completed")
+        if job_id in self._owned:
+            raise ValueError(f"Import job '{job_id}' is already {job['status']}")
+        job["status"], job["error"] = "queued", None
+        self._save(job)
+        self._enqueue(job_id)
+        return job
+
+    def resume_unfinished(self) -> int:
+        """Queue the jobs a previous process did not finish; returns how many"""
+        jobs = [job for job in self.list_jobs() if job["status"] in UNFINISHED]
+        for job in sorted(jobs, key=lambda job: job["created_at"]):
+            self._enqueue(job["id"])
+        return len(jobs)
+
+    # ------------------- Worker ------------------- #
+    def _enqueue(self, job_id: str) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._owned = set()  # Whatever an earlier worker had queued is gone with it
+            self._worker = loop.create_task(self._run())
+        self._owned.add(job_id)
+        self._queue.put_nowait(job_id)
+
+    async def _run(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await asyncio.to_thread(self._process, job_id)
+            finally:
+                self._owned.discard(job_id)
+
+    def _process(self, job_id: str) -> None:
+        job = self.get(job_id)
+        if job is None or job["status"] not in UNFINISHED:
+            return
+        job["status"] = "running"
+        self._save(job)
+        started = time.perf_counter()
+        try:
+            from app.services import kb_service
+
+            with open(job["source"], "rb") as f:
+                if job["format"] == "csv" and job["columns"] is None:
+                    job["columns"] = self._read_header(f)
+                    job["offset"] = f.tell()
+                    self._save(job)
+                f.seek(job["offset"])
+
+                while not self._stopping:
+                    records, skipped = self._read_batch(f, job)
+                    offset = f.tell()
+                    if not records and not skipped:
+                        break
+                    if records:
+                        result = kb_service.add_entries(
+                            [r["title"] for r in records],
+                            [r["content"] for r in records],
+                            [r["source"] for r in records]
+                        )
+                        job["ingested"] += result["ingested"]
+                        job["duplicates"] += result["duplicates"]
+                    job["records"] += len(records) + skipped
+                    job["skipped"] += skipped
+                    job["batches"] += 1
+                    job["offset"] = offset  # Checkpoint only once the batch is stored
+                    job["rows_per_second"] = job["records"] / max(time.perf_counter() - started, 1e-9)
+                    self._save(job)
+
+            if self._stopping:
+                return  # Left "running"; resumed from the checkpoint on the next start
+            job["status"] = "completed"
+            self._save(job)
+            os.remove(job["source"])
+        except Exception as e:
+            print(f"[KBImport] Job {job_id} failed at byte {job['offset']}: {e}")
+            job["status"], job["error"] = "failed", str(e)
+            self._save(job)
+
+    # ------------------- Parsing ------------------- #
+    @staticmethod
+    def _read_header(f: BinaryIO) -> List[str]:
+        header = next(csv.reader([f.readline().decode("utf-8-sig")]), [])
+        columns = [column.strip() for column in header]
+        missing = {"title", "content"} - set(columns)
+        if missing:
+            raise ValueError(f"CSV is missing required columns: {sorted(missing)}")
+        return columns
+
+    @staticmethod
+    def _read_record(f: BinaryIO, fmt: str) -> Optional[str]:
+        """Next raw record, or None at end of file. A CSV record may span lines inside quotes."""
+        line = f.readline()
+        if not line:
+            return None
+        text = line.decode("utf-8", errors="replace")
+        if fmt == "csv":
+            while text.count('"') % 2:
+                more = f.readline()
+                if not more:
+                    break
+                text += more.decode("utf-8", errors="replace")
+        return text
+
+    def _read_batch(self, f: BinaryIO, job: Dict[str, Any]) -> Tuple[List[Dict[str, str]], int]:
+        """Up to batch_size valid records from the current position, and the number of rows skipped"""
+        records, skipped = [], 0
+        while len(records) + skipped < self.batch_size:
+            raw = self._read_record(f, job["format"])
+            if raw is None:
+                break
+            if not raw.strip():
+                continue
+            record = self._parse(raw, job)
+            if record is None:
+                skipped += 1
+            else:
+                records.append(record)
+        return records, skipped
+
+    @staticmethod
+    def _parse(raw: str, job: Dict[str, Any]) -> Optional[Dict[str, str]]:
+        try:
+            if job["format"] == "csv":
+                values = next(csv.reader([raw]))
+                row = dict(zip(job["columns"], values))
+            else:
+                row = json.loads(raw)
+                if not isinstance(row, dict):
+                    return None
+        except (ValueError, StopIteration, csv.Error):
+            return None
+
+        title = str(row.get("title") or "").strip()
+        content = str(row.get("content") or "").strip()
+        if not title or not content:
+            return None
+        return {"title": title, "content": content, "source": str(row.get("source") or "")}
+
+    async def close(self) -> None:
+        # A batch in progress finishes and is checkpointed; the job resumes on the next start
+        self._stopping = True
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        self._owned.clear()
@@ -1,8 +1,15 @@
 # services/kb_service.py
 from chromadb import Client
 from chromadb.config import Settings
-from typing import Dict
-import uuid
+from typing import Callable, Dict, IO, Iterator, List, Optional, Sequence, Tuple
+import base64
+import hashlib
+import json
+import pandas as pd
+import time
+
+from app.core.config import settings
+from app.core.container import services
 
 # Initialize Chroma client
 chroma_client = Client(Settings(chroma_db_impl="duckdb+parquet", persist_directory="./chroma_db"))
@@ -10,32 +17,209 @@ chroma_client = Client(Settings(chroma_db_impl="duckdb+parquet", persist_directo
 # Create collection for knowledge base
 collection = chroma_client.get_or_create_collection(name="knowledge_base")
 
+def embed_texts(texts: List[str], batch_size: Optional[int] = None) -> List[List[float]]:
+    """
+    Embed texts with the shared EMBEDDING_MODEL (the same model as scenario search),
+    batch_size texts per forward pass. Vectors are L2-normalised.
+    """
+    if not texts:
+        return []
+    embeddings = services.embedding_model.encode(
+        texts,
+        batch_size=batch_size or settings.KB_EMBED_BATCH_SIZE,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=False
+    )
+    return embeddings.tolist()
+
+def vector_search(embedding: List[float], k: int) -> List[str]:
+    """Ids of the k entries nearest to an embedding, best first"""
+    k = min(k, collection.count())
+    if k <= 0:
+        return []
+    return collection.query(query_embeddings=[embedding], n_results=k, include=[])["ids"][0]
+
+def content_id(content: str) -> str:
+    """Entry id derived from the whitespace-normalised content, so duplicates share an id"""
+    return hashlib.sha256(" ".join(content.split()).encode("utf-8")).hexdigest()
+
+def add_entries(titles: List[str], contents: List[str], sources: List[str],
+                metadata: Optional[Dict] = None) -> Dict:
+    """
+    Embed and store a batch of entries with one `collection.add`. Entries whose
+    content is already in the KB (or earlier in the batch) are not re-embedded.
+    """
+    batch = {}
+    for title, content, source in zip(titles, contents, sources):
+        batch.setdefault(content_id(content), (title, content, source))
+
+    existing = set(collection.get(ids=list(batch), include=[])["ids"]) if batch else set()
+    new_ids = [kb_id for kb_id in batch if kb_id not in existing]
+
+    if new_ids:
+        new_contents = [batch[kb_id][1] for kb_id in new_ids]
+        collection.add(
+            documents=new_contents,
+            metadatas=[{"title": batch[kb_id][0], "source": batch[kb_id][2], **(metadata or {})} for kb_id in new_ids],
+            ids=new_ids,
+            embeddings=embed_texts(new_contents)
+        )
+        # Keep the RAG retriever's BM25 side in step (the vector side is this collection)
+        if settings.RAG_ENABLED:
+            services.kb_retriever.add({"id": kb_id, "title": batch[kb_id][0], "source": batch[kb_id][2],
+                           "content": batch[kb_id][1]} for kb_id in new_ids)
+
+    return {"ingested": len(new_ids), "duplicates": len(contents) - len(new_ids), "ids": new_ids}
+
 def add_kb_entry(title: str, content: str, source: str = "", metadata: Dict = {}):
     """
     Add a KB entry with embedding stored in Chroma DB
     """
-    # Generate embedding using your model (mock here)
-    embedding_vector = generate_embedding(content)
-    
-    # Use UUID as id
-    kb_id = str(uuid.uuid4())
-    
-    collection.add(
-        documents=[content],
-        metadatas=[{"title": title, "source": source, **metadata}],
-        ids=[kb_id],
-        embeddings=[embedding_vector]
-    )
-    
-    return {"id": kb_id, "title": title, "source": source}
+    result = add_entries([title], [content], [source], metadata)
+    return {"id": content_id(content), "title": title, "source": source,
+            "duplicate": result["duplicates"] > 0}
+
+def ingest_csv(file: IO, chunk_size: Optional[int] = None,
+               progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """
+    Bulk-load a CSV (columns: title, content, source optional) into the KB.
+
+    The file is read `chunk_size` rows at a time; each chunk is embedded in
+    batches and written with a single `collection.add`. Rows without title or
+    content are skipped, duplicates are not re-embedded. `progress` is called
+    after every chunk.
+    """
+    chunk_size = chunk_size or settings.KB_INGEST_CHUNK_SIZE
+    started = time.perf_counter()
+    report = {"chunks": 0, "ingested": 0, "duplicates": 0, "skipped": 0}
+
+    for chunk in pd.read_csv(file, chunksize=chunk_size, dtype=str, keep_default_na=False):
+        missing = {"title", "content"} - set(chunk.columns)
+        if missing:
+            raise ValueError(f"CSV is missing required columns: {sorted(missing)}")
+        if "source" not in chunk.columns:
+            chunk["source"] = ""
+        valid = (chunk["title"].str.strip() != "") & (chunk["content"].str.strip() != "")
+        rows = chunk[valid]
+
+        if len(rows):
+            result = add_entries(rows["title"].tolist(), rows["content"].tolist(), rows["source"].tolist())
+            report["ingested"] += result["ingested"]
+            report["duplicates"] += result["duplicates"]
+
+        report["chunks"] += 1
+        report["skipped"] += len(chunk) - len(rows)
+        report["seconds"] = time.perf_counter() - started
+        print(f"[KBService] Chunk {report['chunks']}: {report['ingested']} rows ingested "
+              f"({report['ingested'] / max(report['seconds'], 1e-9):.0f} rows/s)")
+        if progress is not None:
+            progress(dict(report))
+
+    report["seconds"] = time.perf_counter() - started
+    return report
+
+# ------------------- Listing ------------------- #
+KB_FIELDS = ("id", "title", "source", "content", "metadata")
+DEFAULT_FIELDS = ("id", "title", "source")
+
+def encode_cursor(offset: int, after: Optional[str] = None) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"offset": offset, "after": after}).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: Optional[str]) -> Tuple[int, Optional[str]]:
+    """(offset, id of the last entry already returned) from a cursor"""
+    if not cursor:
+        return 0, None
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        offset, after = data["offset"], data.get("after")
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(offset, int) or offset < 0 or not (after is None or isinstance(after, str)):
+        raise ValueError("Invalid cursor")
+    return offset, after
+
+def resume_offset(offset: int, after: Optional[str], source: Optional[str] = None) -> int:
+    """
+    Offset just past the entry `after`, which sat just before `offset` when the
+    cursor was issued. Chroma lists entries in insertion order but cannot seek
+    to an id, so the entry is looked up in a window of KB_LIST_BATCH_SIZE rows
+    on either side: entries added or deleted before it since then move it
+    within that window. If it was deleted itself (or moved further) the stored
+    offset is used as is.
+    """
+    if after is None:
+        return offset
+    window = settings.KB_LIST_BATCH_SIZE
+    start = max(0, offset - 1 - window)
+    where = {"source": source} if source is not None else None
+    ids = collection.get(where=where, limit=2 * window + 1, offset=start, include=[])["ids"]
+    return start + ids.index(after) + 1 if after in ids else offset
+
+def parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    """Comma-separated field list -> validated tuple; empty means the default projection"""
+    if not fields:
+        return DEFAULT_FIELDS
+    selected = tuple(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    unknown = [field for field in selected if field not in KB_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {unknown}. Available: {list(KB_FIELDS)}")
+    return selected
+
+def iter_kb_entries(fields: Sequence[str] = DEFAULT_FIELDS, source: Optional[str] = None,
+                    title_prefix: Optional[str] = None, offset: int = 0,
+                    batch_size: Optional[int] = None) -> Iterator[Tuple[int, Dict]]:
+    """
+    Yield (next offset, entry) for KB entries from `offset` on, reading the
+    collection `batch_size` rows at a time and fetching only what `fields`
+    needs. `source` is matched exactly by Chroma; the title prefix is checked
+    here, so offsets count entries of the source filter only.
+    """
+    batch_size = batch_size or settings.KB_LIST_BATCH_SIZE
+    include = []
+    if "content" in fields:
+        include.append("documents")
+    if title_prefix or {"title", "source", "metadata"} & set(fields):
+        include.append("metadatas")
+    where = {"source": source} if source is not None else None
+
+    while True:
+        page = collection.get(where=where, limit=batch_size, offset=offset, include=include)
+        ids = page["ids"]
+        if not ids:
+            return
+        metadatas = page.get("metadatas") or [None] * len(ids)
+        documents = page.get("documents") or [None] * len(ids)
+        for kb_id, meta, document in zip(ids, metadatas, documents):
+            offset += 1
+            meta = meta or {}
+            if title_prefix and not str(meta.get("title", "")).startswith(title_prefix):
+                continue
+            entry = {"id": kb_id, "title": meta.get("title"), "source": meta.get("source"),
+                     "content": document, "metadata": meta}
+            yield offset, {field: entry[field] for field in fields}
+        if len(ids) < batch_size:
+            return
 
-def list_kb_entries():
+def list_kb_entries(limit: int = 100, cursor: Optional[str] = None, fields: Sequence[str] = DEFAULT_FIELDS,
+                    source: Optional[str] = None, title_prefix: Optional[str] = None) -> Dict:
     """
-    Return metadata of all KB entries
+    One page of KB entries. `next_cursor` resumes after the last entry
+    returned (its id and offset, see `resume_offset`) and is None once the
+    listing is exhausted.
     """
-    return collection.get(include=["metadatas", "ids"])
-    
-# Mock embedding
-def generate_embedding(text: str):
-    import numpy as np
-    return np.random.rand(1536).tolist()
+    offset, after = decode_cursor(cursor)
+    scan_fields = tuple(fields) if "id" in fields else (*fields, "id")  # The cursor needs the last id
+    entries, next_cursor = [], None
+    scan = iter_kb_entries(scan_fields, source, title_prefix, resume_offset(offset, after, source),
+                           batch_size=max(limit, settings.KB_LIST_BATCH_SIZE) if title_prefix else limit + 1)
+    for offset, entry in scan:
+        if len(entries) == limit:
+            # There is another entry: resume after the last one returned
+            next_cursor = encode_cursor(last_offset, entries[-1]["id"])
+            break
+        entries.append(entry)
+        last_offset = offset
+    if "id" not in fields:
+        entries = [{field: entry[field] for field in fields} for entry in entries]
+    return {"items": entries, "next_cursor": next_cursor}
@@ -1,6 +1,17 @@
 # app/services/preference_processor.py
+import hashlib
+import json
 from typing import Dict, Any, List
 from app.models.preferences import UserPreferences
+from app.utils.cache import TTLCache
+
+
+class _KeepMissing(dict):
+    """format_map mapping that leaves unknown placeholders untouched"""
+
+    def __missing__(self, key: str) -> str:
+        return "{" + key + "}"
+
 
 class PreferenceProcessor:
     def __init__(self):
@@ -10,6 +21,7 @@ class PreferenceProcessor:
             "detailed": self._detailed_template,
             "brief": self._brief_template
         }
+        self.skeleton_cache = TTLCache(max_size=1024)
 
     def _crisis_template(self, prefs: UserPreferences, conversation_context: Dict[str, Any] = None) -> str:
         """Crisis support template"""
@@ -74,37 +86,30 @@ class PreferenceProcessor:
             - Use {prefs.communication_style} style
         """
     
-    def _therapeutic_template(self, prefs: UserPreferences, conversation_context: Dict[str, Any] = None) -> str:
-        """Smart therapeutic template that adapts to conversation stage with session awareness"""
-        context = conversation_context or {}
-        turn_count = context.get('turn_count', 0)
-        user_engagement = context.get('user_engagement_level', 'low')
-        prefers_detail = context.get('prefers_detail', False)
-        user_name = context.get('user_name')  # Get stored user name
-        is_first_turn = context.get('is_first_turn', turn_count == 0)
-        
-        template = f"""
+    # Therapeutic prompt. Profile slots are filled once per preference profile,
+    # session slots on every turn (see _therapeutic_skeleton).
+    THERAPEUTIC_TEMPLATE = """
             # THERAPEUTIC AI ROLE: NEURODIVERSE SUPPORT SPECIALIST
 
             ## USER PROFILE:
-            - Age: {prefs.age_group}
-            - Primary Condition: {prefs.primary_condition}
-            - Communication Style: {prefs.communication_style}
-            - Learning Style: {prefs.learning_style}
-            - Attention Span: {prefs.attention_span}
-            - Primary Support Need: {prefs.primary_support}
+            - Age: {age_group}
+            - Primary Condition: {primary_condition}
+            - Communication Style: {communication_style}
+            - Learning Style: {learning_style}
+            - Attention Span: {attention_span}
+            - Primary Support Need: {primary_support}
 
             ## SESSION CONTEXT:
-            - Turn: {turn_count} ({'Initial' if is_first_turn else 'Ongoing'})
-            - Engagement Level: {user_engagement}
-            - Detail Preference: {'Detailed responses' if prefers_detail else 'Brief responses'}
-            - User Name: {user_name or 'Not yet known'}
+            - Turn: {turn_count} ({turn_label})
+            - Engagement Level: {engagement_level}
+            - Detail Preference: {detail_preference}
+            - User Name: {user_name}
 
             ## CRITICAL BEHAVIOR RULES:
             1. **GREETING POLICY**:
-            - {"First turn: Brief, warm introduction focusing on their condition and support needs" if is_first_turn else "Continue conversation naturally - NO repetitive greetings"}
-            - {"Use their name naturally if known: 'Hi [Name]! I'm here...'" if user_name and is_first_turn else "Use generic friendly greeting if name unknown"}
-            - {"NEVER start with 'Hi [Name]' after first turn - it's annoying and repetitive" if not is_first_turn else ""}
+            - {greeting_policy}
+            - {name_policy}
+            - {repeat_greeting_rule}
             - As the conversation continues, don't use name if it feels forced or unnatural.
 
             2. **CONVERSATION FLOW**:
@@ -119,11 +124,11 @@ class PreferenceProcessor:
             - Continue rather than restart conversations
 
             ## RESPONSE STRATEGY:
-            {"1. **First Turn**: Brief introduction of your role and their primary condition: {prefs.primary_condition} in a playful, engaging way. Focus on their support needs: {prefs.primary_support}. Ask an open-ended question." if is_first_turn else "1. **Continuing Conversation**: Build naturally on previous discussion. No reintroductions needed."}
+            {opening_strategy}
             
             2. **Early Turns**: Concise responses with expansion options
             3. **Engaged Turns**: Detailed explanations when requested
-            4. **Always**: Maintain {prefs.communication_style} style, respect {prefs.attention_span} attention span
+            4. **Always**: Maintain {communication_style} style, respect {attention_span} attention span
 
             ## PROGRESSIVE DEPTH GUIDELINES:
             - **Level 1** (Initial): 2-3 sentences, welcoming + open-ended question
@@ -141,20 +146,63 @@ class PreferenceProcessor:
             - **CONTINUE CONVERSATIONS** naturally without restarting
 
             ## CURRENT DIRECTIVE:
-            {"Establish rapport and learn about user" if is_first_turn else "Continue meaningful conversation based on previous context"}
+            {current_directive}
 
-            ## CURRENT DEPTH LEVEL: {"1" if is_first_turn else "2" if not prefers_detail else "3-4"}
+            ## CURRENT DEPTH LEVEL: {depth_level}
 
             ## COMMUNICATION CONSTRAINTS:
             - NEVER use "Hi [Name]" after first turn
             - ALWAYS continue conversation flow naturally
-            - ADAPT to user's learning style: {prefs.learning_style}
-            - RESPECT attention span: {prefs.attention_span}
-            - USE communication style: {prefs.communication_style}
+            - ADAPT to user's learning style: {learning_style}
+            - RESPECT attention span: {attention_span}
+            - USE communication style: {communication_style}
             - __**MAINTAIN CONVERSATION CONTINUITY**__
         """
+
+    PROFILE_FIELDS = ("age_group", "primary_condition", "communication_style",
+                      "learning_style", "attention_span", "primary_support")
+
+    @staticmethod
+    def profile_key(prefs: UserPreferences) -> str:
+        """Stable hash of a preference profile, used to key per-profile caches"""
+        return hashlib.sha1(json.dumps(prefs.model_dump(), sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def _therapeutic_skeleton(self, prefs: UserPreferences) -> str:
+        """Therapeutic template with the profile slots filled in, cached per preference profile"""
+        key = self.profile_key(prefs)
+        skeleton = self.skeleton_cache.get(key)
+        if skeleton is None:
+            # Escape braces in user-provided values; unknown (session) slots are left in place
+            values = _KeepMissing({
+                field: str(getattr(prefs, field)).replace("{", "{{").replace("}", "}}")
+                for field in self.PROFILE_FIELDS
+            })
+            skeleton = self.THERAPEUTIC_TEMPLATE.format_map(values)
+            self.skeleton_cache.set(key, skeleton)
+        return skeleton
+
+    def _therapeutic_template(self, prefs: UserPreferences, conversation_context: Dict[str, Any] = None) -> str:
+        """Smart therapeutic template that adapts to conversation stage with session awareness"""
+        context = conversation_context or {}
+        turn_count = context.get('turn_count', 0)
+        user_engagement = context.get('user_engagement_level', 'low')
+        prefers_detail = context.get('prefers_detail', False)
+        user_name = context.get('user_name')  # Get stored user name
+        is_first_turn = context.get('is_first_turn', turn_count == 0)
         
-        return template
+        return self._therapeutic_skeleton(prefs).format(
+            turn_count=turn_count,
+            turn_label='Initial' if is_first_turn else 'Ongoing',
+            engagement_level=user_engagement,
+            detail_preference='Detailed responses' if prefers_detail else 'Brief responses',
+            user_name=user_name or 'Not yet known',
+            greeting_policy="First turn: Brief, warm introduction focusing on their condition and support needs" if is_first_turn else "Continue conversation naturally - NO repetitive greetings",
+            name_policy="Use their name naturally if known: 'Hi [Name]! I'm here...'" if user_name and is_first_turn else "Use generic friendly greeting if name unknown",
+            repeat_greeting_rule="NEVER start with 'Hi [Name]' after first turn - it's annoying and repetitive" if not is_first_turn else "",
+            opening_strategy="1. **First Turn**: Brief introduction of your role and their primary condition: {prefs.primary_condition} in a playful, engaging way. Focus on their support needs: {prefs.primary_support}. Ask an open-ended question." if is_first_turn else "1. **Continuing Conversation**: Build naturally on previous discussion. No reintroductions needed.",
+            current_directive="Establish rapport and learn about user" if is_first_turn else "Continue meaningful conversation based on previous context",
+            depth_level="1" if is_first_turn else "2" if not prefers_detail else "3-4"
+        )
     
     def _determine_conversation_stage(self, turn_count: int, user_input: str) -> Dict[str, Any]:
         """Analyze conversation stage and user intent"""
@@ -192,6 +240,71 @@ class PreferenceProcessor:
             "requires_detail": prefers_detail or engagement == "high"
         }
     
+    # Lexicons for the local message analyzer
+    SAFETY_PHRASES = [
+        "kill myself", "suicide", "suicidal", "want to die", "wanna die", "end my life", "end it all",
+        "hurt myself", "hurting myself", "self harm", "self-harm", "cut myself", "cutting myself",
+        "no reason to live", "better off without me", "better off dead", "don't want to be alive",
+        "someone is hurting me", "hits me", "hurts me", "abuse", "not safe at home", "unsafe"
+    ]
+    DISTRESS_WORDS = [
+        "panic", "meltdown", "overwhelmed", "can't cope", "cant cope", "crying", "scared", "terrified",
+        "furious", "angry", "hate myself", "can't breathe", "shutdown", "shut down", "hopeless"
+    ]
+    ANXIOUS_WORDS = ["worried", "worry", "nervous", "anxious", "anxiety", "afraid", "stressed", "stress"]
+    QUESTION_STARTS = ("how", "why", "what", "when", "where", "who", "can", "could", "should", "is", "are", "do", "does")
+
+    def analyze_message(self, turn_count: int, user_input: str) -> Dict[str, Any]:
+        """
+        Fast local version of the LLM conversation analysis, returning the same
+        fields. Builds on _determine_conversation_stage with keyword, length and
+        safety-lexicon heuristics.
+        """
+        stage = self._determine_conversation_stage(turn_count, user_input)
+        text = user_input.lower().strip()
+
+        safety_concern = any(phrase in text for phrase in self.SAFETY_PHRASES)
+
+        # Emotional tone
+        if safety_concern or any(word in text for word in self.DISTRESS_WORDS):
+            emotional_tone = "distressed"
+        elif any(word in text for word in self.ANXIOUS_WORDS):
+            emotional_tone = "anxious"
+        elif "?" in text or text.startswith(self.QUESTION_STARTS):
+            emotional_tone = "curious"
+        else:
+            emotional_tone = "neutral"
+
+        # Information need
+        if emotional_tone in ("distressed", "anxious"):
+            information_need = "emotional support"
+        elif stage["prefers_detail"]:
+            information_need = "detailed explanation"
+        else:
+            information_need = "simple answer"
+
+        # Response depth
+        if stage["requires_detail"]:
+            preferred_depth = "detailed"
+        elif stage["stage"] == "initial" or stage["engagement_level"] == "low":
+            preferred_depth = "brief"
+        else:
+            preferred_depth = "balanced"
+
+        return {
+            "emotional_tone": emotional_tone,
+            "information_need": information_need,
+            "conversation_stage": {
+                "initial": "initial",
+                "early": "exploring",
+                "ongoing": "exploring",
+                "detailed": "deep discussion"
+            }[stage["stage"]],
+            "preferred_depth": preferred_depth,
+            "requires_immediate_detail": stage["prefers_detail"],
+            "safety_concern": safety_concern
+        }
+
     def process_preferences(self, prefs: UserPreferences, template_type: str = "therapeutic") -> Dict[str, Any]:
         """
         Process user preferences and return a structured prompt template.
@@ -1,22 +1,79 @@
 # app/services/scenario_generator.py
-from typing import Dict, Any, List
+from collections import Counter, deque
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
 import json
 import logging
+import time
 from app.models.scenario import Scenario
 from app.models.preferences import UserPreferences
 from app.llm.response_generator import ResponseGenerator
+from app.services.feedback_cache import FeedbackCache
 from app.models.scenario_content import ScenarioContent, QuestionStep, FeedbackStep
+from app.utils.json_repair import repair_json
+from app.utils.json_stream import JSONArrayStream
 
 logger = logging.getLogger(__name__)
 
 
+class GenerationStats:
+    """
+    Outcome counters for scenario-content generation: how often the first
+    reply parsed, needed the local repair pass or the retry, was salvaged
+    from truncated output, or was wasted on the static fallback. Latency is
+    kept per attempt over the most recent `window` calls.
+    """
+
+    RESULTS = ("ok", "repaired", "retried", "salvaged", "fallback")
+
+    def __init__(self, window: int = 500):
+        self.results = Counter()
+        self.attempt_outcomes = [Counter(), Counter()]
+        self.latencies = [deque(maxlen=window), deque(maxlen=window)]
+
+    def record_attempt(self, attempt: int, seconds: float, outcome: str) -> None:
+        attempt = min(attempt, len(self.latencies) - 1)
+        self.latencies[attempt].append(seconds)
+        self.attempt_outcomes[attempt]["ok" if outcome in ("ok", "repaired") else "failed"] += 1
+
+    def record_result(self, result: str) -> None:
+        self.results[result] += 1
+
+    @staticmethod
+    def _latency_summary(samples) -> Dict[str, Any]:
+        if not samples:
+            return {"count": 0, "mean_ms": None, "p50_ms": None, "p95_ms": None}
+        ordered = sorted(samples)
+        return {
+            "count": len(ordered),
+            "mean_ms": 1000 * sum(ordered) / len(ordered),
+            "p50_ms": 1000 * ordered[len(ordered) // 2],
+            "p95_ms": 1000 * ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        total = sum(self.results.values())
+        return {
+            "generations": total,
+            "results": {result: self.results[result] for result in self.RESULTS},
+            "fallback_rate": self.results["fallback"] / total if total else None,
+            "attempts": [
+                {"attempt": i + 1, **dict(self.attempt_outcomes[i]), **self._latency_summary(self.latencies[i])}
+                for i in range(len(self.latencies))
+            ]
+        }
+
+
 class ScenarioGenerator:
     """
     Generates interactive scenario content and feedback using your existing LLM service.
     """
 
-    def __init__(self):
-        self.llm = ResponseGenerator()  # reuse your LLM-backed generator
+    MAX_ATTEMPTS = 2  # First call plus at most one retry when the JSON is unusable
+
+    def __init__(self, llm: Optional[ResponseGenerator] = None, feedback_cache: Optional[FeedbackCache] = None):
+        self.llm = llm or ResponseGenerator()  # reuse your LLM-backed generator
+        self.feedback_cache = feedback_cache or FeedbackCache()
+        self.stats = GenerationStats()
 
     def _create_scenario_prompt(self, scenario: Scenario, user_prefs: UserPreferences) -> str:
         """Create a STRICT JSON-only prompt for the LLM."""
@@ -94,53 +151,273 @@ Provide only the feedback text, no additional formatting.
     def generate_scenario_content(self, scenario: Scenario, user_prefs: UserPreferences) -> ScenarioContent:
         """
         Generate interactive content for a scenario using the specialized structured content method.
+        Unusable JSON is repaired locally, then retried once with the parse error.
         """
         prompt = self._create_scenario_prompt(scenario, user_prefs)
+        raw = ""
 
-        try:
-            # Use the new structured content method instead of regular generate_response
-            raw = self.llm.generate_structured_content(
-                user_input=prompt,
-                preferences=user_prefs.model_dump(),
-                session_id=f"scenario-{scenario.id}"
-            )
+        for attempt in range(self.MAX_ATTEMPTS):
+            started = time.perf_counter()
+            try:
+                # Use the new structured content method instead of regular generate_response
+                raw = self.llm.generate_structured_content(
+                    user_input=prompt,
+                    preferences=user_prefs.model_dump(),
+                    session_id=f"scenario-{scenario.id}"
+                )
+            except Exception as e:
+                self.stats.record_attempt(attempt, time.perf_counter() - started, "error")
+                self.stats.record_result("fallback")
+                return self._generation_failed(scenario, e)
+
+            content, outcome = self._try_parse(raw)
+            self.stats.record_attempt(attempt, time.perf_counter() - started, outcome)
+            if content is not None:
+                self.stats.record_result(outcome if attempt == 0 else "retried")
+                return content
+            if self._is_llm_error(raw):
+                self.stats.record_result("fallback")
+                return self._generation_failed(scenario, RuntimeError(raw))
+            prompt = self._retry_prompt(prompt, outcome)
+
+        return self._parse_scenario_content(raw, scenario, record=True)
+
+    async def agenerate_scenario_content(self, scenario: Scenario, user_prefs: UserPreferences) -> ScenarioContent:
+        """Async variant of generate_scenario_content"""
+        prompt = self._create_scenario_prompt(scenario, user_prefs)
+        raw = ""
 
-            # Extract JSON from the response
-            json_str = self._extract_json(raw)
-            data = json.loads(json_str)
-
-            # Validate the structure
-            if "steps" not in data:
-                raise ValueError("Missing 'steps' in LLM response")
-
-            # Validate and convert steps
-            validated_steps = self._validate_and_convert_steps(data["steps"])
-            
-            if not validated_steps:
-                raise ValueError("No valid steps generated")
-
-            # Count actual questions
-            question_count = sum(1 for step in validated_steps if isinstance(step, QuestionStep))
-
-            # Create the scenario content with validated steps
-            return ScenarioContent(
-                steps=validated_steps,
-                total_questions=question_count,
-                estimated_duration=data.get("estimated_duration", "5-7 minutes"),
-                fallback=data.get("fallback", False),
-                error=data.get("error")
-            )
+        for attempt in range(self.MAX_ATTEMPTS):
+            started = time.perf_counter()
+            try:
+                raw = await self.llm.agenerate_structured_content(
+                    user_input=prompt,
+                    preferences=user_prefs.model_dump(),
+                    session_id=f"scenario-{scenario.id}"
+                )
+            except Exception as e:
+                self.stats.record_attempt(attempt, time.perf_counter() - started, "error")
+                self.stats.record_result("fallback")
+                return self._generation_failed(scenario, e)
+
+            content, outcome = self._try_parse(raw)
+            self.stats.record_attempt(attempt, time.perf_counter() - started, outcome)
+            if content is not None:
+                self.stats.record_result(outcome if attempt == 0 else "retried")
+                return content
+            if self._is_llm_error(raw):
+                self.stats.record_result("fallback")
+                return self._generation_failed(scenario, RuntimeError(raw))
+            prompt = self._retry_prompt(prompt, outcome)
+
+        return self._parse_scenario_content(raw, scenario, record=True)
+
+    @staticmethod
+    def _is_llm_error(raw: str) -> bool:
+        # The LLM wrapper reports failures (timeouts, rate limits) as text; retrying the prompt won't help
+        return isinstance(raw, str) and raw.startswith("Error generating structured content")
+
+    @staticmethod
+    def _retry_prompt(prompt: str, error: str) -> str:
+        schema = json.dumps(ScenarioContent.model_json_schema())
+        return f"""{prompt}
+YOUR PREVIOUS REPLY COULD NOT BE USED: {error}
+Reply again with ONLY a JSON object matching this JSON schema, with no other text:
+{schema}
+"""
+
+    async def astream_scenario_content(self, scenario: Scenario, user_prefs: UserPreferences) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of generate_scenario_content. Yields a "step" event for
+        each step as soon as it has been generated and validated, then an "end"
+        event with the complete ScenarioContent. If generation stops early, the
+        steps completed so far are kept; static fallback steps are only sent
+        when no step was generated at all. Should the final content differ from
+        what was streamed, the differing steps are sent again under their final
+        index before "end", so `step` events always agree with the end content.
+        """
+        prompt = self._create_scenario_prompt(scenario, user_prefs)
+        parser = JSONArrayStream("steps")
+        steps = []
+        error = None
+        started = time.perf_counter()
 
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON parsing error: {e}")
-            fb = self._fallback_content(scenario)
-            fb.error = f"JSON parsing error: {str(e)}"
-            return fb
+        try:
+            async for token in self.llm.astream_structured_content(
+                user_input=prompt,
+                preferences=user_prefs.model_dump()
+            ):
+                for step in self._validate_and_convert_steps(parser.feed(token)):
+                    steps.append(step)
+                    yield {"event": "step", "index": len(steps) - 1, "step": step.model_dump()}
         except Exception as e:
-            logger.error(f"Generation error: {e}")
-            fb = self._fallback_content(scenario)
-            fb.error = f"Generation error: {str(e)}"
-            return fb
+            logger.error(f"Streaming generation error: {e}")
+            error = f"Generation error: {str(e) or type(e).__name__}"
+
+        elapsed = time.perf_counter() - started
+        if error is None:
+            content, outcome = self._try_parse(parser.text)
+            self.stats.record_attempt(0, elapsed, outcome)
+            if content is not None:
+                self.stats.record_result(outcome)
+            elif steps:
+                self.stats.record_result("salvaged")
+                content = self._content_from_steps(steps, f"Incomplete output, kept {len(steps)} steps: {outcome}")
+            else:
+                # Nothing was sent yet, so the one retry can still replace the fallback
+                content = await self._aretry_scenario_content(prompt, outcome, scenario, user_prefs)
+        else:
+            self.stats.record_attempt(0, elapsed, "error")
+            self.stats.record_result("salvaged" if steps else "fallback")
+            if steps:
+                content = self._content_from_steps(steps, error)
+            else:
+                content = self._fallback_content(scenario)
+                content.error = error
+
+        streamed = [step.model_dump() for step in steps]
+        for index, step in enumerate(content.steps):
+            dumped = step.model_dump()
+            if index >= len(streamed) or streamed[index] != dumped:
+                yield {"event": "step", "index": index, "step": dumped}
+        yield {"event": "end", "content": content.model_dump()}
+
+    async def _aretry_scenario_content(self, prompt: str, error: str, scenario: Scenario,
+                                       user_prefs: UserPreferences) -> ScenarioContent:
+        """The single targeted retry after a streamed reply that could not be used"""
+        started = time.perf_counter()
+        raw = await self.llm.agenerate_structured_content(
+            user_input=self._retry_prompt(prompt, error),
+            preferences=user_prefs.model_dump(),
+            session_id=f"scenario-{scenario.id}"
+        )
+        content, outcome = self._try_parse(raw)
+        self.stats.record_attempt(1, time.perf_counter() - started, outcome)
+        if content is not None:
+            self.stats.record_result("retried")
+            return content
+        return self._parse_scenario_content(raw, scenario, record=True)
+
+    def _content_from_steps(self, steps: List[Any], error: Optional[str] = None,
+                            estimated_duration: str = "5-7 minutes") -> ScenarioContent:
+        return ScenarioContent(
+            steps=steps,
+            total_questions=sum(1 for step in steps if isinstance(step, QuestionStep)),
+            estimated_duration=estimated_duration,
+            fallback=False,
+            error=error
+        )
+
+    def _salvage_steps(self, raw: str) -> List[Any]:
+        """Valid steps that were completed before the output broke off"""
+        parser = JSONArrayStream("steps")
+        return self._validate_and_convert_steps(parser.feed(raw or ""))
+
+    def _generation_failed(self, scenario: Scenario, error: Exception) -> ScenarioContent:
+        logger.error(f"Generation error: {error}")
+        fb = self._fallback_content(scenario)
+        fb.error = f"Generation error: {str(error)}"
+        return fb
+
+    def _content_from_json(self, data: Any) -> ScenarioContent:
+        """Validated ScenarioContent from parsed JSON; raises ValueError if it has no usable steps"""
+        # Validate the structure
+        if not isinstance(data, dict) or "steps" not in data:
+            raise ValueError("Missing 'steps' in LLM response")
+        if not isinstance(data["steps"], list):
+            raise ValueError(f"'steps' must be a list, got {type(data['steps']).__name__}")
+
+        # Validate and convert steps
+        validated_steps = self._validate_and_convert_steps(data["steps"])
+
+        if not validated_steps:
+            raise ValueError("No valid steps generated")
+
+        # Count actual questions
+        question_count = sum(1 for step in validated_steps if isinstance(step, QuestionStep))
+
+        # Create the scenario content with validated steps
+        return ScenarioContent(
+            steps=validated_steps,
+            total_questions=question_count,
+            estimated_duration=data.get("estimated_duration", "5-7 minutes"),
+            fallback=data.get("fallback", False),
+            error=data.get("error")
+        )
+
+    def _try_parse(self, raw: str) -> Tuple[Optional[ScenarioContent], str]:
+        """
+        Parse raw LLM output strictly, then after a local repair pass.
+        Returns (content, "ok" or "repaired"), or (None, the parse error).
+        """
+        try:
+            return self._content_from_json(json.loads(self._extract_json(raw))), "ok"
+        except (ValueError, TypeError) as e:  # ValueError includes json.JSONDecodeError
+            error = f"{type(e).__name__}: {str(e)}"
+
+        repaired = repair_json(raw) if isinstance(raw, str) else raw
+        if repaired != raw:
+            try:
+                return self._content_from_json(json.loads(self._extract_json(repaired))), "repaired"
+            except (ValueError, TypeError):
+                pass
+        return None, error
+
+    def _parse_scenario_content(self, raw: str, scenario: Scenario, record: bool = False) -> ScenarioContent:
+        """Turn raw LLM output into validated ScenarioContent, falling back to static content on failure."""
+        content, outcome = self._try_parse(raw)
+        if content is not None:
+            if record:
+                self.stats.record_result(outcome)
+            return content
+
+        # Truncated output: keep the steps that were completed
+        salvaged = self._salvage_steps(raw)
+        if salvaged:
+            logger.error(f"JSON parsing error: {outcome}")
+            if record:
+                self.stats.record_result("salvaged")
+            return self._content_from_steps(salvaged, f"Truncated output, kept {len(salvaged)} steps: {outcome}")
+
+        if record:
+            self.stats.record_result("fallback")
+        logger.error(f"Generation error: {outcome}")
+        fb = self._fallback_content(scenario)
+        fb.error = f"Generation error: {outcome}"
+        return fb
+
+    def _missing_answer_feedback(self) -> Dict[str, Any]:
+        return {
+            "feedback": "Thank you for your response! Let's explore this together.",
+            "is_correct": False,
+            "fallback": True
+        }
+
+    def _feedback_result(self, feedback: str, is_correct: bool) -> Dict[str, Any]:
+        # Clean up any accidental formatting
+        feedback = feedback.replace("```", "").replace("**", "").replace("*", "").strip()
+        return {"feedback": feedback, "is_correct": is_correct}
+
+    def _feedback_cache_key(self, user_answer: str, question: QuestionStep, scenario: Scenario,
+                            user_prefs: UserPreferences, is_correct: bool) -> str:
+        return self.feedback_cache.key(
+            scenario.id, question, user_answer, is_correct,
+            user_prefs.communication_style, user_prefs.age_group
+        )
+
+    @staticmethod
+    def _cacheable_feedback(feedback: str) -> bool:
+        # The LLM wrapper reports failures as text rather than raising
+        return bool(feedback and feedback.strip()) and not feedback.startswith("Error generating feedback")
+
+    def _feedback_failed(self, error: Exception, is_correct: bool) -> Dict[str, Any]:
+        logger.error(f"Feedback generation error: {error}")
+        return {
+            "feedback": "Thank you for your response! Great effort—would you like to review the reasoning together?",
+            "is_correct": is_correct,
+            "fallback": True,
+            "error": str(error)
+        }
 
     def generate_feedback(
         self,
@@ -153,13 +430,14 @@ Provide only the feedback text, no additional formatting.
         Generate supportive feedback using the specialized feedback method.
         """
         if not user_answer or not question.correct_answer:
-            return {
-                "feedback": "Thank you for your response! Let's explore this together.",
-                "is_correct": False,
-                "fallback": True
-            }
+            return self._missing_answer_feedback()
 
         is_correct = user_answer.strip().lower() == question.correct_answer.strip().lower()
+        cache_key = self._feedback_cache_key(user_answer, question, scenario, user_prefs, is_correct)
+        cached = self.feedback_cache.get_local(cache_key)
+        if cached is not None:
+            return dict(cached)
+
         prompt = self._create_feedback_prompt(user_answer, question, scenario, user_prefs)
 
         try:
@@ -169,20 +447,46 @@ Provide only the feedback text, no additional formatting.
                 preferences=user_prefs.model_dump(),
                 session_id=f"feedback-{scenario.id}"
             )
-            
-            # Clean up any accidental formatting
-            feedback = feedback.replace("```", "").replace("**", "").replace("*", "").strip()
-            
-            return {"feedback": feedback, "is_correct": is_correct}
+            result = self._feedback_result(feedback, is_correct)
+            if self._cacheable_feedback(feedback):
+                self.feedback_cache.set_local(cache_key, result)
+            return result
 
         except Exception as e:
-            logger.error(f"Feedback generation error: {e}")
-            return {
-                "feedback": "Thank you for your response! Great effort—would you like to review the reasoning together?",
-                "is_correct": is_correct,
-                "fallback": True,
-                "error": str(e)
-            }
+            return self._feedback_failed(e, is_correct)
+
+    async def agenerate_feedback(
+        self,
+        user_answer: str,
+        question: QuestionStep,
+        scenario: Scenario,
+        user_prefs: UserPreferences
+    ) -> Dict[str, Any]:
+        """Async variant of generate_feedback"""
+        if not user_answer or not question.correct_answer:
+            return self._missing_answer_feedback()
+
+        is_correct = user_answer.strip().lower() == question.correct_answer.strip().lower()
+        cache_key = self._feedback_cache_key(user_answer, question, scenario, user_prefs, is_correct)
+        cached = await self.feedback_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached)
+
+        prompt = self._create_feedback_prompt(user_answer, question, scenario, user_prefs)
+
+        try:
+            feedback = await self.llm.agenerate_simple_feedback(
+                user_input=prompt,
+                preferences=user_prefs.model_dump(),
+                session_id=f"feedback-{scenario.id}"
+            )
+            result = self._feedback_result(feedback, is_correct)
+            if self._cacheable_feedback(feedback):
+                await self.feedback_cache.set(cache_key, result)
+            return result
+
+        except Exception as e:
+            return self._feedback_failed(e, is_correct)
 
     # ... (include all the helper methods from the previous version)
     def _extract_json(self, raw: str) -> str:
@@ -1,30 +1,59 @@
+import hashlib
 import json
+import os
 import numpy as np
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from pathlib import Path
 from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-import pickle
 
-from ..models.scenario import Scenario, ScenarioDatabase
+from ..core.config import settings
+from ..models.scenario import Scenario, ScenarioDatabase, ScenarioType
 from ..models.preferences import UserPreferences
+from ..retrieval.vector_index import (VectorIndex, ExactIndex, embeddings_fingerprint, load_or_build_index,
+                                     measure_recall)
+from ..utils.cache import TTLCache
+from .embedding_batcher import EmbeddingBatcher
 
 
 class ScenarioService:
-    def __init__(self, scenarios_file: str = "scenarios.json"):
+    # Attention spans mapped to numeric levels for comparison
+    ATTENTION_LEVELS = {"short": 1, "medium": 2, "long": 3, "variable": 2}
+
+    # Bump when the embedding text or cache layout changes
+    CACHE_VERSION = 2
+
+    def __init__(self, scenarios_file: str = "scenarios.json", model: Optional[SentenceTransformer] = None):
         # File paths
         self.scenarios_file = Path(__file__).parent.parent / scenarios_file
-        self.embeddings_file = Path(__file__).parent.parent / "scenario_embeddings.pkl"
+        self.embeddings_file = Path(__file__).parent.parent / "scenario_embeddings.npy"
+        self.manifest_file = Path(__file__).parent.parent / "scenario_embeddings.json"
+        self.index_file = Path(__file__).parent.parent / "scenario_index.npz"
 
-        # Load embedding model
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        # Load embedding model (or share the one passed in)
+        self.model_name = settings.EMBEDDING_MODEL
+        self.model = model or SentenceTransformer(self.model_name)
 
         # Load scenarios
         self.scenarios = self._load_scenarios()
+        self._build_feature_encodings()
 
         # Load or create embeddings
         self.scenario_embeddings = self._load_or_create_embeddings()
 
+        # Load or build the similarity index
+        self.index = self._load_or_build_index()
+
+        # Query embeddings: default recommend queries are pinned, everything else is cached
+        self.query_cache = TTLCache(settings.QUERY_CACHE_SIZE, settings.QUERY_CACHE_TTL_SECONDS)
+        self.default_query_embeddings = self._precompute_default_queries()
+
+        # Concurrent async queries are encoded together off the event loop
+        self.batcher = EmbeddingBatcher(
+            self.model,
+            max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+            max_wait_ms=settings.EMBEDDING_BATCH_WAIT_MS
+        )
+
     # ------------------- Loading Scenarios ------------------- #
     def _load_scenarios(self) -> List[Scenario]:
         """Load scenarios from JSON file"""
@@ -43,116 +72,330 @@ class ScenarioService:
             return []
 
     # ------------------- Embeddings ------------------- #
-    def _load_or_create_embeddings(self) -> np.ndarray:
-        """Load existing embeddings or create new ones"""
+    def _embedding_text(self, scenario: Scenario) -> str:
+        """Text that is embedded for a scenario"""
+        return (
+            f"Title: {scenario.title}\n"
+            f"Description: {scenario.description}\n"
+            f"Content: {scenario.content}\n"
+            f"Type: {scenario.scenario_type}\n"
+            f"Strategies: {', '.join(scenario.suggested_strategies)}\n"
+            f"Conditions: {', '.join(scenario.primary_conditions)}"
+        )
+
+    def _embedding_key(self, text: str) -> str:
+        """Cache key of an embedding: hash of the model name and the embedded text"""
+        return hashlib.sha256(f"{self.model_name}\n{text}".encode("utf-8")).hexdigest()
+
+    def _load_embedding_cache(self) -> Tuple[List[str], Optional[np.ndarray]]:
+        """
+        Load the cached embedding matrix (memory-mapped) and the key of each of
+        its rows. The manifest records a fingerprint of the matrix it was written
+        with, so a matrix from another save (e.g. after a crash between the two
+        file replaces) is rejected rather than paired with the wrong keys.
+        """
         try:
-            if self.embeddings_file.exists():
-                with open(self.embeddings_file, 'rb') as f:
-                    embeddings = pickle.load(f)
-                    if len(embeddings) == len(self.scenarios):
-                        return embeddings
+            if self.embeddings_file.exists() and self.manifest_file.exists():
+                with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                embeddings = np.load(self.embeddings_file, mmap_mode='r')
+                keys = manifest.get("keys", [])
+                if (manifest.get("version") == self.CACHE_VERSION and len(keys) == len(embeddings)
+                        and manifest.get("fingerprint") == embeddings_fingerprint(embeddings)):
+                    return keys, embeddings
+                print("[ScenarioService] Embedding cache does not match its manifest, re-encoding")
         except Exception as e:
             print(f"[ScenarioService] Warning: Could not load embeddings: {str(e)}")
+        return [], None
 
-        return self._create_embeddings()
-
-    def _create_embeddings(self) -> np.ndarray:
-        """Generate embeddings for all scenarios"""
-        if not self.scenarios:
-            return np.array([])
-
-        scenario_texts = []
-        for scenario in self.scenarios:
-            scenario_texts.append(
-                f"Title: {scenario.title}\n"
-                f"Description: {scenario.description}\n"
-                f"Content: {scenario.content}\n"
-                f"Type: {scenario.scenario_type}\n"
-                f"Strategies: {', '.join(scenario.suggested_strategies)}\n"
-                f"Conditions: {', '.join(scenario.primary_conditions)}"
-            )
-
-        embeddings = self.model.encode(scenario_texts, convert_to_numpy=True)
-
-        # Save embeddings
+    def _save_embedding_cache(self, keys: List[str], embeddings: np.ndarray) -> None:
+        """Write the embedding matrix and its manifest, each replacing the previous file atomically"""
         try:
-            with open(self.embeddings_file, 'wb') as f:
-                pickle.dump(embeddings, f)
+            tmp_embeddings = self.embeddings_file.with_suffix(".tmp.npy")
+            tmp_manifest = self.manifest_file.with_suffix(".tmp.json")
+            np.save(tmp_embeddings, embeddings)
+            with open(tmp_manifest, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "version": self.CACHE_VERSION,
+                    "model": self.model_name,
+                    "dimension": int(embeddings.shape[1]) if embeddings.ndim == 2 else 0,
+                    "fingerprint": embeddings_fingerprint(embeddings),
+                    "keys": keys
+                }, f)
+            os.replace(tmp_embeddings, self.embeddings_file)
+            os.replace(tmp_manifest, self.manifest_file)
         except Exception as e:
             print(f"[ScenarioService] Warning: Could not save embeddings: {str(e)}")
 
-        return embeddings
+    def _load_or_create_embeddings(self) -> np.ndarray:
+        """Reuse cached embeddings for unchanged scenarios and encode only new or edited ones"""
+        if not self.scenarios:
+            return np.array([])
 
-    # ------------------- Filtering ------------------- #
-    def _apply_preference_filters(self, scenario: Scenario, user_prefs: UserPreferences) -> bool:
-        """Hard filters to reject unsuitable scenarios"""
-        # Primary condition match
-        if user_prefs.primary_condition not in scenario.primary_conditions:
-            return False
+        keys = [self._embedding_key(self._embedding_text(s)) for s in self.scenarios]
+        cached_keys, cached = self._load_embedding_cache()
 
-        # Age group match
-        if user_prefs.age_group not in scenario.target_age_groups:
-            return False
+        # Unchanged catalogue: serve the memory-mapped matrix as-is
+        if cached is not None and cached_keys == keys:
+            return cached
 
-        # Sensory triggers
-        if user_prefs.sensory_sensitivities:
-            if any(sens in scenario.sensory_considerations for sens in user_prefs.sensory_sensitivities):
-                return False
+        cached_rows = {key: row for row, key in enumerate(cached_keys)}
+        missing = [i for i, key in enumerate(keys) if key not in cached_rows]
 
-        # Attention span
-        if not self._check_attention_compatibility(scenario.attention_span, user_prefs.attention_span):
-            return False
+        new_embeddings = None
+        if missing:
+            print(f"[ScenarioService] Encoding {len(missing)} of {len(keys)} scenarios")
+            new_embeddings = self.model.encode(
+                [self._embedding_text(self.scenarios[i]) for i in missing], convert_to_numpy=True)
 
-        return True
+        dimension = new_embeddings.shape[1] if new_embeddings is not None else cached.shape[1]
+        embeddings = np.empty((len(keys), dimension), dtype=np.float32)
+        for i, key in enumerate(keys):
+            if key in cached_rows:
+                embeddings[i] = cached[cached_rows[key]]
+        if missing:
+            embeddings[missing] = new_embeddings
 
-    def _check_attention_compatibility(self, scenario_span: str, user_span: str) -> bool:
-        """Map attention spans to numeric levels for comparison"""
-        levels = {"short": 1, "medium": 2, "long": 3, "variable": 2}
-        return levels.get(scenario_span, 2) <= levels.get(user_span, 2)
+        self._save_embedding_cache(keys, embeddings)
 
-    # ------------------- Semantic Search ------------------- #
-    def find_matching_scenarios(self, user_prefs: UserPreferences, query: Optional[str] = None, max_results: int = 5) -> List[Scenario]:
-        """Return top scenarios based on semantic similarity + preference filters"""
-        if not self.scenarios or len(self.scenario_embeddings) == 0:
-            return []
+        # Serve the saved file memory-mapped, as for an unchanged catalogue
+        saved_keys, saved = self._load_embedding_cache()
+        if saved is not None and saved_keys == keys:
+            return saved
+        return embeddings
 
-        if query is None:
-            query = f"scenarios for {user_prefs.primary_support} and {user_prefs.primary_condition}"
+    # ------------------- Similarity Index ------------------- #
+    def _load_or_build_index(self) -> VectorIndex:
+        """Create the configured similarity index over the scenario embeddings"""
+        backend = settings.SCENARIO_INDEX_BACKEND
+        params = {"dtype": settings.SCENARIO_INDEX_DTYPE, "rerank": settings.SCENARIO_INDEX_RERANK}
+        if backend == "ivf":
+            params.update(nlist=settings.SCENARIO_INDEX_NLIST, nprobe=settings.SCENARIO_INDEX_NPROBE)
+
+        try:
+            index = load_or_build_index(backend, self.scenario_embeddings, self.index_file, **params)
+        except Exception as e:
+            print(f"[ScenarioService] Warning: Could not build '{backend}' index, using exact search: {str(e)}")
+            return ExactIndex(self.scenario_embeddings)
+
+        if (index.backend != ExactIndex.backend or index.dtype != "float32") and len(index):
+            print(f"[ScenarioService] {index.backend}/{index.dtype} index recall@10: {self.index_recall(index):.3f}")
+        return index
+
+    def index_recall(self, index: Optional[VectorIndex] = None, k: int = 10, num_queries: int = 100, noise: float = 0.05) -> float:
+        """
+        Recall@k of an index against exact search, using noisy copies of
+        scenario embeddings as queries.
+        """
+        index = index or self.index
+        if len(self.scenario_embeddings) == 0:
+            return 1.0
+        rng = np.random.default_rng(0)
+        sample = rng.choice(len(self.scenario_embeddings), min(num_queries, len(self.scenario_embeddings)), replace=False)
+        queries = self.scenario_embeddings[sample]
+        queries = queries + rng.normal(0, noise, queries.shape) * np.linalg.norm(queries, axis=1, keepdims=True)
+        return measure_recall(index, ExactIndex(self.scenario_embeddings), queries, k)
+
+    # ------------------- Query Embeddings ------------------- #
+    @staticmethod
+    def default_query(primary_support: str, primary_condition: str) -> str:
+        """Query used by recommendations when the user gives no search text"""
+        return f"scenarios for {primary_support} and {primary_condition}"
+
+    def _precompute_default_queries(self) -> Dict[str, np.ndarray]:
+        """Encode the default query of every support area / catalogue condition pair in one batch"""
+        queries = [
+            self.default_query(support.value, condition)
+            for support in ScenarioType
+            for condition in self.condition_vocab
+        ]
+        if not queries:
+            return {}
+        try:
+            embeddings = self.model.encode(queries, convert_to_numpy=True)
+        except Exception as e:
+            print(f"[ScenarioService] Warning: Could not precompute default queries: {str(e)}")
+            return {}
+        return {query: embeddings[i:i + 1] for i, query in enumerate(queries)}
+
+    def _cached_query(self, query: str) -> Optional[np.ndarray]:
+        embedding = self.default_query_embeddings.get(query)
+        if embedding is not None:
+            return embedding
+        return self.query_cache.get(query)
+
+    def _encode_query(self, query: str) -> np.ndarray:
+        """Embedding of a query as a (1, dim) array, served from the caches when possible"""
+        embedding = self._cached_query(query)
+        if embedding is None:
+            embedding = self.model.encode([query], convert_to_numpy=True)
+            self.query_cache.set(query, embedding)
+        return embedding
+
+    async def _encode_query_async(self, query: str) -> np.ndarray:
+        """Like _encode_query, but cache misses go through the micro-batching worker"""
+        embedding = self._cached_query(query)
+        if embedding is None:
+            embedding = (await self.batcher.encode(query))[None, :]
+            self.query_cache.set(query, embedding)
+        return embedding
+
+    def query_cache_stats(self) -> Dict[str, Any]:
+        return {
+            **self.query_cache.stats(),
+            "precomputed_default_queries": len(self.default_query_embeddings)
+        }
+
+    # ------------------- Feature Encodings ------------------- #
+    def _encode_list_field(self, values: List[List[str]]) -> Tuple[Dict[str, int], np.ndarray]:
+        """Encode a list-valued scenario field as a (scenarios x vocabulary) boolean matrix"""
+        vocab: Dict[str, int] = {}
+        for items in values:
+            for item in items:
+                vocab.setdefault(item, len(vocab))
+
+        matrix = np.zeros((len(values), len(vocab)), dtype=bool)
+        for row, items in enumerate(values):
+            for item in items:
+                matrix[row, vocab[item]] = True
+        return vocab, matrix
+
+    @staticmethod
+    def _build_postings(vocab: Dict[str, int], matrix: np.ndarray) -> Dict[str, np.ndarray]:
+        """Inverted index from each field value to the sorted row ids containing it"""
+        return {value: np.flatnonzero(matrix[:, col]) for value, col in vocab.items()}
+
+    def _build_feature_encodings(self) -> None:
+        """Precompute columnar encodings and inverted indexes of the fields used for filtering and scoring"""
+        scenarios = self.scenarios
+        self.condition_vocab, self.condition_matrix = self._encode_list_field(
+            [s.primary_conditions for s in scenarios])
+        self.age_vocab, self.age_matrix = self._encode_list_field(
+            [s.target_age_groups for s in scenarios])
+        self.sensory_vocab, self.sensory_matrix = self._encode_list_field(
+            [s.sensory_considerations for s in scenarios])
+        self.style_vocab, self.style_matrix = self._encode_list_field(
+            [s.communication_style for s in scenarios])
+        self.strategy_vocab, self.strategy_matrix = self._encode_list_field(
+            [s.suggested_strategies for s in scenarios])
+        self.attention_levels = np.array(
+            [self.ATTENTION_LEVELS.get(s.attention_span, 2) for s in scenarios], dtype=np.int8)
+
+        # Posting lists for the hard filters
+        self.condition_postings = self._build_postings(self.condition_vocab, self.condition_matrix)
+        self.age_postings = self._build_postings(self.age_vocab, self.age_matrix)
+        self.attention_postings = {
+            level: np.flatnonzero(self.attention_levels <= level)
+            for level in set(self.ATTENTION_LEVELS.values())
+        }
+
+    @staticmethod
+    def _any_of(vocab: Dict[str, int], matrix: np.ndarray, values: List[str], rows: np.ndarray) -> np.ndarray:
+        """For each of the given rows, whether it contains at least one of the given values"""
+        columns = [vocab[v] for v in values if v in vocab]
+        if not columns:
+            return np.zeros(len(rows), dtype=bool)
+        return matrix[np.ix_(rows, columns)].any(axis=1)
 
-        # Encode query
-        query_embedding = self.model.encode([query], convert_to_numpy=True)
-        similarity_scores = cosine_similarity(query_embedding, self.scenario_embeddings)[0]
+    # ------------------- Filtering ------------------- #
+    def _candidate_rows(self, user_prefs: UserPreferences) -> np.ndarray:
+        """Hard filters to reject unsuitable scenarios, returning the sorted row ids that survive"""
+        empty = np.zeros(0, dtype=np.int64)
+
+        # Primary condition, age group and attention span match: intersect posting lists, shortest first
+        postings = sorted([
+            self.condition_postings.get(user_prefs.primary_condition, empty),
+            self.age_postings.get(user_prefs.age_group, empty),
+            self.attention_postings.get(self.ATTENTION_LEVELS.get(user_prefs.attention_span, 2), empty),
+        ], key=len)
+        rows = postings[0]
+        for posting in postings[1:]:
+            if len(rows) == 0:
+                break
+            rows = np.intersect1d(rows, posting, assume_unique=True)
 
-        scored_scenarios = []
-        for score, scenario in zip(similarity_scores, self.scenarios):
-            if self._apply_preference_filters(scenario, user_prefs):
-                bonus = self._calculate_preference_bonus(scenario, user_prefs)
-                scored_scenarios.append((score + bonus, scenario))
+        # Sensory triggers
+        if user_prefs.sensory_sensitivities and len(rows):
+            rows = rows[~self._any_of(self.sensory_vocab, self.sensory_matrix, user_prefs.sensory_sensitivities, rows)]
 
-        # Sort and pick top
-        scored_scenarios.sort(key=lambda x: x[0], reverse=True)
-        return [s for _, s in scored_scenarios[:max_results]]
+        return rows
 
-    def _calculate_preference_bonus(self, scenario: Scenario, user_prefs: UserPreferences) -> float:
-        """Soft bonuses for matching preferences"""
-        bonus = 0.0
+    def _preference_bonus(self, user_prefs: UserPreferences, rows: np.ndarray) -> np.ndarray:
+        """Soft bonuses for matching preferences, for each of the given rows"""
+        bonus = np.zeros(len(rows), dtype=np.float64)
 
         # Communication style
-        if user_prefs.communication_style in scenario.communication_style:
-            bonus += 0.2
+        bonus += np.where(self._any_of(self.style_vocab, self.style_matrix, [user_prefs.communication_style], rows), 0.2, 0.0)
 
         # Effective strategies
         if user_prefs.effective_strategies:
-            if any(strategy in scenario.suggested_strategies for strategy in user_prefs.effective_strategies):
-                bonus += 0.15
+            bonus += np.where(self._any_of(self.strategy_vocab, self.strategy_matrix, user_prefs.effective_strategies, rows), 0.15, 0.0)
 
         # Regulation tools
         if user_prefs.regulation_tools:
-            if any(tool in scenario.suggested_strategies for tool in user_prefs.regulation_tools):
-                bonus += 0.1
+            bonus += np.where(self._any_of(self.strategy_vocab, self.strategy_matrix, user_prefs.regulation_tools, rows), 0.1, 0.0)
 
         return bonus
 
+    @staticmethod
+    def _top_k(scores: np.ndarray, rows: np.ndarray, k: int) -> np.ndarray:
+        """
+        Rows of the k highest scores, best first. Ties keep catalogue order,
+        matching a stable descending sort.
+        """
+        if k <= 0 or len(rows) == 0:
+            return rows[:0]
+        if len(rows) > k:
+            kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+            keep = scores >= kth
+            rows, scores = rows[keep], scores[keep]
+        order = np.lexsort((rows, -scores))
+        return rows[order[:k]]
+
+    # ------------------- Semantic Search ------------------- #
+    def _prepare_search(self, user_prefs: Optional[UserPreferences], query: Optional[str]) -> Tuple[Optional[np.ndarray], str]:
+        """Rows that pass the hard filters (None means all) and the query text to embed"""
+        # Filter first so only the surviving rows are scored
+        rows = None
+        if user_prefs is not None:
+            rows = self._candidate_rows(user_prefs)
+
+        if query is None:
+            query = self.default_query(user_prefs.primary_support, user_prefs.primary_condition)
+
+        return rows, query
+
+    def _rank(self, query_embedding: np.ndarray, rows: Optional[np.ndarray], user_prefs: Optional[UserPreferences], max_results: int) -> List[Scenario]:
+        rows, similarity_scores = self.index.candidates(query_embedding, rows)
+
+        scores = similarity_scores.astype(np.float64)
+        if user_prefs is not None:
+            scores += self._preference_bonus(user_prefs, rows)
+
+        return [self.scenarios[i] for i in self._top_k(scores, rows, max_results)]
+
+    def find_matching_scenarios(self, user_prefs: Optional[UserPreferences], query: Optional[str] = None, max_results: int = 5) -> List[Scenario]:
+        """Return top scenarios based on semantic similarity + preference filters"""
+        if not self.scenarios or len(self.scenario_embeddings) == 0:
+            return []
+
+        rows, query = self._prepare_search(user_prefs, query)
+        if rows is not None and len(rows) == 0:
+            return []
+
+        return self._rank(self._encode_query(query), rows, user_prefs, max_results)
+
+    async def find_matching_scenarios_async(self, user_prefs: Optional[UserPreferences], query: Optional[str] = None, max_results: int = 5) -> List[Scenario]:
+        """Async variant of find_matching_scenarios for request handlers; query encoding is batched off the event loop"""
+        if not self.scenarios or len(self.scenario_embeddings) == 0:
+            return []
+
+        rows, query = self._prepare_search(user_prefs, query)
+        if rows is not None and len(rows) == 0:
+            return []
+
+        return self._rank(await self._encode_query_async(query), rows, user_prefs, max_results)
+
     # ------------------- Access ------------------- #
     def get_scenario_by_id(self, scenario_id: str) -> Optional[Scenario]:
         for scenario in self.scenarios:
@@ -0,0 +1,108 @@
+# app/services/session_store.py
+import json
+import time
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.utils.cache import TTLCache
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Redis is optional; sessions then live in the in-process store only
+    aioredis = None
+
+
+class SessionStore:
+    """
+    Conversation state keyed by session id.
+
+    State is kept in Redis (through a pooled async client) so it survives
+    restarts and is shared by all workers. When Redis is not installed or not
+    reachable, a bounded in-process LRU with the same TTL is used instead, and
+    Redis is retried after `RETRY_SECONDS`.
+    """
+
+    KEY_PREFIX = "session:"
+    RETRY_SECONDS = 30
+
+    def __init__(self, redis_client=None, fallback_size: Optional[int] = None, ttl_seconds: Optional[int] = None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.SESSION_EXPIRE_SECONDS
+        self.fallback = TTLCache(
+            fallback_size if fallback_size is not None else settings.SESSION_CACHE_SIZE,
+            self.ttl_seconds
+        )
+        self.redis = redis_client if redis_client is not None else self._create_client()
+        self._redis_down_until = 0.0
+
+    @staticmethod
+    def _create_client():
+        if aioredis is None:
+            print("[SessionStore] Warning: redis package not installed, using in-process session store")
+            return None
+        pool = aioredis.ConnectionPool(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            password=settings.REDIS_PASSWORD or None,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            decode_responses=True
+        )
+        return aioredis.Redis(connection_pool=pool)
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.KEY_PREFIX}{session_id}"
+
+    @property
+    def redis_available(self) -> bool:
+        return self.redis is not None and time.monotonic() >= self._redis_down_until
+
+    def _mark_redis_down(self, error: Exception) -> None:
+        print(f"[SessionStore] Redis unavailable, using in-process store for {self.RETRY_SECONDS}s: {error}")
+        self._redis_down_until = time.monotonic() + self.RETRY_SECONDS
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Stored state for a session, or None if there is none"""
+        if self.redis_available:
+            try:
+                state_json = await self.redis.get(self._key(session_id))
+                if state_json:
+                    return json.loads(state_json)
+            except Exception as e:
+                self._mark_redis_down(e)
+
+        # Also covers sessions saved while Redis was down
+        state_json = self.fallback.get(session_id)
+        return json.loads(state_json) if state_json else None
+
+    async def save(self, session_id: str, state: Dict[str, Any]) -> None:
+        state_json = json.dumps(state)
+        if self.redis_available:
+            try:
+                await self.redis.set(self._key(session_id), state_json, ex=self.ttl_seconds)
+                self.fallback.pop(session_id)
+                return
+            except Exception as e:
+                self._mark_redis_down(e)
+        self.fallback.set(session_id, state_json)
+
+    async def delete(self, session_id: str) -> None:
+        self.fallback.pop(session_id)
+        if self.redis_available:
+            try:
+                await self.redis.delete(self._key(session_id))
+            except Exception as e:
+                self._mark_redis_down(e)
+
+    async def close(self) -> None:
+        if self.redis is not None:
+            close = getattr(self.redis, "aclose", None) or self.redis.close
+            await close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis" if self.redis_available else "memory",
+            "ttl_seconds": self.ttl_seconds,
+            "fallback": self.fallback.stats()
+        }
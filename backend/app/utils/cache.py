@@ -0,0 +1,88 @@
+# app/utils/cache.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with an optional time-to-live per entry.
+
+    Entries beyond `max_size` are evicted least-recently-used first, and
+    entries older than `ttl_seconds` are treated as missing. A TTL of 0
+    disables expiry. Hit and miss counts are kept for reporting.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - stored_at > self.ttl_seconds
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, refreshing its recency, or default"""
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or self._expired(item[1], now):
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key: Hashable, value: Any, age: float = 0.0) -> None:
+        """
+        Store a value, evicting the least recently used entries if full. `age`
+        is how long ago it was first stored (e.g. when restored from disk), so
+        it expires on its original schedule.
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() - age)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.pop(key, None)
+        return default if item is None else item[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def prune(self) -> int:
+        """Drop expired entries and return how many were removed"""
+        if self.ttl_seconds <= 0:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (_, stored_at) in self._data.items() if self._expired(stored_at, now)]
+            for key in expired:
+                del self._data[key]
+        return len(expired)
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else None
+        }
@@ -0,0 +1,47 @@
+# app/utils/json_repair.py
+import re
+
+CODE_FENCE = re.compile(r"```[a-zA-Z]*\s*")
+TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+SMART_QUOTES = str.maketrans({
+    "“": '"', "”": '"', "„": '"', "‟": '"',
+    "‘": "'", "’": "'", "‚": "'", "‛": "'"
+})
+
+
+def _outside_strings(text: str, fix) -> str:
+    """Apply `fix` to the parts of a JSON text that are not inside string literals"""
+    parts, start, in_string, escaped = [], 0, False, False
+    for i, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+                parts.append(text[start:i + 1])
+                start = i + 1
+        elif char == '"':
+            in_string = True
+            parts.append(fix(text[start:i]))
+            start = i
+    tail = text[start:]
+    parts.append(tail if in_string else fix(tail))
+    return "".join(parts)
+
+
+def repair_json(text: str) -> str:
+    """
+    Cheap local fixes for common LLM JSON mistakes: markdown code fences,
+    typographic quotes used as JSON quotes, and trailing commas before a
+    closing bracket. Returns the text unchanged if there is nothing to fix.
+    """
+    if not text:
+        return text
+    repaired = CODE_FENCE.sub("", text).strip().rstrip(",").strip()
+    # Smart double quotes only become JSON quotes where they delimit strings;
+    # inside a properly quoted string they are left alone
+    repaired = _outside_strings(repaired, lambda part: part.translate(SMART_QUOTES))
+    repaired = _outside_strings(repaired, lambda part: TRAILING_COMMA.sub(r"\1", part))
+    return repaired
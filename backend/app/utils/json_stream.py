@@ -0,0 +1,97 @@
+# app/utils/json_stream.py
+import json
+import re
+from typing import Any, List
+
+from app.utils.json_repair import repair_json
+
+
+class JSONArrayStream:
+    """
+    Incremental parser for the elements of one array in a streamed JSON object.
+
+    Text is fed in chunks as it arrives (e.g. LLM tokens). Once the array under
+    `key` has started, every element that closes is parsed and returned from
+    `feed`, so callers can use it before the rest of the document exists. A
+    truncated document still yields every element that was completed.
+    Elements that are not valid JSON on their own get the same local repairs
+    as whole documents (`repair_json`); those still invalid are skipped and
+    counted.
+    """
+
+    def __init__(self, key: str):
+        self._start_pattern = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+        self._buffer = ""
+        self._pos = 0            # Next unscanned character
+        self._in_array = False
+        self.done = False        # The array has closed
+        self._depth = 0          # Nesting depth inside the array
+        self._element_start = None
+        self._in_string = False
+        self._escaped = False
+        self.elements = 0
+        self.invalid = 0
+
+    def feed(self, text: str) -> List[Any]:
+        """Add a chunk and return the array elements completed by it"""
+        self._buffer += text
+        if self.done:
+            return []
+
+        if not self._in_array:
+            match = self._start_pattern.search(self._buffer)
+            if match is None:
+                return []
+            self._in_array = True
+            self._pos = match.end()
+
+        completed = []
+        buffer = self._buffer
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0:
+                    self._element_start = i
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    # Closing bracket of the array itself
+                    self.done = True
+                    self._pos = i + 1
+                    return completed
+                self._depth -= 1
+                if self._depth == 0:
+                    element = self._parse(buffer[self._element_start:i + 1])
+                    if element is not None:
+                        completed.append(element)
+                    self._element_start = None
+        self._pos = len(buffer)
+        return completed
+
+    def _parse(self, text: str) -> Any:
+        try:
+            element = json.loads(text)
+        except json.JSONDecodeError:
+            try:
+                element = json.loads(repair_json(text))
+            except json.JSONDecodeError:
+                self.invalid += 1
+                return None
+        self.elements += 1
+        return element
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far"""
+        return self._buffer
@@ -0,0 +1,144 @@
+# benchmarks/kb_retrieval.py
+"""
+Recall and latency of knowledge-base retrieval on a synthetic corpus: BM25
+alone, vector search alone, and the hybrid retriever (reciprocal-rank fusion).
+
+Documents are made of concepts, each written with one of several synonyms,
+plus a rare name. Half of the queries paraphrase a document's concepts with
+different synonyms (only the vectors can match them), half ask for its name
+(only BM25 can). Embeddings are local bag-of-word vectors in which synonyms
+share a vector, so no model is downloaded.
+
+    python -m benchmarks.kb_retrieval --docs 20000 --queries 500
+"""
+import argparse
+import random
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from app.retrieval.hybrid import KnowledgeRetriever
+
+
+class SyntheticStore:
+    """In-memory stand-in for kb_service: embeddings are normalised means of per-word vectors"""
+
+    def __init__(self, word_vectors: Dict[str, np.ndarray], dim: int):
+        self.word_vectors = word_vectors
+        self.dim = dim
+        self.entries: List[Dict[str, str]] = []
+        self.matrix = np.zeros((0, dim), dtype=np.float32)
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for text in texts:
+            words = [self.word_vectors[word] for word in text.lower().split() if word in self.word_vectors]
+            vector = np.mean(words, axis=0) if words else np.zeros(self.dim, dtype=np.float32)
+            vectors.append(vector / (np.linalg.norm(vector) or 1.0))
+        return np.asarray(vectors, dtype=np.float32).tolist()
+
+    def add(self, entries: List[Dict[str, str]]) -> None:
+        embeddings = np.asarray(self.embed_texts([entry["content"] for entry in entries]), dtype=np.float32)
+        self.entries.extend(entries)
+        self.matrix = np.vstack([self.matrix, embeddings])
+
+    def vector_search(self, embedding: List[float], k: int) -> List[str]:
+        scores = self.matrix @ np.asarray(embedding, dtype=np.float32)
+        top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+        return [self.entries[row]["id"] for row in top[np.argsort(-scores[top])]]
+
+    def iter_kb_entries(self, fields):
+        for offset, entry in enumerate(self.entries, start=1):
+            yield offset, {field: entry[field] for field in fields}
+
+
+def build_corpus(docs: int, queries: int, rng: random.Random, dim: int = 64, synonyms: int = 3):
+    np_rng = np.random.default_rng(rng.randrange(2 ** 32))
+    concepts = max(8, docs)
+    word_vectors = {}
+    for c in range(concepts):
+        vector = np_rng.normal(size=dim)
+        for s in range(synonyms):
+            word_vectors[f"c{c}s{s}"] = (vector + 0.2 * np_rng.normal(size=dim)).astype(np.float32)
+    fillers = [f"common{i}" for i in range(200)]
+    names = [f"name{j}" for j in range(max(1, docs // 3))]
+    # Filler words and names carry little meaning for the embedding
+    word_vectors.update({word: (0.3 * np_rng.normal(size=dim)).astype(np.float32) for word in fillers + names})
+
+    entries, doc_terms = [], []
+    for i in range(docs):
+        chosen = rng.sample(range(concepts), 4)
+        forms = [rng.randrange(synonyms) for _ in chosen]
+        name = rng.choice(names)
+        words = [f"c{c}s{s}" for c, s in zip(chosen, forms)] + rng.sample(fillers, 10) + [name]
+        rng.shuffle(words)
+        entries.append({"id": f"doc{i}", "title": f"Note {i}", "source": "synthetic", "content": " ".join(words)})
+        doc_terms.append((chosen, forms, name))
+
+    query_set = []
+    for n, i in enumerate(rng.sample(range(docs), min(queries, docs))):
+        chosen, forms, name = doc_terms[i]
+        if n % 2:
+            # Paraphrase: three of the concepts, each with a synonym the document does not use
+            picked = rng.sample(range(4), 3)
+            words = [f"c{chosen[j]}s{(forms[j] + rng.randrange(1, synonyms)) % synonyms}" for j in picked]
+        else:
+            words = [name]
+        words += rng.sample(fillers, 2)
+        rng.shuffle(words)
+        query_set.append((" ".join(words), f"doc{i}"))
+    return SyntheticStore(word_vectors, dim), entries, query_set
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(docs: int, queries: int, k: int, seed: int) -> None:
+    rng = random.Random(seed)
+    store, entries, query_set = build_corpus(docs, queries, rng)
+    retriever = KnowledgeRetriever(store, top_k=k)
+
+    # Half the corpus is loaded up front, the rest arrives as incremental writes
+    half = len(entries) // 2
+    store.add(entries[:half])
+    start = time.perf_counter()
+    retriever.load()
+    load_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(half, len(entries), 500):
+        batch = entries[i:i + 500]
+        store.add(batch)
+        retriever.add(batch)
+    add_seconds = time.perf_counter() - start
+
+    methods = {
+        "bm25": lambda query: [doc_id for doc_id, _ in retriever.bm25.search(query, k)],
+        "vector": lambda query: store.vector_search(store.embed_texts([query])[0], k),
+        "hybrid": lambda query: [passage["id"] for passage in retriever.retrieve(query, k)],
+    }
+
+    print(f"docs={docs} queries={len(query_set)} k={k}")
+    print(f"load {half} docs: {load_seconds:.2f}s, incremental add {len(entries) - half} docs: "
+          f"{(len(entries) - half) / max(add_seconds, 1e-9):.0f} docs/s")
+    for name, search in methods.items():
+        hits, latencies = 0, []
+        for query, target in query_set:
+            start = time.perf_counter()
+            found = search(query)
+            latencies.append(time.perf_counter() - start)
+            hits += target in found
+        print(f"{name:7s} recall@{k}={hits / len(query_set):.3f} "
+              f"p50={percentile(latencies, 0.5) * 1000:6.2f}ms p95={percentile(latencies, 0.95) * 1000:6.2f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("-k", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.docs, args.queries, args.k, args.seed)
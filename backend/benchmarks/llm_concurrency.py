@@ -0,0 +1,74 @@
+# benchmarks/llm_concurrency.py
+"""
+Throughput of the async LLM pipeline against the blocking one, using a
+local fake LLM with fixed latency (no network calls).
+
+    python -m benchmarks.llm_concurrency --requests 50 --latency 0.2
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from app.llm.response_generator import ResponseGenerator
+from app.services.session_store import SessionStore
+
+
+def fake_llm(latency: float) -> RunnableLambda:
+    def invoke(prompt):
+        time.sleep(latency)
+        return AIMessage(content="Great effort! Let's look at why that works.")
+
+    async def ainvoke(prompt):
+        await asyncio.sleep(latency)
+        return AIMessage(content="Great effort! Let's look at why that works.")
+
+    return RunnableLambda(invoke, afunc=ainvoke)
+
+
+PREFERENCES = {
+    "age_group": "9-11", "primary_condition": "ASD Level 1", "communication_style": "direct",
+    "literal_understanding": True, "learning_style": "visual", "attention_span": "medium",
+    "primary_support": "emotional_regulation", "interaction_pace": "normal",
+    "encouragement_style": "gentle", "correction_style": "gentle", "response_length": "brief"
+}
+
+
+async def blocking(generator: ResponseGenerator, requests: int) -> float:
+    """Concurrent handlers calling the synchronous method, as the routes used to"""
+    async def handler(i):
+        return generator.generate_simple_feedback(f"Feedback please ({i})", PREFERENCES)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[handler(i) for i in range(requests)])
+    return time.perf_counter() - start
+
+
+async def non_blocking(generator: ResponseGenerator, requests: int) -> float:
+    start = time.perf_counter()
+    # Distinct prompts, so identical in-flight calls are not coalesced
+    await asyncio.gather(*[generator.agenerate_simple_feedback(f"Feedback please ({i})", PREFERENCES) for i in range(requests)])
+    return time.perf_counter() - start
+
+
+def run(requests: int, latency: float) -> None:
+    generator = ResponseGenerator(session_store=SessionStore(fallback_size=100), llm=fake_llm(latency))
+
+    sync_seconds = asyncio.run(blocking(generator, requests))
+    async_seconds = asyncio.run(non_blocking(generator, requests))
+    print(f"requests={requests} fake latency={latency * 1000:.0f}ms")
+    print(f"blocking invoke: {sync_seconds:.2f}s ({requests / sync_seconds:.1f} req/s)")
+    print(f"async ainvoke:   {async_seconds:.2f}s ({requests / async_seconds:.1f} req/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+    run(args.requests, args.latency)
@@ -0,0 +1,90 @@
+# benchmarks/llm_router.py
+"""
+Latency and errors of feedback calls through the model router, using local
+fake providers with injected latency (no network calls).
+
+The primary model is fast but has a slow tail and occasional errors; the
+fallback is steady. "single" sends everything to the primary, "routed" fails
+over and hedges to the fallback.
+
+    python -m benchmarks.llm_router --requests 300
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from app.llm.response_generator import ResponseGenerator
+from app.llm.router import TASKS, LLMRouter, ModelEndpoint
+from app.services.session_store import SessionStore
+from benchmarks.llm_concurrency import PREFERENCES
+
+
+def fake_provider(name: str, latency: float, slow_rate: float, slow_latency: float,
+                  error_rate: float, rng: random.Random) -> RunnableLambda:
+    async def ainvoke(prompt):
+        roll = rng.random()
+        await asyncio.sleep(slow_latency if roll < slow_rate else latency)
+        if rng.random() < error_rate:
+            raise RuntimeError(f"{name}: 503 upstream error")
+        return AIMessage(content=f"Nice work! ({name})")
+
+    return RunnableLambda(lambda prompt: None, afunc=ainvoke)
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def measure(generator: ResponseGenerator, requests: int, concurrency: int):
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call(i):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            reply = await generator.agenerate_simple_feedback(f"Feedback please ({i})", PREFERENCES)
+            latencies.append(time.perf_counter() - start)
+            errors += reply.startswith("Error generating feedback")
+
+    await asyncio.gather(*[call(i) for i in range(requests)])
+    return latencies, errors
+
+
+def run(requests: int, concurrency: int, seed: int) -> None:
+    rng = random.Random(seed)
+    primary = fake_provider("primary", 0.05, 0.08, 0.8, 0.05, rng)
+    fallback = fake_provider("fallback", 0.12, 0.0, 0.0, 0.0, rng)
+
+    def generator(router: LLMRouter) -> ResponseGenerator:
+        return ResponseGenerator(session_store=SessionStore(fallback_size=10), router=router)
+
+    single = LLMRouter({task: [ModelEndpoint("primary", primary)] for task in TASKS}, hedge=False)
+    endpoints = [ModelEndpoint("primary", primary), ModelEndpoint("fallback", fallback)]
+    routed = LLMRouter({task: endpoints for task in TASKS}, hedge_min_seconds=0.1)
+
+    print(f"requests={requests} concurrency={concurrency}")
+    for name, router in (("single", single), ("routed", routed)):
+        latencies, errors = asyncio.run(measure(generator(router), requests, concurrency))
+        print(f"{name:7s} p50={percentile(latencies, 0.5) * 1000:6.0f}ms "
+              f"p95={percentile(latencies, 0.95) * 1000:6.0f}ms "
+              f"p99={percentile(latencies, 0.99) * 1000:6.0f}ms errors={errors}")
+    stats = routed.stats()
+    print(f"routed: failovers={stats['failovers']} hedges={stats['hedges']} hedge wins={stats['hedge_wins']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.requests, args.concurrency, args.seed)
@@ -0,0 +1,65 @@
+# benchmarks/prompt_overhead.py
+"""
+Per-turn Python overhead of preparing chat prompts, before and after the
+chain and therapeutic-prompt caches.
+
+"uncached" rebuilds the analysis and response chains and renders the full
+therapeutic prompt every turn, as each chat turn used to. "cached" reuses
+the chains built at startup and only fills the session slots of the
+per-profile prompt skeleton.
+
+    python -m benchmarks.prompt_overhead --turns 2000
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+from langchain_core.runnables import RunnableLambda
+
+from app.llm.response_generator import ResponseGenerator
+from app.models.preferences import UserPreferences
+from app.services.session_store import SessionStore
+
+PREFERENCES = UserPreferences(
+    age_group="9-11", primary_condition="ASD Level 1", communication_style="direct",
+    literal_understanding=True, learning_style="visual", attention_span="medium",
+    primary_support="emotional_regulation", interaction_pace="normal",
+    encouragement_style="gentle", correction_style="gentle", response_length="brief"
+)
+
+
+def per_turn_microseconds(turn, turns: int) -> float:
+    start = time.perf_counter()
+    for i in range(turns):
+        turn(i)
+    return (time.perf_counter() - start) / turns * 1e6
+
+
+def run(turns: int) -> None:
+    generator = ResponseGenerator(session_store=SessionStore(fallback_size=10), llm=RunnableLambda(lambda p: p))
+    processor = generator.preference_processor
+
+    def uncached(i):
+        generator.create_conversation_analysis_chain()
+        generator.create_response_generation_chain()
+        processor.skeleton_cache.clear()
+        processor._therapeutic_template(PREFERENCES, {"turn_count": i, "user_engagement_level": "low"})
+
+    def cached(i):
+        generator.analysis_chain, generator.response_chain
+        processor._therapeutic_template(PREFERENCES, {"turn_count": i, "user_engagement_level": "low"})
+
+    before = per_turn_microseconds(uncached, turns)
+    after = per_turn_microseconds(cached, turns)
+    print(f"turns={turns}")
+    print(f"uncached: {before:8.1f} us/turn")
+    print(f"cached:   {after:8.1f} us/turn ({before / after:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=2000)
+    args = parser.parse_args()
+    run(args.turns)
@@ -0,0 +1,79 @@
+# benchmarks/quantized_index.py
+"""
+Memory, latency and top-k overlap of quantised scenario index storage.
+
+Compares float16 and int8 storage (with and without the float32 re-rank)
+against the current float32 exact search on a synthetic clustered catalogue.
+As in ScenarioService, the embeddings are memory-mapped from a .npy file: the
+re-rank reads its source rows from the mapping, reported separately from the
+resident index memory.
+
+    python -m benchmarks.quantized_index --rows 100000 --queries 200
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.retrieval.vector_index import ExactIndex
+
+
+def synthetic_embeddings(rows: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    noise = rng.normal(scale=0.6, size=(rows, dim))
+    return (centers[rng.integers(0, clusters, rows)] + noise).astype(np.float32)
+
+
+def run(rows: int, dim: int, queries: int, k: int, rerank: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "embeddings.npy"
+        np.save(path, synthetic_embeddings(rows, dim, clusters=max(1, rows // 500)))
+        compare(np.load(path, mmap_mode="r"), queries, k, rerank)
+
+
+def compare(embeddings: np.ndarray, queries: int, k: int, rerank: int) -> None:
+    rows, dim = embeddings.shape
+    rng = np.random.default_rng(1)
+    query_vectors = embeddings[rng.choice(rows, queries, replace=False)] + rng.normal(scale=0.3, size=(queries, dim))
+
+    baseline = ExactIndex(embeddings)
+    expected = [set(baseline.search(q, k)[0]) for q in query_vectors]
+
+    configs = [
+        ("float32", 0),
+        ("float16", 0),
+        ("float16", rerank),
+        ("int8", 0),
+        ("int8", rerank),
+    ]
+    print(f"rows={rows} dim={dim} queries={queries} k={k}")
+    print(f"{'storage':<10}{'rerank':>8}{'resident MB':>13}{'mapped MB':>11}"
+          f"{'p50 ms':>10}{'p99 ms':>10}{'overlap@k':>12}")
+    for dtype, depth in configs:
+        index = ExactIndex(embeddings, dtype=dtype, rerank=depth)
+        latencies = []
+        overlap = 0
+        for query, truth in zip(query_vectors, expected):
+            start = time.perf_counter()
+            found, _ = index.search(query, k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            overlap += len(truth.intersection(found))
+        print(
+            f"{dtype:<10}{depth:>8}{index.memory_bytes() / 2**20:>13.1f}{index.mapped_bytes() / 2**20:>11.1f}"
+            f"{np.percentile(latencies, 50):>10.2f}{np.percentile(latencies, 99):>10.2f}"
+            f"{overlap / (k * queries):>12.3f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rerank", type=int, default=100)
+    args = parser.parse_args()
+    run(args.rows, args.dim, args.queries, args.k, args.rerank)
@@ -0,0 +1,5 @@
+# tests/conftest.py
+import os
+
+# Settings require an API key at import time; tests never reach a provider
+os.environ.setdefault("GROQ_API_KEY", "test")
@@ -0,0 +1,80 @@
+# tests/test_answer_cache.py
+import asyncio
+
+import numpy as np
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from app.llm.answer_cache import SemanticAnswerCache
+from app.llm.response_generator import ResponseGenerator
+from app.models.preferences import UserPreferences
+from app.services.session_store import SessionStore
+
+PREFERENCES = {
+    "age_group": "9-11", "primary_condition": "ASD Level 1", "communication_style": "direct",
+    "literal_understanding": True, "learning_style": "visual", "attention_span": "medium",
+    "primary_support": "emotional_regulation", "interaction_pace": "normal",
+    "encouragement_style": "gentle", "correction_style": "gentle", "response_length": "brief"
+}
+
+
+async def encode(text: str) -> np.ndarray:
+    """Bag-of-letters embedding: identical messages match exactly"""
+    vector = np.zeros(26, dtype=np.float32)
+    for char in text.lower():
+        if char.isalpha():
+            vector[ord(char) - ord("a")] += 1
+    return vector
+
+
+def prefs(**changes) -> UserPreferences:
+    return UserPreferences(**dict(PREFERENCES, **changes))
+
+
+def test_bucket_covers_every_rendered_preference_field():
+    base = SemanticAnswerCache.bucket(prefs())
+    for changes in ({"sensory_sensitivities": ["auditory"]}, {"regulation_tools": ["quiet_space"]},
+                    {"effective_strategies": ["timers"]}, {"primary_support": "social_skills"},
+                    {"learning_style": "auditory"}, {"attention_span": "short"},
+                    {"additional_notes": "Loves trains"}):
+        assert SemanticAnswerCache.bucket(prefs(**changes)) != base, changes
+
+    # List order does not change the prompt's meaning
+    assert (SemanticAnswerCache.bucket(prefs(sensory_sensitivities=["auditory", "visual"]))
+            == SemanticAnswerCache.bucket(prefs(sensory_sensitivities=["visual", "auditory"])))
+
+
+def test_bucket_includes_retrieved_context():
+    assert (SemanticAnswerCache.bucket(prefs(), "[1] Breathing: in for four")
+            != SemanticAnswerCache.bucket(prefs(), "[1] Music: try headphones"))
+
+
+def test_replies_are_not_shared_across_profiles():
+    cache = SemanticAnswerCache(encode, threshold=0.99)
+
+    async def scenario():
+        lookup = await cache.lookup("How can I calm down?", cache.bucket(prefs()))
+        cache.store(lookup, "Try listening to calm music.")
+        same = await cache.lookup("How can I calm down?", cache.bucket(prefs()))
+        other = await cache.lookup("How can I calm down?", cache.bucket(prefs(sensory_sensitivities=["auditory"])))
+        return same.reply, other.reply
+
+    assert asyncio.run(scenario()) == ("Try listening to calm music.", None)
+
+
+def test_users_with_notes_skip_the_cache():
+    assert SemanticAnswerCache.cacheable(prefs())
+    assert SemanticAnswerCache.cacheable(prefs(additional_notes="  "))
+    assert not SemanticAnswerCache.cacheable(prefs(additional_notes="Loves trains"))
+
+    llm = RunnableLambda(lambda prompt: AIMessage(content="Hi"))
+    generator = ResponseGenerator(session_store=SessionStore(fallback_size=10), llm=llm,
+                                  answer_cache=SemanticAnswerCache(encode))
+    state = {"turn_count": 0, "history": [], "summary": ""}
+    inputs = {"analysis": "{}", "context": "None"}
+
+    async def lookup(preferences):
+        return await generator._lookup_answer("How can I calm down?", preferences, state, inputs)
+
+    assert asyncio.run(lookup(PREFERENCES)) is not None
+    assert asyncio.run(lookup(dict(PREFERENCES, additional_notes="Loves trains"))) is None
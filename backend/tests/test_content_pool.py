@@ -0,0 +1,56 @@
+# tests/test_content_pool.py
+import asyncio
+
+from app.models.preferences import UserPreferences
+from app.models.scenario import Scenario
+from app.models.scenario_content import FeedbackStep, ScenarioContent
+from app.services.content_pool import ScenarioContentPool
+
+PREFERENCES = {
+    "age_group": "9-11", "primary_condition": "ASD Level 1", "communication_style": "direct",
+    "literal_understanding": True, "learning_style": "visual", "attention_span": "medium",
+    "primary_support": "emotional_regulation", "interaction_pace": "normal",
+    "encouragement_style": "gentle", "correction_style": "gentle", "response_length": "brief"
+}
+
+
+def scenario(scenario_id: str) -> Scenario:
+    return Scenario(
+        id=scenario_id, title="Lunch line", description="Waiting in the lunch line",
+        scenario_type="social_skills", primary_conditions=["ASD Level 1"], difficulty="beginner",
+        target_age_groups=["9-11"], content="Someone cuts in front of you.",
+        suggested_strategies=["deep breaths"], communication_style=["direct"], attention_span="medium"
+    )
+
+
+class CountingGenerator:
+    """Scenario generator stand-in that records which scenarios it generated content for"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def agenerate_scenario_content(self, scenario, user_prefs):
+        self.calls.append(scenario.id)
+        await asyncio.sleep(0)
+        return ScenarioContent(steps=[FeedbackStep(type="feedback", content="Nice")], total_questions=0,
+                               estimated_duration="5 minutes")
+
+
+def test_refills_queued_for_evicted_pools_are_skipped():
+    generator = CountingGenerator()
+    pool = ScenarioContentPool(generator, depth=1, max_pools=1, workers=1)
+    prefs = UserPreferences(**PREFERENCES)
+
+    async def scenario_run():
+        # Both refills are queued before the worker runs; the second take evicts the first pool
+        assert pool.take_ready(scenario("a"), prefs) is None
+        assert pool.take_ready(scenario("b"), prefs) is None
+        for _ in range(20):
+            await asyncio.sleep(0)
+        await pool.close()
+
+    asyncio.run(scenario_run())
+
+    assert generator.calls == ["b"]
+    assert pool.stats()["skipped_refills"] == 1
+    assert pool.stats()["pooled_items"] == 1
@@ -0,0 +1,103 @@
+# tests/test_conversation_summary.py
+import asyncio
+import json
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from app.llm.response_generator import ResponseGenerator
+
+REWRITTEN = "The user likes trains."
+
+
+class MemoryStore:
+    """Session store stand-in; saves of a rewritten summary can be held back to widen the race window"""
+
+    def __init__(self):
+        self.data = {}
+        self.hold_rewrites = None  # asyncio.Event the rewrite's save waits for
+        self.rewrite_waiting = asyncio.Event()
+
+    async def get(self, session_id):
+        state = self.data.get(session_id)
+        return json.loads(state) if state else None
+
+    async def save(self, session_id, state):
+        if self.hold_rewrites is not None and state["summary"].startswith(REWRITTEN):
+            self.rewrite_waiting.set()
+            await self.hold_rewrites.wait()
+        self.data[session_id] = json.dumps(state)
+
+    async def close(self):
+        pass
+
+
+def make_generator(store: MemoryStore, summary_gate: asyncio.Event) -> ResponseGenerator:
+    async def ainvoke(prompt):
+        if "Rewrite these notes" in prompt.to_string():
+            await summary_gate.wait()
+            return AIMessage(content=REWRITTEN)
+        return AIMessage(content="Hello!")
+
+    llm = RunnableLambda(lambda prompt: None, afunc=ainvoke)
+    return ResponseGenerator(session_store=store, llm=llm)
+
+
+def initial_state():
+    return {"turn_count": 5, "history": [], "summary": "- User: trains / Assistant: nice",
+            "summary_stale": True, "engagement_level": "low", "user_name": None}
+
+
+def test_turn_committed_during_the_summary_call_is_kept():
+    async def scenario():
+        store = MemoryStore()
+        gate = asyncio.Event()
+        generator = make_generator(store, gate)
+        await store.save("s", initial_state())
+
+        generator._schedule_summary_refresh("s")
+        task = generator._summary_tasks["s"]
+        await asyncio.sleep(0)
+
+        state = await generator._get_conversation_state("s")
+        await generator._commit_turn("s", state, "I saw a train", "Hello!")
+        gate.set()
+        await task
+        return await store.get("s")
+
+    final = asyncio.run(scenario())
+
+    assert final["turn_count"] == 6
+    assert final["history"] == [{"user": "I saw a train", "assistant": "Hello!"}]
+    assert final["summary"] == REWRITTEN
+    assert not final["summary_stale"]
+
+
+def test_turn_committed_while_the_summary_is_written_is_kept():
+    async def scenario():
+        store = MemoryStore()
+        gate = asyncio.Event()
+        gate.set()
+        store.hold_rewrites = asyncio.Event()
+        generator = make_generator(store, gate)
+        await store.save("s", initial_state())
+
+        # The turn loads its state before the summary rewrite lands
+        state = await generator._get_conversation_state("s")
+        generator._schedule_summary_refresh("s")
+        task = generator._summary_tasks["s"]
+        await store.rewrite_waiting.wait()  # The rewrite has re-read the state and is saving it
+
+        commit = asyncio.create_task(generator._commit_turn("s", state, "I saw a train", "Hello!"))
+        await asyncio.sleep(0.01)
+        store.hold_rewrites.set()
+        await asyncio.gather(commit, task)
+        return await store.get("s"), generator
+
+    final, generator = asyncio.run(scenario())
+
+    assert final["turn_count"] == 6
+    assert final["history"] == [{"user": "I saw a train", "assistant": "Hello!"}]
+    # The commit kept the rewrite instead of writing the old summary back
+    assert final["summary"] == REWRITTEN
+    assert not generator._summary_locks and not generator._summary_tasks
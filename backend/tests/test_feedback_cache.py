@@ -0,0 +1,69 @@
+# tests/test_feedback_cache.py
+import asyncio
+import json
+import time
+
+from app.services.feedback_cache import FeedbackCache
+
+
+def write_lines(path, *entries):
+    with open(path, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+
+
+def test_disk_entries_round_trip_with_store_time(tmp_path):
+    path = str(tmp_path / "feedback.jsonl")
+    cache = FeedbackCache(ttl_seconds=3600, backend="disk", path=path)
+    asyncio.run(cache.set("a", {"feedback": "Well done"}))
+
+    with open(path, encoding="utf-8") as f:
+        line = json.loads(f.readline())
+    assert line["key"] == "a" and abs(line["stored_at"] - time.time()) < 60
+
+    reloaded = FeedbackCache(ttl_seconds=3600, backend="disk", path=path)
+    assert reloaded.get_local("a") == {"feedback": "Well done"}
+
+
+def test_expired_disk_entries_are_dropped_on_load(tmp_path):
+    path = tmp_path / "feedback.jsonl"
+    now = time.time()
+    write_lines(path,
+                {"key": "old", "value": {"feedback": "stale"}, "stored_at": now - 7200},
+                {"key": "recent", "value": {"feedback": "fresh"}, "stored_at": now - 60})
+
+    cache = FeedbackCache(ttl_seconds=3600, backend="disk", path=str(path))
+
+    assert cache.get_local("old") is None
+    assert cache.get_local("recent") == {"feedback": "fresh"}
+    # The compacted file only keeps what was loaded
+    with open(path, encoding="utf-8") as f:
+        assert [json.loads(line)["key"] for line in f] == ["recent"]
+
+
+def test_reloaded_entries_keep_their_remaining_ttl(tmp_path):
+    path = tmp_path / "feedback.jsonl"
+    write_lines(path, {"key": "a", "value": {"feedback": "ok"}, "stored_at": time.time() - 0.9})
+
+    cache = FeedbackCache(ttl_seconds=1, backend="disk", path=str(path))
+    assert cache.get_local("a") == {"feedback": "ok"}
+    time.sleep(0.2)
+    assert cache.get_local("a") is None
+
+
+def test_lines_without_store_time_start_their_ttl_at_load(tmp_path):
+    path = tmp_path / "feedback.jsonl"
+    write_lines(path, {"key": "a", "value": {"feedback": "ok"}}, {"key": "a", "value": {"feedback": "newer"}})
+
+    cache = FeedbackCache(ttl_seconds=3600, backend="disk", path=str(path))
+
+    assert cache.get_local("a") == {"feedback": "newer"}
+    with open(path, encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f]
+    assert len(lines) == 1 and "stored_at" in lines[0]
+
+
+def test_entries_never_expire_without_a_ttl(tmp_path):
+    path = tmp_path / "feedback.jsonl"
+    write_lines(path, {"key": "a", "value": {"feedback": "ok"}, "stored_at": 0})
+    assert FeedbackCache(ttl_seconds=0, backend="disk", path=str(path)).get_local("a") == {"feedback": "ok"}
@@ -0,0 +1,100 @@
+# tests/test_hybrid_retriever.py
+import asyncio
+import time
+
+from app.core.container import ServiceContainer
+from app.retrieval.hybrid import KnowledgeRetriever
+
+ENTRIES = [
+    {"id": "a", "title": "Deep breathing", "source": "guide", "content": "Breathe in for four counts"},
+    {"id": "b", "title": "Quiet space", "source": "guide", "content": "A calm corner with headphones"},
+]
+
+
+class FlakyStore:
+    """KB store stand-in whose first `failures` full scans fail, as when Chroma is briefly unavailable"""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.scans = 0
+
+    def iter_kb_entries(self, fields):
+        self.scans += 1
+        if self.scans <= self.failures:
+            raise ConnectionError("Chroma unavailable")
+        for offset, entry in enumerate(ENTRIES, start=1):
+            yield offset, {field: entry[field] for field in fields}
+
+    def embed_texts(self, texts):
+        return [[1.0, 0.0] for _ in texts]
+
+    def vector_search(self, embedding, k):
+        return [entry["id"] for entry in ENTRIES][:k]
+
+
+def wait_until(condition, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def make_retriever(failures: int) -> KnowledgeRetriever:
+    retriever = KnowledgeRetriever(FlakyStore(failures))
+    retriever.RETRY_MIN_SECONDS = 0.01
+    retriever.RETRY_MAX_SECONDS = 0.02
+    return retriever
+
+
+def test_failed_load_is_reported_and_retried_in_the_background():
+    retriever = make_retriever(failures=3)
+    try:
+        retriever.load()
+    except ConnectionError:
+        pass
+    assert not retriever.loaded
+    assert retriever.stats()["load_error"] == "Chroma unavailable"
+    assert retriever.retrieve("breathing") == []
+
+    retriever.load_in_background()
+    retriever.load_in_background()  # Already retrying: no second thread
+    assert wait_until(lambda: retriever.loaded)
+
+    assert retriever.store.scans == 4
+    assert retriever.stats()["load_error"] is None
+    assert retriever.stats()["load_attempts"] == 4
+    assert retriever.retrieve("breathing")[0]["id"] == "a"
+
+
+def test_kb_write_before_the_index_exists_starts_the_load():
+    retriever = make_retriever(failures=1)
+    retriever.add([ENTRIES[0]])
+    assert wait_until(lambda: retriever.loaded)
+    assert set(retriever.passages) == {"a", "b"}
+
+
+def test_container_reports_a_failed_index_load_as_degraded():
+    container = ServiceContainer()
+    retriever = make_retriever(failures=100)
+    container._kb_retriever = retriever
+    try:
+        retriever.load()
+    except ConnectionError:
+        pass
+
+    status = container.status()
+    assert status["degraded"] == ["knowledge_base"]
+    assert status["knowledge_base"]["loaded"] is False
+    assert status["knowledge_base"]["load_error"] == "Chroma unavailable"
+
+
+def test_warm_up_retries_a_failed_index_load():
+    container = ServiceContainer()
+    container._kb_retriever = make_retriever(failures=2)
+    container.started_at = time.monotonic()
+    asyncio.run(container._warm_up())
+
+    assert wait_until(lambda: container._kb_retriever.loaded)
+    assert container.degraded() == []
@@ -0,0 +1,104 @@
+# tests/test_kb_import.py
+import asyncio
+import io
+import threading
+
+import pytest
+
+from app.services.kb_import import KBImportManager
+
+
+class Upload:
+    """Async upload stand-in (FastAPI's UploadFile has the same `read(size)`)"""
+
+    def __init__(self, data: bytes):
+        self.file = io.BytesIO(data)
+
+    async def read(self, size: int) -> bytes:
+        return self.file.read(size)
+
+
+class BlockingManager(KBImportManager):
+    """Import manager whose worker marks a job running and then waits to be released"""
+
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.processed = []
+
+    def _process(self, job_id):
+        job = self.get(job_id)
+        job["status"] = "running"
+        self._save(job)
+        self.processed.append(job_id)
+        self.started.set()
+        self.release.wait(5)
+        job = self.get(job_id)
+        job["status"], job["error"] = "failed", "embedding service unavailable"
+        self._save(job)
+
+
+async def submit(manager):
+    return await manager.submit(Upload(b"title,content\nA,B\n"), "kb.csv")
+
+
+def test_running_job_cannot_be_resumed(tmp_path):
+    manager = BlockingManager(str(tmp_path))
+
+    async def scenario():
+        job = await submit(manager)
+        with pytest.raises(ValueError, match="already queued"):
+            manager.resume(job["id"])
+
+        await asyncio.to_thread(manager.started.wait, 5)
+        with pytest.raises(ValueError, match="already running"):
+            manager.resume(job["id"])
+
+        manager.release.set()
+        while job["id"] in manager._owned:
+            await asyncio.sleep(0.01)
+        # Failed: resuming is allowed and the job is processed again
+        assert manager.resume(job["id"])["status"] == "queued"
+        while job["id"] in manager._owned:
+            await asyncio.sleep(0.01)
+        await manager.close()
+        return job["id"]
+
+    job_id = asyncio.run(scenario())
+    assert manager.processed == [job_id, job_id]
+
+
+def test_job_left_running_by_another_process_can_be_resumed(tmp_path):
+    manager = KBImportManager(str(tmp_path))
+
+    async def scenario():
+        job = await submit(manager)
+        await manager.close()  # Simulate the crash: nothing in this process owns the job now
+
+        restarted = BlockingManager(str(tmp_path))
+        stored = restarted.get(job["id"])
+        stored["status"] = "running"
+        restarted._save(stored)
+
+        resumed = restarted.resume(job["id"])
+        restarted.release.set()
+        await restarted.close()
+        return resumed
+
+    assert asyncio.run(scenario())["status"] == "queued"
+
+
+def test_completed_job_cannot_be_resumed(tmp_path):
+    manager = KBImportManager(str(tmp_path))
+
+    async def scenario():
+        job = await submit(manager)
+        await manager.close()
+        job["status"] = "completed"
+        manager._save(job)
+        with pytest.raises(ValueError, match="already completed"):
+            manager.resume(job["id"])
+
+    asyncio.run(scenario())
+    assert manager.resume("unknown") is None
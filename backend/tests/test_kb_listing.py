@@ -0,0 +1,82 @@
+# tests/test_kb_listing.py
+import pytest
+
+pytest.importorskip("chromadb")
+
+from app.services import kb_service  # noqa: E402
+
+
+class FakeCollection:
+    """Chroma collection stand-in listing entries in insertion order"""
+
+    def __init__(self):
+        self.rows = {}
+
+    def add_entry(self, kb_id, title, source="notes"):
+        self.rows[kb_id] = ({"title": title, "source": source}, f"content of {kb_id}")
+
+    def delete(self, ids):
+        for kb_id in ids:
+            self.rows.pop(kb_id, None)
+
+    def get(self, where=None, limit=None, offset=0, include=None, ids=None):
+        keys = [kb_id for kb_id, (meta, _) in self.rows.items()
+                if (ids is None or kb_id in ids) and all(meta.get(k) == v for k, v in (where or {}).items())]
+        keys = keys[offset:offset + limit if limit is not None else None]
+        return {"ids": keys, "metadatas": [self.rows[k][0] for k in keys],
+                "documents": [self.rows[k][1] for k in keys]}
+
+
+@pytest.fixture
+def collection(monkeypatch):
+    fake = FakeCollection()
+    for i in range(10):
+        fake.add_entry(f"e{i}", f"Entry {i}")
+    monkeypatch.setattr(kb_service, "collection", fake)
+    return fake
+
+
+def listing(limit, cursor=None, fields=kb_service.DEFAULT_FIELDS, **filters):
+    page = kb_service.list_kb_entries(limit, cursor, fields, **filters)
+    return [entry.get("id") or entry["title"] for entry in page["items"]], page["next_cursor"]
+
+
+def test_pages_cover_every_entry_once(collection):
+    seen, cursor = [], None
+    while True:
+        ids, cursor = listing(3, cursor)
+        seen += ids
+        if cursor is None:
+            break
+    assert seen == [f"e{i}" for i in range(10)]
+
+
+def test_deletes_between_pages_do_not_skip_entries(collection):
+    first, cursor = listing(4)
+    assert first == ["e0", "e1", "e2", "e3"]
+
+    collection.delete(["e0", "e1"])
+    second, _ = listing(4, cursor)
+    assert second == ["e4", "e5", "e6", "e7"]
+
+
+def test_inserts_between_pages_do_not_repeat_entries(collection):
+    first, cursor = listing(4)
+    # An entry inserted before the cursor position (e.g. re-added after a delete elsewhere)
+    collection.rows = {"new": ({"title": "New", "source": "notes"}, "new"), **collection.rows}
+
+    second, _ = listing(4, cursor)
+    assert second == ["e4", "e5", "e6", "e7"]
+
+
+def test_cursor_works_without_the_id_field(collection):
+    page = kb_service.list_kb_entries(5, None, ("title",))
+    assert page["items"][0] == {"title": "Entry 0"}
+    _, after = kb_service.decode_cursor(page["next_cursor"])
+    assert after == "e4"
+
+
+def test_offset_only_cursors_still_decode():
+    assert kb_service.decode_cursor(kb_service.encode_cursor(7)) == (7, None)
+    with pytest.raises(ValueError):
+        kb_service.decode_cursor("not-a-cursor")
@@ -0,0 +1,86 @@
+# tests/test_llm_concurrency.py
+import asyncio
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from app.core.config import settings
+from app.llm.response_generator import ResponseGenerator
+from app.services.session_store import SessionStore
+
+PREFERENCES = {
+    "age_group": "9-11", "primary_condition": "ASD Level 1", "communication_style": "direct",
+    "literal_understanding": True, "learning_style": "visual", "attention_span": "medium",
+    "primary_support": "emotional_regulation", "interaction_pace": "normal",
+    "encouragement_style": "gentle", "correction_style": "gentle", "response_length": "brief"
+}
+
+
+class FakeLLM:
+    """Async fake LLM with a fixed latency that records how many calls overlap"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.in_flight = 0
+        self.peak = 0
+        self.calls = 0
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        return AIMessage(content="Great effort!")
+
+    def runnable(self) -> RunnableLambda:
+        return RunnableLambda(lambda prompt: None, afunc=self.ainvoke)
+
+
+def make_generator(fake: FakeLLM) -> ResponseGenerator:
+    return ResponseGenerator(session_store=SessionStore(fallback_size=10), llm=fake.runnable())
+
+
+def test_llm_calls_are_limited_to_max_concurrency(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_MAX_CONCURRENCY", 2)
+    fake = FakeLLM(latency=0.05)
+
+    async def scenario():
+        generator = make_generator(fake)
+        # Distinct prompts, so identical in-flight calls are not coalesced
+        return await asyncio.gather(*[generator.agenerate_simple_feedback(f"Feedback please ({i})", PREFERENCES)
+                                      for i in range(6)])
+
+    replies = asyncio.run(scenario())
+
+    assert replies == ["Great effort!"] * 6
+    assert fake.calls == 6
+    assert fake.peak == 2
+
+
+def test_slow_llm_call_times_out_and_releases_its_slot(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(settings, "LLM_TIMEOUT_SECONDS", 0.05)
+    fake = FakeLLM(latency=5.0)
+
+    async def scenario():
+        generator = make_generator(fake)
+        inputs = generator._simple_feedback_inputs("Feedback please", PREFERENCES)
+        try:
+            await generator._ainvoke(generator.simple_feedback_chain, inputs)
+        except asyncio.TimeoutError:
+            timed_out = True
+        else:
+            timed_out = False
+        reply = await generator.agenerate_simple_feedback("Feedback please (again)", PREFERENCES)
+        return timed_out, reply, generator.llm_semaphore.locked()
+
+    timed_out, reply, locked = asyncio.run(scenario())
+
+    assert timed_out
+    assert reply.startswith("Error generating feedback")
+    # Both calls were cancelled and gave back the single slot
+    assert fake.in_flight == 0
+    assert not locked
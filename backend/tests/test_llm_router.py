@@ -0,0 +1,261 @@
+# tests/test_llm_router.py
+import asyncio
+import time
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from app.llm.router import TASKS, LLMRouter, ModelEndpoint
+
+
+class FakeProvider:
+    """Async-only fake LLM with adjustable latency and failures; records its calls"""
+
+    def __init__(self, name: str, latency: float = 0.0, error: Exception = None):
+        self.name = name
+        self.latency = latency
+        self.error = error
+        self.calls = 0
+        self.cancelled = 0
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.latency)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+        return AIMessage(content=self.name)
+
+    async def astream(self, prompt):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        for word in (self.name, "done"):
+            yield AIMessage(content=word)
+
+    def runnable(self) -> RunnableLambda:
+        return RunnableLambda(lambda prompt: None, afunc=self.ainvoke)
+
+
+def make_router(*providers: FakeProvider, **options):
+    endpoints = [ModelEndpoint(provider.name, provider.runnable()) for provider in providers]
+    return LLMRouter({task: endpoints for task in TASKS}, **options), endpoints
+
+
+def test_missing_task_route_is_rejected():
+    endpoint = ModelEndpoint("primary", FakeProvider("primary").runnable())
+    with pytest.raises(ValueError):
+        LLMRouter({"chat": [endpoint]})
+
+
+def test_fails_over_in_configured_order():
+    primary = FakeProvider("primary", error=RuntimeError("503"))
+    secondary = FakeProvider("secondary", error=RuntimeError("429"))
+    tertiary = FakeProvider("tertiary")
+    router, endpoints = make_router(primary, secondary, tertiary)
+
+    result = asyncio.run(router.ainvoke("feedback", "hello"))
+
+    assert result.content == "tertiary"
+    assert (primary.calls, secondary.calls, tertiary.calls) == (1, 1, 1)
+    assert router.failovers == 2
+    assert [list(endpoint.outcomes) for endpoint in endpoints] == [[False], [False], [True]]
+
+
+def test_all_endpoints_failing_raises_the_last_error():
+    primary = FakeProvider("primary", error=RuntimeError("primary down"))
+    fallback = FakeProvider("fallback", error=RuntimeError("fallback down"))
+    router, endpoints = make_router(primary, fallback)
+
+    with pytest.raises(RuntimeError, match="fallback down"):
+        asyncio.run(router.ainvoke("chat", "hello"))
+    assert router.failovers == 1
+    assert all(endpoint.in_flight == 0 for endpoint in endpoints)
+
+
+def test_slow_primary_is_hedged_and_the_loser_cancelled():
+    primary = FakeProvider("primary", latency=0.01)
+    fallback = FakeProvider("fallback", latency=0.01)
+    router, endpoints = make_router(primary, fallback, hedge_min_seconds=0.05, min_samples=5)
+
+    async def scenario():
+        for _ in range(5):
+            assert (await router.ainvoke("feedback", "hello")).content == "primary"
+        assert fallback.calls == 0  # No hedging before min_samples latencies
+
+        primary.latency = 5.0
+        started = time.perf_counter()
+        result = await router.ainvoke("feedback", "hello")
+        elapsed = time.perf_counter() - started
+        await asyncio.sleep(0)  # Let the cancelled primary call unwind
+        return result, elapsed
+
+    result, elapsed = asyncio.run(scenario())
+
+    assert result.content == "fallback"
+    assert elapsed < 1.0
+    assert (router.hedges, router.hedge_wins, router.failovers) == (1, 1, 0)
+    assert primary.cancelled == 1
+    assert [endpoint.in_flight for endpoint in endpoints] == [0, 0]
+    # The cancelled call is not counted against the primary
+    assert list(endpoints[0].outcomes) == [True] * 5
+
+
+def test_no_hedge_when_disabled():
+    primary = FakeProvider("primary", latency=0.01)
+    fallback = FakeProvider("fallback")
+    router, _ = make_router(primary, fallback, hedge=False, hedge_min_seconds=0.0, min_samples=1)
+
+    async def scenario():
+        await router.ainvoke("feedback", "hello")
+        primary.latency = 0.1
+        return await router.ainvoke("feedback", "hello")
+
+    assert asyncio.run(scenario()).content == "primary"
+    assert (fallback.calls, router.hedges) == (0, 0)
+
+
+def test_endpoint_tracks_rolling_percentiles():
+    endpoint = ModelEndpoint("primary", None, window=100)
+    assert endpoint.percentile(0.95) is None
+
+    for ms in range(1, 101):
+        endpoint.record(ms / 1000, True)
+    endpoint.record(None, False)
+
+    assert endpoint.percentile(0.5) == pytest.approx(0.051)
+    assert endpoint.percentile(0.95) == pytest.approx(0.096)
+    assert endpoint.error_rate == pytest.approx(0.01)
+
+    # The window drops the oldest samples
+    for _ in range(100):
+        endpoint.record(0.5, True)
+    assert endpoint.percentile(0.5) == 0.5
+    assert endpoint.stats()["p95_ms"] == pytest.approx(500)
+
+
+def test_router_records_call_latency():
+    primary = FakeProvider("primary", latency=0.02)
+    router, endpoints = make_router(primary)
+
+    async def scenario():
+        for _ in range(3):
+            await router.ainvoke("chat", "hello")
+
+    asyncio.run(scenario())
+
+    assert len(endpoints[0].latencies) == 3
+    assert endpoints[0].percentile(0.95) >= 0.02
+    assert router.stats()["endpoints"]["primary"]["calls"] == 3
+
+
+def test_failing_endpoint_cools_down_and_is_tried_last():
+    primary = FakeProvider("primary", error=RuntimeError("503"))
+    fallback = FakeProvider("fallback")
+    router, endpoints = make_router(primary, fallback, min_samples=3, cooldown_seconds=60)
+
+    async def scenario():
+        for _ in range(3):
+            await router.ainvoke("chat", "hello")
+
+    asyncio.run(scenario())
+
+    assert not endpoints[0].healthy
+    assert router._candidates("chat") == [endpoints[1], endpoints[0]]
+    calls = primary.calls
+    assert asyncio.run(router.ainvoke("chat", "hello")).content == "fallback"
+    assert primary.calls == calls
+
+
+def test_stream_fails_over_before_the_first_chunk():
+    primary = FakeProvider("primary", error=RuntimeError("503"))
+    fallback = FakeProvider("fallback")
+    router, endpoints = make_router(primary, fallback)
+    # Streaming goes through the providers' own astream
+    endpoints[0].llm, endpoints[1].llm = primary, fallback
+
+    async def scenario():
+        return [chunk.content async for chunk in router.astream("chat", "hello")]
+
+    assert asyncio.run(scenario()) == ["fallback", "done"]
+    assert router.failovers == 1
+    assert [endpoint.in_flight for endpoint in endpoints] == [0, 0]
+
+
+def test_runnable_is_a_chain_step():
+    from langchain_core.prompts import PromptTemplate
+
+    router, _ = make_router(FakeProvider("primary"))
+    chain = PromptTemplate.from_template("Say {word}") | router.runnable("feedback")
+
+    assert asyncio.run(chain.ainvoke({"word": "hi"})).content == "primary"
+
+
+class StalledProvider(FakeProvider):
+    """Accepts the call and never answers"""
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+
+def test_stalled_endpoint_times_out_and_fails_over():
+    primary = StalledProvider("primary")
+    fallback = FakeProvider("fallback")
+    router, endpoints = make_router(primary, fallback, attempt_timeout_seconds=0.05)
+
+    async def scenario():
+        started = time.perf_counter()
+        result = await router.ainvoke("chat", "hello")
+        await asyncio.sleep(0)  # Let the cancelled primary call unwind
+        return result, time.perf_counter() - started
+
+    result, elapsed = asyncio.run(scenario())
+
+    assert result.content == "fallback"
+    assert elapsed < 1.0
+    assert (router.failovers, router.timeouts, router.hedges) == (1, 1, 0)
+    assert primary.cancelled == 1
+    assert list(endpoints[0].outcomes) == [False]
+    assert [endpoint.in_flight for endpoint in endpoints] == [0, 0]
+
+
+def test_stalled_endpoints_raise_timeout_and_cool_down():
+    primary = StalledProvider("primary")
+    fallback = StalledProvider("fallback")
+    router, endpoints = make_router(primary, fallback, attempt_timeout_seconds=0.02,
+                                    min_samples=2, cooldown_seconds=60)
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(asyncio.TimeoutError, match="fallback did not answer"):
+                await router.ainvoke("chat", "hello")
+
+    asyncio.run(scenario())
+
+    assert router.timeouts == 4
+    assert not endpoints[0].healthy and not endpoints[1].healthy
+
+
+def test_hedge_still_fires_before_the_attempt_timeout():
+    primary = FakeProvider("primary", latency=0.01)
+    fallback = FakeProvider("fallback", latency=0.01)
+    router, endpoints = make_router(primary, fallback, hedge_min_seconds=0.05, min_samples=2,
+                                    attempt_timeout_seconds=2.0)
+
+    async def scenario():
+        for _ in range(2):
+            await router.ainvoke("feedback", "hello")
+        primary.latency = 5.0
+        return await router.ainvoke("feedback", "hello")
+
+    assert asyncio.run(scenario()).content == "fallback"
+    assert (router.hedges, router.hedge_wins, router.timeouts) == (1, 1, 0)
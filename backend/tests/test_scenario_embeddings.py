@@ -0,0 +1,69 @@
+# tests/test_scenario_embeddings.py
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from app.services.scenario_service import ScenarioService  # noqa: E402
+
+
+class FakeModel:
+    """Deterministic stand-in for the sentence-transformer; counts encoded texts"""
+
+    def __init__(self):
+        self.encoded = 0
+
+    def encode(self, texts, convert_to_numpy=True):
+        self.encoded += len(texts)
+        return np.array([[len(text), sum(map(ord, text)) % 101, 1.0] for text in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def service(tmp_path):
+    svc = ScenarioService.__new__(ScenarioService)
+    svc.model = FakeModel()
+    svc.model_name = "fake"
+    svc.scenarios_file = Path(__file__).parent.parent / "app" / "scenarios.json"
+    svc.embeddings_file = tmp_path / "scenario_embeddings.npy"
+    svc.manifest_file = tmp_path / "scenario_embeddings.json"
+    svc.scenarios = svc._load_scenarios()
+    assert len(svc.scenarios) >= 2
+    return svc
+
+
+def test_unchanged_catalogue_is_served_memory_mapped(service):
+    first = service._load_or_create_embeddings()
+    encoded = service.model.encoded
+    second = service._load_or_create_embeddings()
+
+    assert isinstance(first, np.memmap) and isinstance(second, np.memmap)
+    assert service.model.encoded == encoded
+    np.testing.assert_array_equal(first, second)
+
+
+def test_matrix_from_another_save_is_rejected(service):
+    embeddings = np.asarray(service._load_or_create_embeddings()).copy()
+
+    # A crash between the two replaces: a new matrix of the same shape beside the old manifest
+    np.save(service.embeddings_file, embeddings[::-1])
+    keys, cached = service._load_embedding_cache()
+    assert (keys, cached) == ([], None)
+
+    encoded = service.model.encoded
+    rebuilt = service._load_or_create_embeddings()
+    assert service.model.encoded == encoded + len(service.scenarios)
+    np.testing.assert_array_equal(rebuilt, embeddings)
+
+
+def test_manifest_without_fingerprint_is_rejected(service):
+    service._load_or_create_embeddings()
+    with open(service.manifest_file, encoding="utf-8") as f:
+        manifest = json.load(f)
+    del manifest["fingerprint"]
+    with open(service.manifest_file, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+    assert service._load_embedding_cache() == ([], None)
@@ -0,0 +1,69 @@
+# tests/test_scenario_generator.py
+import asyncio
+
+import pytest
+
+from app.models.preferences import UserPreferences
+from app.models.scenario import Scenario
+from app.services.scenario_generator import ScenarioGenerator
+
+PREFERENCES = {
+    "age_group": "9-11", "primary_condition": "ASD Level 1", "communication_style": "direct",
+    "literal_understanding": True, "learning_style": "visual", "attention_span": "medium",
+    "primary_support": "emotional_regulation", "interaction_pace": "normal",
+    "encouragement_style": "gentle", "correction_style": "gentle", "response_length": "brief"
+}
+
+SCENARIO = Scenario(
+    id="test-1", title="Lunch line", description="Waiting in the lunch line",
+    scenario_type="social_skills", primary_conditions=["ASD Level 1"], difficulty="beginner",
+    target_age_groups=["9-11"], content="Someone cuts in front of you.",
+    suggested_strategies=["deep breaths"], communication_style=["direct"], attention_span="medium"
+)
+
+VALID = ('{"steps": [{"type": "question", "content": "What do you do?", '
+         '"options": ["Shout", "Tell them calmly"], "correct_answer": "Tell them calmly"}]}')
+
+
+class FakeStructuredLLM:
+    """Returns canned replies from the structured-content methods, one per call"""
+
+    def __init__(self, *replies: str):
+        self.replies = list(replies)
+
+    def generate_structured_content(self, user_input, preferences, session_id):
+        return self.replies.pop(0)
+
+    async def agenerate_structured_content(self, user_input, preferences, session_id):
+        return self.replies.pop(0)
+
+
+def make_generator(*replies: str) -> ScenarioGenerator:
+    return ScenarioGenerator(llm=FakeStructuredLLM(*replies), feedback_cache=object())
+
+
+@pytest.mark.parametrize("reply", ['{"steps": null}', '{"steps": 5}', '{"steps": {"type": "question"}}'])
+def test_steps_that_are_not_a_list_are_a_parse_error(reply):
+    content, outcome = make_generator()._try_parse(reply)
+    assert content is None
+    assert outcome.startswith("ValueError")
+
+
+@pytest.mark.parametrize("reply", ['{"steps": null}', '{"steps": 5}'])
+def test_unusable_steps_fall_back_instead_of_raising(reply):
+    generator = make_generator(reply, reply)
+    content = generator.generate_scenario_content(SCENARIO, UserPreferences(**PREFERENCES))
+    assert content.fallback
+    assert generator.stats.results["fallback"] == 1
+
+    generator = make_generator(reply, reply)
+    content = asyncio.run(generator.agenerate_scenario_content(SCENARIO, UserPreferences(**PREFERENCES)))
+    assert content.fallback
+
+
+def test_unusable_steps_are_retried():
+    generator = make_generator('{"steps": null}', VALID)
+    content = generator.generate_scenario_content(SCENARIO, UserPreferences(**PREFERENCES))
+    assert not content.fallback
+    assert content.total_questions == 1
+    assert generator.stats.results["retried"] == 1
@@ -0,0 +1,97 @@
+# tests/test_session_store.py
+import asyncio
+
+import pytest
+
+from app.services.session_store import SessionStore
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+class BrokenRedis:
+    """Redis client whose every command fails, as when the server is unreachable"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def _fail(self, *args, **kwargs):
+        self.calls += 1
+        raise ConnectionError("Connection refused")
+
+    get = set = delete = _fail
+
+
+def test_redis_round_trip_with_ttl():
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    store = SessionStore(redis_client=client, fallback_size=10, ttl_seconds=120)
+
+    async def scenario():
+        await store.save("abc", {"turn_count": 2, "history": ["hi"]})
+        state = await store.get("abc")
+        ttl = await client.ttl("session:abc")
+        await store.delete("abc")
+        return state, ttl, await store.get("abc"), await client.exists("session:abc")
+
+    state, ttl, deleted, exists = asyncio.run(scenario())
+
+    assert state == {"turn_count": 2, "history": ["hi"]}
+    assert 0 < ttl <= 120
+    assert deleted is None and exists == 0
+    assert len(store.fallback) == 0
+    assert store.stats()["backend"] == "redis"
+
+
+def test_unknown_session_is_none():
+    store = SessionStore(redis_client=fakeredis.FakeAsyncRedis(decode_responses=True), fallback_size=10)
+    assert asyncio.run(store.get("missing")) is None
+
+
+def test_falls_back_to_memory_when_redis_fails():
+    client = BrokenRedis()
+    store = SessionStore(redis_client=client, fallback_size=10, ttl_seconds=120)
+
+    async def scenario():
+        await store.save("abc", {"turn_count": 1})
+        return await store.get("abc")
+
+    assert asyncio.run(scenario()) == {"turn_count": 1}
+    # One failure marks Redis down; later calls skip it until the retry time
+    assert client.calls == 1
+    assert not store.redis_available
+    assert store.stats()["backend"] == "memory"
+    assert store.fallback.get("abc") is not None
+
+
+def test_sessions_saved_while_redis_was_down_move_back_to_redis():
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    store = SessionStore(redis_client=client, fallback_size=10)
+
+    async def scenario():
+        store._mark_redis_down(ConnectionError("Connection refused"))
+        await store.save("abc", {"turn_count": 1})
+        assert await client.exists("session:abc") == 0
+
+        store._redis_down_until = 0.0  # Retry time reached
+        found = await store.get("abc")  # Not in Redis yet, served from the fallback
+        await store.save("abc", {"turn_count": 2})
+        return found, await client.get("session:abc")
+
+    found, stored = asyncio.run(scenario())
+
+    assert found == {"turn_count": 1}
+    assert stored == '{"turn_count": 2}'
+    assert len(store.fallback) == 0
+
+
+def test_in_process_store_without_redis():
+    store = SessionStore(redis_client=BrokenRedis(), fallback_size=2)
+    store.redis = None  # As when the redis package is not installed
+
+    async def scenario():
+        for session_id in ("a", "b", "c"):
+            await store.save(session_id, {"id": session_id})
+        return [await store.get(session_id) for session_id in ("a", "b", "c")]
+
+    # The fallback is bounded: the least recently used session is evicted
+    assert asyncio.run(scenario()) == [None, {"id": "b"}, {"id": "c"}]
+    assert store.stats()["backend"] == "memory"
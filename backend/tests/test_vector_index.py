@@ -0,0 +1,68 @@
+# tests/test_vector_index.py
+import numpy as np
+import pytest
+
+from app.retrieval.vector_index import ExactIndex, IVFIndex, VectorIndex, load_or_build_index
+
+
+def embeddings(rows: int = 500, dim: int = 32, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(rows, dim)).astype(np.float32)
+
+
+@pytest.fixture
+def mapped(tmp_path):
+    path = tmp_path / "embeddings.npy"
+    np.save(path, embeddings())
+    return np.load(path, mmap_mode="r")
+
+
+def test_float32_index_keeps_no_source_copy():
+    index = ExactIndex(embeddings(), dtype="float32", rerank=100)
+    assert index.source is None
+    assert index.memory_bytes() == index.vectors.nbytes
+
+
+def test_quantised_index_counts_an_in_memory_source():
+    data = embeddings()
+    index = ExactIndex(data, dtype="int8", rerank=100)
+    assert index.memory_bytes() == index.vectors.nbytes + index.scales.nbytes + data.nbytes
+    assert index.mapped_bytes() == 0
+
+    # Without re-ranking the source is not needed
+    assert ExactIndex(data, dtype="int8", rerank=0).source is None
+
+
+def test_rerank_reads_a_memory_mapped_source(mapped):
+    exact = ExactIndex(np.asarray(mapped))
+    index = ExactIndex(mapped, dtype="int8", rerank=50)
+
+    assert index.memory_bytes() == index.vectors.nbytes + index.scales.nbytes
+    assert index.mapped_bytes() == mapped.nbytes
+    for query in embeddings(rows=5, seed=1):
+        rows, scores = index.search(query, 10)
+        expected_rows, expected_scores = exact.search(query, 10)
+        assert list(rows) == list(expected_rows)
+        np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+
+
+def test_base_index_cannot_be_instantiated():
+    with pytest.raises(TypeError):
+        VectorIndex(embeddings())
+
+
+def test_cached_ivf_index_is_rebuilt_when_nlist_changes(tmp_path):
+    data = embeddings()
+    path = tmp_path / "index.npz"
+
+    built = load_or_build_index("ivf", data, path, nlist=8)
+    cached = load_or_build_index("ivf", data, path, nlist=8)
+    assert cached.nlist == built.nlist == 8
+    np.testing.assert_array_equal(cached.centroids, built.centroids)
+
+    rebuilt = load_or_build_index("ivf", data, path, nlist=16)
+    assert rebuilt.nlist == 16
+    assert len(rebuilt.centroids) == 16
+    # The rebuilt index replaces the cached one
+    assert IVFIndex.load(path, data, nlist=16) is not None
+    assert IVFIndex.load(path, data, nlist=8) is None